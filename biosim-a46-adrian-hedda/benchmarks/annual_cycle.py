@@ -0,0 +1,179 @@
+"""
+Benchmark of the annual cycle across island sizes and population sizes.
+
+Every phase of the year is timed on its own: the tile functions, each run over every occupied
+tile of the island, and Whole_map.migrate. The years run through Whole_map.new_year_whole_map
+with a Profiler attached, so the benchmark times the same year as a simulation. The results
+are written as JSON, and can be compared
+with the results of an earlier run, for example of the last release:
+
+    python benchmarks/annual_cycle.py --output new.json
+    python benchmarks/annual_cycle.py --output new.json --compare baseline.json
+
+With --compare, every phase that got slower than the baseline by more than the threshold is
+reported, and the script exits with status 1.
+
+The full grid of island sizes and populations takes a long time, use --sizes and --animals to
+pick a part of it, or --quick for a small smoke run.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import numpy as np
+from biosim import Island
+from biosim.profiling import Profiler, PHASES
+
+SIZES = [3, 10, 50, 100, 200]
+ANIMALS = [10 ** 2, 10 ** 4, 10 ** 6]
+
+
+def make_map(size):
+    """
+    A square island with size x size tiles, water along the border, and lowland with some
+    highland and desert inside. The smallest island, 3 x 3, has one land tile.
+    """
+    rows = ['W' * size]
+    for y in range(1, size - 1):
+        row = ''.join('H' if x % 4 == 0 else 'D' if (x + y) % 7 == 0 else 'L'
+                      for x in range(1, size - 1))
+        rows.append('W' + row + 'W')
+    rows.append('W' * size)
+    return '\n'.join(rows)
+
+
+def make_island(size, animals, backend, seed):
+    """
+    An island with the given number of animals spread evenly over the land tiles, nine
+    herbivores for every carnivore.
+    """
+    island = Island.Whole_map(backend, seed)
+    island.sim_world(make_map(size))
+    land = island.land_keys
+    num_herbs = animals - animals // 10
+    num_carns = animals // 10
+    for number, key in enumerate(land):
+        herbs = num_herbs // len(land) + (number < num_herbs % len(land))
+        carns = num_carns // len(land) + (number < num_carns % len(land))
+        island.add_pop(key, key, [{'age': 5, 'weight': 20}] * herbs,
+                       [{'age': 5, 'weight': 20}] * carns)
+    return island
+
+
+def time_year(island):
+    """
+    Runs one year of the island with a profiler attached, timing every phase.
+
+    Returns
+    -------
+    dictionary from phase to seconds
+    """
+    if island.profiler is None:
+        island.profiler = Profiler(per_tile_phases=(), keep_history=False)
+    island.new_year_whole_map()
+    return {phase: island.profiler.last_year[phase] for phase in PHASES}
+
+
+def run_case(size, animals, backend, years, seed=1):
+    """
+    Times the phases over a number of years on one island.
+
+    Returns
+    -------
+    dictionary with the case and the mean and minimum seconds per phase
+    """
+    island = make_island(size, animals, backend, seed)
+    start_count = sum(island.animal_count_total())
+    per_year = [time_year(island) for _ in range(years)]
+    phases = {phase: {'mean': statistics.mean(year[phase] for year in per_year),
+                      'min': min(year[phase] for year in per_year)}
+              for phase in PHASES}
+    return {'size': size, 'animals': animals, 'backend': backend, 'years': years,
+            'start_count': start_count, 'end_count': sum(island.animal_count_total()),
+            'phases': phases,
+            'total': sum(phase['mean'] for phase in phases.values())}
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares results with a baseline, case by case and phase by phase.
+
+    Parameters
+    ----------
+    results
+        the 'results' list of a benchmark run
+    baseline
+        the 'results' list of an earlier run
+    threshold
+        a phase is reported as slower if its minimum time grew by more than this factor
+
+    Returns
+    -------
+    list of (case, phase, baseline seconds, new seconds) for the slower phases
+    """
+    def case(entry):
+        return entry['size'], entry['animals'], entry['backend']
+
+    old = {case(entry): entry for entry in baseline}
+    slower = []
+    for entry in results:
+        if case(entry) not in old:
+            continue
+        for phase, timing in entry['phases'].items():
+            before = old[case(entry)]['phases'].get(phase)
+            if before and timing['min'] > threshold * before['min']:
+                slower.append((case(entry), phase, before['min'], timing['min']))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--animals', type=int, nargs='+', default=ANIMALS)
+    parser.add_argument('--backends', nargs='+', default=['object', 'array'])
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--quick', action='store_true',
+                        help='only the smallest cases, for a smoke test')
+    parser.add_argument('--output', help='file to write the results to, as JSON')
+    parser.add_argument('--compare', help='results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.10,
+                        help='slowdown factor reported as a regression (default 1.10)')
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.sizes, args.animals, args.years = [3, 10], [100, 1000], 2
+
+    results = []
+    for backend in args.backends:
+        for size in args.sizes:
+            for animals in args.animals:
+                result = run_case(size, animals, backend, args.years)
+                results.append(result)
+                print(f"{backend:>6} {size:>4}x{size:<4} {animals:>8} animals "
+                      f"{result['total'] * 1000:10.2f} ms/year", flush=True)
+
+    report = {'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                       'machine': platform.machine(), 'platform': platform.platform(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+        slower = compare(results, baseline, args.threshold)
+        for (size, animals, backend), phase, before, after in slower:
+            print(f'SLOWER {backend} {size}x{size} {animals} animals {phase}: '
+                  f'{before * 1000:.2f} ms -> {after * 1000:.2f} ms')
+        if slower:
+            return 1
+        print('No phase slower than the baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
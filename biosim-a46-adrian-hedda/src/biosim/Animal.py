@@ -1,19 +1,83 @@
 import math
+import numbers
 import random
+import numpy as np
+from biosim import kernels
+
+
+class AnimalParameters:
+    """
+    AnimalParameters is the compiled, immutable version of the parameter dictionary of an animal
+    species.
+    Besides every parameter in the dictionary, it holds the constants that are derived from
+    the parameters, so the yearly functions do not have to compute them again for every animal:
+
+    my, sigma
+        the parameters of the log normal distribution of birth weights
+    birth_threshold
+        zeta * (w_birth + sigma_birth), the weight an animal needs to give birth
+
+    A new object is compiled every time set_param changes the parameters of the species.
+    """
+    __slots__ = ('w_birth', 'sigma_birth', 'beta', 'eta', 'a_half', 'phi_age', 'w_half',
+                 'phi_weight', 'mu', 'gamma', 'zeta', 'xi', 'omega', 'F', 'DeltaPhiMax',
+                 'my', 'sigma', 'birth_threshold')
+
+    def __init__(self, param):
+        """
+        Parameters
+        ----------
+        param
+            the parameter dictionary of the species
+        """
+        for key in self.__slots__[:15]:
+            object.__setattr__(self, key, param.get(key))
+        w_birth = param['w_birth']
+        sigma_birth = param['sigma_birth']
+        object.__setattr__(self, 'my',
+                           math.log(w_birth ** 2 / math.sqrt(w_birth ** 2 + sigma_birth ** 2)))
+        object.__setattr__(self, 'sigma',
+                           math.sqrt(math.log(1 + sigma_birth ** 2 / w_birth ** 2)))
+        object.__setattr__(self, 'birth_threshold', param['zeta'] * (w_birth + sigma_birth))
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Compiled parameters can not be changed, use set_param')
+
 
 class Animal:
 
     """
     Superclass which contains subclasses Herbivores and Carnivores.
     Animal contains functions that are relevant for each subclass
+
+    The fitness of an animal is computed lazily. Functions that change age or weight only mark
+    the fitness as stale, and it is recomputed the next time something reads animal.fitness.
+    Tiles use refresh_fitness to recompute the fitness of all their stale animals in one batch.
+
+    The age factor of the fitness only depends on the integer age and the parameters phi_age and
+    a_half, so each species keeps a table of age factors, indexed by age. The table is extended
+    when an animal gets older than the table, and cleared when phi_age or a_half is changed.
     """
     _param = {}
+    _compiled = None
+    _batch_min = 32
+    _age_factors = []
+    _age_factor_array = np.zeros(0)
+    _age_table_step = 16
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._compiled = AnimalParameters(cls._param)
+
     @classmethod
     def set_param(cls,param_input):
         """
         the classmethod set_param takes a dictionary input, and updates the _param dictionary of
         the targeted cls
 
+        The input is validated before anything is changed. Afterwards the parameters are compiled
+        into a new AnimalParameters object, which replaces the old one.
+
         Parameters
         ----------
         param_input = {}
@@ -21,20 +85,119 @@ class Animal:
         Returns the new parameter dictionary for the class.
         -------
 
+        Raises
+        ------
+        ValueError
+            If a parameter is unknown for the class, or has an invalid value.
         """
         if param_input is not None:
+            cls.validate_param(param_input)
             cls._param.update(param_input)
+            cls._compiled = AnimalParameters(cls._param)
+            if 'phi_age' in param_input or 'a_half' in param_input:
+                cls._age_factors = []
+                cls._age_factor_array = np.zeros(0)
             return cls._param
 
+    @classmethod
+    def validate_param(cls, param_input):
+        """
+        Checks that every parameter in the input is a known parameter of the class, and that its
+        value is a non-negative number. In addition eta can not be larger than 1, and w_birth
+        and DeltaPhiMax must be strictly positive.
+
+        Parameters
+        ----------
+        param_input
+
+        Raises
+        ------
+        ValueError
+        """
+        for key, value in param_input.items():
+            if key not in cls._param:
+                raise ValueError(f'Unknown parameter for {cls.__name__}: {key}')
+            if isinstance(value, (bool, np.bool_)) or not isinstance(value, numbers.Real):
+                raise ValueError(f'Parameter {key} must be a number, got {value!r}')
+            if value < 0:
+                raise ValueError(f'Parameter {key} can not be negative')
+            if key == 'eta' and value > 1:
+                raise ValueError('Parameter eta can not be larger than 1')
+            if key in ('w_birth', 'DeltaPhiMax') and value == 0:
+                raise ValueError(f'Parameter {key} must be larger than 0')
 
+    @classmethod
+    def params(cls):
+        """
+        Returns the compiled parameters of the class.
 
-    def __init__(self, age=0, weight=None):
+        Returns
+        -------
+        AnimalParameters
+        """
+        return cls._compiled
+
+    @classmethod
+    def age_factors(cls, max_age):
+        """
+        Returns the table of age factors for the class, extended so that it covers every age up
+        to and including max_age.
+        The age factor of an animal of age a is 1 / (1 + exp(phi_age * (a - a_half))).
+
+        Parameters
+        ----------
+        max_age
+
+        Returns
+        -------
+        list of age factors, indexed by age
+        """
+        table = cls._age_factors
+        if max_age >= len(table):
+            param = cls._compiled
+            new_ages = range(len(table), max_age + cls._age_table_step)
+            table = table + [1 / (1 + math.exp(param.phi_age * (age - param.a_half)))
+                             for age in new_ages]
+            cls._age_factors = table
+            cls._age_factor_array = np.array(table)
+        return table
+
+    @classmethod
+    def age_factor_array(cls, max_age):
+        """
+        The same table as age_factors, as a NumPy array for looking up many ages at once.
+
+        Parameters
+        ----------
+        max_age
+
+        Returns
+        -------
+        array of age factors, indexed by age
+        """
+        if max_age >= len(cls._age_factors):
+            cls.age_factors(max_age)
+        return cls._age_factor_array
+
+    def _age_factor(self):
+        """The age factor of the animal, from the table if the age is a whole number."""
+        age = self.age
+        table = self._age_factors
+        if type(age) is int and 0 <= age < len(table):
+            return table[age]
+        if age == int(age) and age >= 0:
+            return self.age_factors(int(age))[int(age)]
+        return 1 / (1 + math.exp(self._compiled.phi_age * (age - self._compiled.a_half)))
+
+    def __init__(self, age=0, weight=None, rng=random):
         """
         initializing animal, in this case mostly used through super().__init__ in the subclasses
         input Parameters. Age and weight are given as attributes to the class object
         ----------
         age
         weight
+        rng
+            random number generator used if the weight is drawn, the random module by default
 
 
         """
@@ -48,12 +211,72 @@ class Animal:
             self.parent = True
         if weight is None:
             my, sigma = Animal.my_sigma(self)
-            self.weight = random.lognormvariate(my,sigma)
+            self.weight = rng.lognormvariate(my, sigma)
         else:
             self.weight = weight
-        self.fitness = 0
+        self._fitness = 0
+        self._fitness_stale = False
         self.update_fitness()
 
+    @property
+    def fitness(self):
+        """
+        The fitness of the animal. If the age or weight has changed since the fitness was last
+        computed, it is recomputed before it is returned.
+        """
+        if self._fitness_stale:
+            self.update_fitness()
+        return self._fitness
+
+    @fitness.setter
+    def fitness(self, value):
+        self._fitness = value
+        self._fitness_stale = False
+
+    @classmethod
+    def refresh_fitness(cls, animals):
+        """
+        Recomputes the fitness of every stale animal in the list in one batch with NumPy,
+        instead of one update_fitness call per animal. Used by the tiles before the fitness of
+        many animals is read, like before sorting for the hunt.
+        All animals in the list must belong to the class the function is called on.
+
+        Parameters
+        ----------
+        animals
+            list of animal class objects
+
+        Updates
+        -------
+        class object.fitness
+        class object.alive
+        """
+        stale = [animal for animal in animals if animal._fitness_stale]
+        if len(stale) < cls._batch_min:
+            # NumPy has a fixed overhead that is not worth paying for a handful of animals
+            for animal in stale:
+                animal.update_fitness()
+            return
+        param = cls._compiled
+        age = np.fromiter((animal.age for animal in stale), dtype=float, count=len(stale))
+        weight = np.fromiter((animal.weight for animal in stale), dtype=float, count=len(stale))
+        if np.all(age == np.floor(age)) and age.min() >= 0:
+            q_positive = cls.age_factor_array(int(age.max()))[age.astype(np.int64)]
+        else:
+            q_positive = 1 / (1 + np.exp(param.phi_age * (age - param.a_half)))
+        q_negative = 1 / (1 + np.exp(-(param.phi_weight * (weight - param.w_half))))
+        fitness = (q_positive * q_negative).tolist()
+        for animal, value, animal_weight in zip(stale, fitness, weight):
+            if animal_weight <= 0:
+                animal.alive = False
+                animal._fitness_stale = False
+            else:
+                animal.fitness = value
+
+    def _mark_stale(self):
+        """Marks the fitness as out of date after a change in age or weight."""
+        self._fitness_stale = True
+
 
     def my_sigma(self):
         """
@@ -65,10 +288,9 @@ class Animal:
         -------
         my,sigma
 
+        Both are precomputed in the compiled parameters of the class.
         """
-        my = math.log(self._param['w_birth'] ** 2 / (math.sqrt(self._param['w_birth'] ** 2 + self._param['sigma_birth'] ** 2)))
-        sigma = math.sqrt(math.log(1 + (self._param['sigma_birth'] ** 2 / self._param['w_birth'] ** 2)))
-        return my, sigma
+        return self._compiled.my, self._compiled.sigma
 
 
     def update_fitness(self):
@@ -85,19 +307,19 @@ class Animal:
         class object.fitness
         class object.alive
         """
-        param = self._param
+        param = self._compiled
         if self.weight <= 0:
             self.alive = False
+            self._fitness_stale = False
             return
         else:
-            q_positive = 1 / (1 + math.exp(param['phi_age'] * (self.age - param['a_half'])))
-            q_negative = 1 / (1 + math.exp(-(self._param['phi_weight'] * (self.weight - self._param['w_half']))))
+            q_positive = self._age_factor()
+            q_negative = 1 / (1 + math.exp(-(param.phi_weight * (self.weight - param.w_half))))
             self.fitness = q_positive * q_negative
         if self.fitness > 1:
             raise ValueError (f'The fitness of an animal should not exceed 1')
 
-
-    def have_offspring(self, animal_list):
+    def have_offspring(self, animal_list, rng=random):
         """
         The have offspring function takes a class object and sees if that object is eligible to
         reproduce.
@@ -110,36 +332,43 @@ class Animal:
 
         Parameters
         ----------
-        carn
+        animal_list
+        rng
+            random number generator, the random module by default
 
         Returns
         -------
         A new animal of the same class, in the same Tile
         """
-        self.update_fitness()
         if self.parent is False:
             return
-        if self.weight < self._param['zeta']*(self._param['w_birth'] + self._param['sigma_birth']):
+        param = self._compiled
+        if self.weight < param.birth_threshold:
             return
-        if random.random() < min(1.0, self._param['gamma']*self.fitness*len(animal_list)):
-            newborn = self.__class__()
-            if self.weight - (newborn.weight * self._param['xi']) > 0:
-                self.weight -= (newborn.weight * self._param['xi'])
+        if rng.random() < min(1.0, param.gamma*self.fitness*len(animal_list)):
+            newborn = self.__class__(rng=rng)
+            if self.weight - (newborn.weight * param.xi) > 0:
+                self.weight -= (newborn.weight * param.xi)
                 self.parent = False
-                self.update_fitness()
+                self._mark_stale()
             return newborn
         return
 
-    def will_migrate(self):
+    def will_migrate(self, rng=random):
         """
         will migrate is a function that tests if the animal class object wants to migrate.
         Its willingness to migrate is decided by its fitness and a class parameter.
 
+        Parameters
+        ----------
+        rng
+            random number generator, the random module by default
+
         Updates
         -------
         class object.migrating
         """
-        if random.random() <= self._param['mu']*self.fitness:
+        if rng.random() <= self._compiled.mu*self.fitness:
             self.migrating = True
 
     def aging(self):
@@ -152,7 +381,8 @@ class Animal:
         class object.age += 1
         """
         self.age += 1
-        self.update_fitness()
+        self._mark_stale()
+
     def weight_loss(self):
         """
         Every year on the island, every animal loses weight.
@@ -165,9 +395,10 @@ class Animal:
         -------
         class object.weight
         """
-        self.weight -= self._param['eta'] * self.weight
-        self.update_fitness()
-    def dying(self):
+        self.weight -= self._compiled.eta * self.weight
+        self._mark_stale()
+
+    def dying(self, rng=random):
         """
         The dying function introduces the probability for random death, and is run towards the
         end of every year.
@@ -177,11 +408,16 @@ class Animal:
         animal is still alive.
         animals with alive = False simply gets removed from their class list.
 
+        Parameters
+        ----------
+        rng
+            random number generator, the random module by default
+
         Updates
         -------
         class object.alive
         """
-        if self.weight <= 0 or random.random() <= self._param['omega'] * (1 - self.fitness):
+        if self.weight <= 0 or rng.random() <= self._compiled.omega * (1 - self.fitness):
             self.alive = False
 
 
@@ -211,8 +447,7 @@ class Herbivores(Animal):
               'omega': 0.4,
               'F': 10.}
 
-
-    def __init__(self, age=0, weight=None):
+    def __init__(self, age=0, weight=None, rng=random):
         """
         Herbivores init function sends both of its input parameters to its parent class, Animal.
 
@@ -220,8 +455,9 @@ class Herbivores(Animal):
         ----------
         age
         weight
+        rng
         """
-        super().__init__(age, weight)
+        super().__init__(age, weight, rng)
 
 
 
@@ -247,18 +483,51 @@ class Herbivores(Animal):
         """
         if temp_fodder == 0:
             return temp_fodder
-        if temp_fodder >= self._param['F']:
-            eaten = self._param['F']
-            self.weight += self._param['beta']*eaten
+        param = self._compiled
+        if temp_fodder >= param.F:
+            eaten = param.F
+            self.weight += param.beta*eaten
             temp_fodder -= eaten
-            self.update_fitness()
+            self._mark_stale()
             return temp_fodder
         else:
-            self.weight += self._param['beta']*temp_fodder
+            self.weight += param.beta*temp_fodder
             temp_fodder = 0
-            self.update_fitness()
+            self._mark_stale()
             return temp_fodder
 
+    @classmethod
+    def feed(cls, herb_list, fodder, rng=random):
+        """
+        All herbivores in the list eat from the fodder of their tile, in random order, with the
+        same result as calling eat on each of them in turn.
+        How much every herbivore gets is computed in one batch by kernels.fodder_intake, and the
+        list is only shuffled when the fodder runs out before every herbivore has eaten its fill.
+
+        Parameters
+        ----------
+        herb_list
+            list of Herbivores, shuffled in place
+        fodder
+        rng
+            random number generator, the random module by default
+
+        Returns
+        -------
+        the remaining fodder
+        """
+        param = cls._compiled
+        intake, fodder = kernels.fodder_intake(fodder, param.F, len(herb_list))
+        if len(intake) == 0:
+            return fodder
+        if len(intake) < len(herb_list) or intake[-1] < param.F:
+            rng.shuffle(herb_list)
+        for herb, gain in zip(herb_list, (param.beta * intake).tolist()):
+            herb.weight += gain
+            herb._fitness_stale = True
+        return fodder
+
+
 class Carnivores(Animal):
     """
     The Carnivores class is a sublcass of Animal.
@@ -285,7 +554,8 @@ class Carnivores(Animal):
              "omega": 0.8,
              "F": 50.0,
              "DeltaPhiMax": 10}
-    def __init__(self, age=0, weight=None):
+
+    def __init__(self, age=0, weight=None, rng=random):
         """
         Like the Herbivores subclass, the Carnivores also send their input parameters to its parent
         class for init
@@ -295,9 +565,9 @@ class Carnivores(Animal):
         Carnivore.age
         Carnivore.weight
         """
-        super().__init__(age, weight)
+        super().__init__(age, weight, rng)
 
-    def eat(self, herb_list):
+    def eat(self, herb_list, rng=random):
         """
         For a Carnivore to eat, it requires herbivores in its vicinity.
         The Carnivore class object iterates over the Herbivore list in a sorted order.
@@ -317,26 +587,83 @@ class Carnivores(Animal):
         Parameters
         ----------
         herb_list
+        rng
+            random number generator, the random module by default
 
         Returns
         -------
 
         """
-        self.update_fitness()
-        appetite = self._param['F']
+        param = self._compiled
+        appetite = param.F
+        fitness = self.fitness
         for i in herb_list:
             if i.alive is False:
                 continue
-            if appetite <= 0 or self.fitness <= i.fitness:
+            prey_fitness = i.fitness
+            if appetite <= 0 or fitness <= prey_fitness:
                 return
-            p = ((self.fitness - i.fitness) / self._param['DeltaPhiMax'])
+            p = ((fitness - prey_fitness) / param.DeltaPhiMax)
             if appetite > 0:
-                if self.fitness - i.fitness > self._param['DeltaPhiMax'] or random.random() <= p:
+                if fitness - prey_fitness > param.DeltaPhiMax or rng.random() <= p:
                     i.alive = False
                     Feed = min(appetite, i.weight)
                     appetite -= Feed
-                    self.weight += self._param['beta'] * Feed
-                    self.update_fitness()
+                    self.weight += param.beta * Feed
+                    self._mark_stale()
+                    fitness = self.fitness
 
                 else:
-                    continue
\ No newline at end of file
+                    continue
+
+    @classmethod
+    def hunt(cls, carn_list, herb_list, rng=random):
+        """
+        All carnivores in the list hunt the herbivores in the list, with the same rules as
+        calling eat for every carnivore in order of decreasing fitness, on the herbivores in
+        order of increasing fitness. Neither list has to be sorted, the hunt is computed in one
+        batch by kernels.hunt. For a handful of herbivores, the carnivores just eat in turn.
+        The fitness of both lists must be up to date, see refresh_fitness.
+
+        Parameters
+        ----------
+        carn_list
+            list of Carnivores
+        herb_list
+            list of Herbivores
+        rng
+            random number generator, the random module by default
+
+        Updates
+        -------
+        Carnivore.weight
+        Carnivore.fitness
+        Herbivore.alive
+        """
+        if not carn_list or not herb_list:
+            return
+        if len(herb_list) < cls._batch_min:
+            herb_list.sort(key=lambda x: x.fitness)
+            for carn in sorted(carn_list, key=lambda x: x.fitness, reverse=True):
+                carn.eat(herb_list, rng)
+            return
+        count = len(carn_list)
+        weight = np.fromiter((carn.weight for carn in carn_list), dtype=float, count=count)
+        fitness = np.fromiter((carn.fitness for carn in carn_list), dtype=float, count=count)
+        age_factor = np.fromiter((carn._age_factor() for carn in carn_list), dtype=float,
+                                 count=count)
+        prey_fitness = np.fromiter((herb.fitness for herb in herb_list), dtype=float,
+                                   count=len(herb_list))
+        prey_weight = np.fromiter((herb.weight for herb in herb_list), dtype=float,
+                                  count=len(herb_list))
+        prey_alive = np.fromiter((herb.alive is True for herb in herb_list), dtype=bool,
+                                 count=len(herb_list))
+        killed, new_weight, new_fitness = kernels.hunt(fitness, weight, age_factor, prey_fitness,
+                                                       prey_weight, cls._compiled, rng,
+                                                       prey_alive)
+        for j in killed.tolist():
+            herb_list[j].alive = False
+        for i in np.flatnonzero(new_weight != weight).tolist():
+            carn = carn_list[i]
+            carn.weight = float(new_weight[i])
+            carn.fitness = float(new_fitness[i])
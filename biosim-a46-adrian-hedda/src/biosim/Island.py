@@ -1,6 +1,11 @@
-import random
-import textwrap
+import time
+import numpy as np
 from biosim import Tile
+from biosim import Animal
+from biosim.Population import Population
+from biosim.random_streams import RandomStreams
+from biosim.topology import Topology
+from biosim.profiling import PHASES_BEFORE_MIGRATION, PHASES_AFTER_MIGRATION
 
 class Whole_map():
     """
@@ -13,13 +18,31 @@ class Whole_map():
     already among the accepted landscapes, the Whole_map functions will not accept it.
     We had plans to give users the ability to easily add more landscapes, but didnt get that far.
 
+    The backend decides how the tiles store their animals, either as lists of Animal class
+    objects ('object') or as Population arrays ('array'). See Tile.py.
+
+    If a seed is given, every tile draws its random numbers from its own stream for each phase
+    and year, see random_streams.py, and the simulation is reproducible from the seed.
+    Without a seed, the global random generators are used.
+
+    The topology decides which tiles are neighbors, 'square' for the four neighbors N, S, E
+    and W, 'wrap' for a square grid that wraps around at the edges, or 'hex' for hexagons. See
+    topology.py.
     """
     _landscapes = ['W', 'L', 'H', 'D']
 
-    def __init__(self):
+    def __init__(self, backend='object', seed=None, topology='square'):
+        if backend not in Tile.Tile._backends:
+            raise ValueError(f'Unknown population backend: {backend}')
+        self.topology = Topology.create(topology)
         self.map_dict = {}
         self.default_tiles = True
         self.year = 0
+        self.backend = backend
+        self.streams = RandomStreams(seed) if seed is not None else None
+        self.engine = None
+        # set to a profiling.Profiler to time the phases of every year
+        self.profiler = None
 
     def create_map(self, map_layout_string):
         """
@@ -33,6 +56,10 @@ class Whole_map():
         An example would be dict_map[(2,2)], which would return the letter associated with a
         type of landscape.
 
+        The map is parsed into a grid of landscape codes, and checked with array operations.
+        Entry [y - 1, x - 1] of the grids belongs to the tile with key (y, x), and the cell
+        number (y - 1) * length_x + (x - 1) is its index in the flattened grids.
+
         Parameters:
 
         map_layout_string
@@ -40,46 +67,40 @@ class Whole_map():
         Updates:
 
         dict_map
+        Whole_map.landscape, grid of indices into Whole_map._landscapes
+        Whole_map.land, cell numbers of the tiles that are not Water
         """
-        #map_layout_string = textwrap.dedent(map_layout_string)
         map_string_lines = map_layout_string.splitlines()
-        # map_string_lines = enumerate(map_string_lines)
         self.map_dict = {}
-        i = 0
         self.length_y = len(map_string_lines)
-        for line in map_string_lines:
-            map_string_lines[i] = [landscape for landscape in line]
-
-            for landscape in map_string_lines[i]:
-                if landscape not in self._landscapes: #Flytt til test
-                    self.default_tiles = False
-                    raise ValueError(f'Landscape:', landscape,', is not in the list of default landscapes')
-
-            i += 1
-        self.length_x = len(map_string_lines[0])  # assumes that all the lists of landscapes have the same length
-        if self.default_tiles is True:
-            for i in range(self.length_y):
-                y = i + 1
-                if i == 0:
-                    for landscape in map_string_lines[i]:
-                        if landscape != 'W':
-                            raise ValueError(f'First and last lines are borders, and must only contain water, W')
-
-                if i == self.length_y - 1:
-                    for landscape in map_string_lines[i]:
-                        if landscape != 'W':
-                            raise ValueError(f'First and last lines are borders, and must only contain water, W')
-
-                if len(map_string_lines[i]) != self.length_x:
-                    self.map_dict = {}
-                    raise ValueError(f'Map must contain uniform string lenghts. Row: ', i+1, 'does not contain the same number of symbols as the first line')
-
-                for j in range(self.length_x):
-                    x = j + 1
-                    #loc = str(x) + ',' + str(y)
-                    self.map_dict.update({(y, x): map_string_lines[i][j]})
-        else:
+        symbols = np.array(list(''.join(map_string_lines)))
+        known = np.isin(symbols, self._landscapes)
+        if not known.all():
+            self.default_tiles = False
+            raise ValueError('Landscape:', str(symbols[np.argmin(known)]),
+                             ', is not in the list of default landscapes')
+        lengths = np.array([len(line) for line in map_string_lines])
+        self.length_x = int(lengths[0])
+        if self.default_tiles is not True:
             print('Map string contains landscapes not included in the simulation')
+            return
+        if np.any(symbols[:self.length_x] != 'W'):
+            raise ValueError('First and last lines are borders, and must only contain water, W')
+        ragged = np.flatnonzero(lengths != self.length_x)
+        if len(ragged):
+            raise ValueError('Map must contain uniform string lenghts. Row: ', int(ragged[0]) + 1,
+                             'does not contain the same number of symbols as the first line')
+        grid = symbols.reshape(self.length_y, self.length_x)
+        if np.any(grid[-1] != 'W'):
+            raise ValueError('First and last lines are borders, and must only contain water, W')
+
+        self.landscape = np.zeros(grid.shape, dtype=np.int8)
+        for code, landscape in enumerate(self._landscapes):
+            self.landscape[grid == landscape] = code
+        self.land = np.flatnonzero(self.landscape.ravel() != self._landscapes.index('W'))
+        self._keys = [(y, x) for y in range(1, self.length_y + 1)
+                      for x in range(1, self.length_x + 1)]
+        self.map_dict = dict(zip(self._keys, grid.ravel().tolist()))
 
     def generate_world(self):
         """
@@ -94,6 +115,11 @@ class Whole_map():
         The coordinate keys allow for easy access in functions, testing and debugging.
         A key input in the world dictionary will return the class object itself, allowing further
         inspection.
+        The tiles are also kept in the list Whole_map.tiles, in the order of the cell numbers,
+        and the tiles that are not Water in Whole_map.land_tiles. The cell numbers of the land
+        tiles that hold animals are kept in the set Whole_map.occupied, and the annual cycle
+        only runs over those. The number of herbivores and carnivores in every cell is kept in
+        Whole_map.tile_counts, and the totals in Whole_map.species_counts.
         Returns
 
 
@@ -102,17 +128,20 @@ class Whole_map():
         if self.map_dict == {}:
             print('Map dictionary did not get created, please generate map from a valid string')
             return
-        self.world = {}
-        keys = self.map_dict.keys()
-        for key in keys:
-            if self.map_dict[key] == 'W':
-                self.world.update({key:Tile.Water()})
-            if self.map_dict[key] == 'L':
-                self.world.update({key: Tile.Lowland()})
-            if self.map_dict[key] == 'H':
-                self.world.update({key: Tile.Highland()})
-            if self.map_dict[key] == 'D':
-                self.world.update({key:Tile.Desert()})
+        classes = [_landscape_classes[landscape] for landscape in self._landscapes]
+        self.tiles = [classes[code](self.backend) for code in self.landscape.ravel().tolist()]
+        self.world = dict(zip(self._keys, self.tiles))
+        for index, tile in enumerate(self.tiles):
+            tile.index = index
+            tile.streams = self.streams
+            if tile.accepts_animals is True:
+                tile.on_change = self.track_tiles
+        self.land_tiles = [self.tiles[cell] for cell in self.land.tolist()]
+        # fodder of every cell, set from the landscape parameters at the start of every year
+        # and left with what the herbivores did not eat
+        self.fodder = np.zeros(self.landscape.shape)
+        self.occupied = set()
+        self._clear_counts()
         self.find_neighbors()
         return self.world
 
@@ -137,77 +166,229 @@ class Whole_map():
     def find_neighbors(self):
         """
         When the world gets generated, the find neighbors function is called.
-        This function allows for each tile that is not Water to know their adjacent neighbors.
+        It compiles the topology of the island once into an integer table over the tiles that
+        are not Water, with the destinations that accept animals worked out in advance, see
+        topology.Adjacency.
         Each tile is then capable of giving migrating animals their destination options.
         This saves some time compared to the neighbors of a tile being found each time an animal
         wants to migrate.
 
         Updates
 
-        Tile adjacent neighbors
+        Whole_map.adjacency
+        Whole_map.land_keys, the keys of all tiles that are not Water
         """
-        # goes through each tile that is not water, and adds neighbor info to tiles
-        keys = self.map_dict.keys()
-        for key in keys:
-            if self.map_dict[key] == 'W':
-                continue
-            key0 = key[0]
-            key1 = key[1]
-            self.world[key].N_neighbor_position = str((key0, key1 - 1))
-            self.world[key].N_neighbor = self.world[(key0, key1 - 1)]
-            self.world[key].S_neighbor_position = str((key0, key1 + 1))
-            self.world[key].S_neighbor = self.world[(key0, key1 + 1)]
-            self.world[key].E_neighbor_position = str((key0 + 1, key1))
-            self.world[key].E_neighbor = self.world[(key0 + 1, key1)]
-            self.world[key].W_neighbor_position = str((key0 -1, key1))
-            self.world[key].W_neighbor = self.world[(key0 - 1, key1)]
-
-    def migrate(self):
+        land_keys = [self._keys[cell] for cell in self.land.tolist()]
+        self.adjacency = self.topology.compile(self.world, land_keys, self.length_y,
+                                               self.length_x)
+        self.land_keys = self.adjacency.keys
+
+    def migrate(self, keys=None, exchange=None):
         """
         If an animal wants to migrate, it must go through the Whole map class migrate function.
-        This function iterates over keys in the map dict, which goes through all tiles that do
-        not belong to the subclass Water.
+        This function iterates over the land keys, which are all tiles that do not belong to the
+        subclass Water.
 
         Any tile belonging to any other landscape can send their migrating Animals to neighboring
         tiles.
 
+        The migration happens in two steps. First every tile sends off the animals that leave
+        it, then the arrivals are added to their destination tiles, sorted by the index of the
+        tile they came from. The result does therefore not depend on the order of the tiles.
+        When the island is split between processes, exchange is the halo step: it sends the
+        arrivals for tiles of other processes away, and returns the local arrivals together with
+        the arrivals received from the other processes.
+
+        Parameters
+
+        keys
+            the tiles to migrate from, all occupied tiles if None
+        exchange
+            function taking and returning a list of arrivals, or None
+
         Updates
 
         removes migrating animals from tiles
-        adds migrating animals to destination tiles
+        adds migrating animals to destination tiles, which become occupied
+        the counters of the tiles animals left or arrived in
         """
-        # goes through each tile and migrates animals that already want to migrate
-        keys = self.map_dict.keys()
-        for key in keys:
-            N = self.world[key].N_neighbor
-            S = self.world[key].S_neighbor
-            E = self.world[key].E_neighbor
-            W = self.world[key].W_neighbor
+        if keys is None:
+            keys = [self._keys[tile.index] for tile in self.active_tiles()]
+        arrivals = self._emigrate(keys)
+        if exchange is not None:
+            arrivals = exchange(arrivals)
+        self._immigrate(arrivals)
+        touched = {self.world[key] for key in keys if key in self.adjacency.index}
+        touched.update(self.world[arrival[0]] for arrival in arrivals)
+        self.track_tiles(sorted(touched, key=lambda tile: tile.index))
+
+    def _emigrate(self, keys):
+        """
+        Removes the migrating animals from the given tiles. Water tiles in keys are passed over.
 
-            if self.map_dict[key] == 'W':
+        Parameters
+        ----------
+        keys
+
+        Returns
+        -------
+        list of arrivals (destination key, source tile index, 'herb' or 'carn', animals), where
+        animals is a list of Animal class objects or a Population
+        """
+        arrivals = []
+        adjacency = self.adjacency
+        for key in keys:
+            number = adjacency.index.get(key)
+            if number is None:
+                continue
+            tile = self.world[key]
+            if not tile.herb and not tile.carn:
                 continue
-            if len(self.world[key].carn) != 0:
+            rng = tile.random_stream('migrate')
+            for species in ('carn', 'herb'):
+                if self.backend == 'array':
+                    moves = self._migrate_population(tile, species, number, rng)
+                else:
+                    moves = self._migrate_animals(tile, species, adjacency.targets[number], rng)
+                for destination, animals in moves.items():
+                    arrivals.append((destination, tile.index, species, animals))
+        return arrivals
+
+    def _immigrate(self, arrivals):
+        """
+        Adds arriving animals to their destination tiles, in order of the source tile index.
+        All arrivals of one species in one tile are merged into it in one step.
+
+        Parameters
+        ----------
+        arrivals
+            list of arrivals as returned by _emigrate
+        """
+        merged = {}
+        for destination, _, species, animals in sorted(arrivals, key=lambda arrival: arrival[1]):
+            merged.setdefault((destination, species), []).append(animals)
+        for (destination, species), groups in merged.items():
+            tile = self.world[destination]
+            if self.backend == 'array':
+                residents = getattr(tile, species)
+                setattr(tile, species,
+                        Population.concatenate(residents.species, [residents] + groups))
+            else:
+                residents = getattr(tile, species)
+                for animals in groups:
+                    residents.extend(animals)
+
+    def neighbor_keys(self, key):
+        """
+        Returns the keys of the cells next to a tile, in the order given by the topology. For
+        the square topology this is N, S, E, W. Keys outside the map are included.
+
+        Parameters
+        ----------
+        key
 
-                migrating_carn_list = [i for i in self.world[key].carn if
-                                       i.migrating is True and i.alive is True]
+        Returns
+        -------
+        list of keys
+        """
+        return self.topology.neighbor_cells(key, self.length_y, self.length_x)
 
-                for i in migrating_carn_list:
-                    destination = random.choice([N, S, E, W])
-                    if destination.accepts_animals is True:
-                        i.migrating = False
-                        destination.carn.append(i)
-                        self.world[key].carn.remove(i)
+    def land_neighbors(self, key):
+        """
+        Returns the keys of the land tiles next to a land tile.
 
-            if len(self.world[key].herb) != 0:
-                migrating_herb_list = [i for i in self.world[key].herb if
-                                       i.migrating is True and i.alive is True]
+        Parameters
+        ----------
+        key
 
-                for i in migrating_herb_list:
-                    destination = random.choice([N, S, E, W])
-                    if destination.accepts_animals is True:
-                        i.migrating = False
-                        destination.herb.append(i)
-                        self.world[key].herb.remove(i)
+        Returns
+        -------
+        list of keys
+        """
+        return self.adjacency.neighbors(key)
+
+    def _migrate_animals(self, tile, species, targets, rng):
+        """
+        Migration for the object backend. Each migrating animal of the given species picks one
+        of the neighbor slots of the tile, and leaves the tile if the neighbor accepts animals.
+        The animals of the tile are split into stayers and leavers in one pass, and the
+        destinations of all leavers are drawn at once.
+
+        Parameters
+        ----------
+        tile
+        species
+        targets
+            the destination key of each neighbor slot, None if it does not accept animals
+        rng
+
+        Returns
+        -------
+        dictionary from destination key to the list of animals going there
+        """
+        animals = getattr(tile, species)
+        stayers, leavers = [], []
+        for animal in animals:
+            if animal.migrating is True and animal.alive is True:
+                leavers.append(animal)
+            else:
+                stayers.append(animal)
+        if not leavers:
+            return {}
+        moves = {}
+        for animal, destination in zip(leavers, rng.choices(targets, k=len(leavers))):
+            if destination is None:
+                stayers.append(animal)
+            else:
+                animal.migrating = False
+                moves.setdefault(destination, []).append(animal)
+        animals[:] = stayers
+        return moves
+
+    def _migrate_population(self, tile, species, number, rng):
+        """
+        Migration for the array backend. Each migrating animal of the given species ('herb' or
+        'carn') picks one of the neighbor slots of the tile, and leaves the tile if the neighbor
+        accepts animals.
+
+        Parameters
+        ----------
+        tile
+        species
+        number
+            the number of the tile in the adjacency table
+        rng
+            NumPy random generator
+
+        Returns
+        -------
+        dictionary from destination key to the Population going there
+        """
+        population = getattr(tile, species)
+        moves = {}
+        leaving = np.flatnonzero(population.migrating & population.alive)
+        if len(leaving) == 0:
+            return moves
+        adjacency = self.adjacency
+        slots = adjacency.destinations[adjacency.indptr[number]:adjacency.indptr[number + 1]]
+        destinations = slots[rng.integers(len(slots), size=len(leaving))]
+        accepted = destinations >= 0
+        movers = leaving[accepted]
+        if len(movers) == 0:
+            return moves
+        order = np.argsort(destinations[accepted], kind='stable')
+        movers = movers[order]
+        destinations = destinations[accepted][order]
+        cells, starts = np.unique(destinations, return_index=True)
+        for cell, start, stop in zip(cells.tolist(), starts.tolist(),
+                                     np.append(starts[1:], len(movers)).tolist()):
+            group = population.select(movers[start:stop])
+            group.migrating[:] = False
+            moves[adjacency.keys[cell]] = group
+        moved = np.zeros(len(population), dtype=bool)
+        moved[movers] = True
+        population.keep(~moved)
+        return moves
 
     def new_year_whole_map(self):
         """
@@ -230,25 +411,212 @@ class Whole_map():
         All tiles run their animals through one years worth of functions.
         """
         # goes through each tile, and runs new year function on each
-        for key in self.map_dict:
-            self.world[key].tile_have_offspring()
-            self.world[key].tile_eat()
-            self.world[key].tile_will_migrate()
-        self.migrate()
-        for key in self.map_dict:
-            self.world[key].tile_aging()
-            self.world[key].tile_weight_loss()
-            self.world[key].tile_dying()
-            self.world[key].tile_reset_parent()
+        profiler = self.profiler
+        if profiler is not None:
+            start = time.perf_counter()
+        if self.engine is not None:
+            self.engine.new_year(self.year)
+        else:
+            self._new_year_tiles(None, None)
 
         self.year += 1
+        if profiler is not None:
+            profiler.end_year(self.year, time.perf_counter() - start)
+
+    def _new_year_tiles(self, keys, exchange):
+        """
+        Runs one year for the given tiles. Used for the whole island in a serial simulation, and
+        for one block of tiles in each worker process of a parallel simulation.
+
+        Parameters
+        ----------
+        keys
+            the tiles to run, or None for the whole island
+        exchange
+            halo step passed on to migrate, None in a serial simulation
+        """
+        if self.streams is not None:
+            self.streams.year = self.year
+        profiler = self.profiler
+        # births only happen in occupied tiles, so only migration adds to the occupied tiles
+        tiles = self.active_tiles(keys)
+        fodder = self._reset_fodder()
+        self._run_phases(tiles, PHASES_BEFORE_MIGRATION, fodder)
+        if profiler is not None:
+            start = time.perf_counter()
+        self.migrate([self._keys[tile.index] for tile in tiles], exchange)
+        if profiler is not None:
+            profiler.add('migrate', time.perf_counter() - start)
+        tiles = self.active_tiles(keys)
+        self._run_phases(tiles, PHASES_AFTER_MIGRATION, fodder)
+        self.track_tiles(tiles)
+
+    def _run_phases(self, tiles, phases, fodder):
+        """
+        Runs the given phases, names of Tile functions, for one tile after the other. The
+        feeding takes the fodder of the tile from the fodder grid and leaves the rest there.
+        If a profiler is attached, every call is timed.
+
+        Parameters
+        ----------
+        tiles
+        phases
+        fodder
+            the flattened fodder grid
+        """
+        profiler = self.profiler
+        for tile in tiles:
+            for name in phases:
+                if profiler is not None:
+                    start = time.perf_counter()
+                if name == 'tile_eat':
+                    tile.tile_eat(fodder[tile.index])
+                    fodder[tile.index] = tile.Fodder
+                else:
+                    getattr(tile, name)()
+                if profiler is not None:
+                    profiler.add(name, time.perf_counter() - start, self._keys[tile.index])
+
+    def active_tiles(self, keys=None):
+        """
+        The occupied tiles, in the order of the cell numbers.
+
+        Parameters
+        ----------
+        keys
+            only the occupied tiles among these keys, or all occupied tiles if None
+
+        Returns
+        -------
+        list of tiles
+        """
+        if keys is None:
+            return [self.tiles[cell] for cell in sorted(self.occupied)]
+        return [tile for tile in (self.world[key] for key in keys) if tile.index in self.occupied]
+
+    def track_tiles(self, tiles):
+        """
+        Counts the animals of the given tiles after their animals changed, and updates the
+        occupied tiles and the counters with them. Called for the tiles that ran a year, and
+        for the tiles animals are added to.
+
+        Parameters
+        ----------
+        tiles
+            list of tiles
+        """
+        self._set_counts([tile.index for tile in tiles],
+                         [tile.count_animals() for tile in tiles])
+
+    def find_occupied(self):
+        """
+        Counts the animals of every land tile. Needed after the animals of the tiles were set
+        from outside of Whole_map, as when a checkpoint is loaded, or when the lists of a tile
+        are assigned directly. Animals added with Tile.add_pop_tile_herb and
+        Tile.add_pop_tile_carn are counted at once.
+        """
+        self._clear_counts()
+        self.occupied = set()
+        self.track_tiles(self.land_tiles)
+
+    def _clear_counts(self):
+        """Sets all counters to zero."""
+        self.tile_counts = np.zeros((len(self.tiles), 2), dtype=np.int64)
+        self.species_counts = np.zeros(2, dtype=np.int64)
+
+    def _set_counts(self, cells, counts):
+        """
+        Sets the number of herbivores and carnivores of some cells, and updates the totals and
+        the occupied tiles.
+
+        Parameters
+        ----------
+        cells
+            list of cell numbers
+        counts
+            list of (herbivores, carnivores), one for every cell
+        """
+        counts = np.array(counts, dtype=np.int64).reshape(-1, 2)
+        self.species_counts += counts.sum(axis=0) - self.tile_counts[cells].sum(axis=0)
+        self.tile_counts[cells] = counts
+        for cell, (herbs, carns) in zip(cells, counts.tolist()):
+            if herbs or carns:
+                self.occupied.add(cell)
+            else:
+                self.occupied.discard(cell)
+
+    def _reset_fodder(self):
+        """
+        Sets the fodder of every cell from the parameters of its landscape, for the start of a
+        year.
+
+        Returns
+        -------
+        the flattened fodder grid
+        """
+        per_landscape = np.array([_landscape_classes[landscape]._compiled.fodder
+                                  for landscape in self._landscapes], dtype=float)
+        self.fodder[...] = per_landscape[self.landscape]
+        return self.fodder.reshape(-1)
+
+    def reset(self, seed=None):
+        """
+        Removes every animal from the island and sets the year back to 0, while the map, the
+        tiles and their neighbors are kept. This allows one generated world to be reused for many
+        simulations, like the points of a parameter sweep.
+
+        Parameters
+        ----------
+        seed
+            seed for the new random streams, or None for the global generators
+        """
+        self.stop_parallel()
+        self.year = 0
+        self.streams = RandomStreams(seed) if seed is not None else None
+        for tile in self.world.values():
+            tile.clear_animals()
+            tile.streams = self.streams
+        self.occupied = set()
+        self._clear_counts()
+
+    def start_parallel(self, num_workers):
+        """
+        Splits the island into blocks of rows, and lets one worker process run the tiles of each
+        block, see parallel.py. Only animals migrating between blocks are sent between the
+        processes. The animals stay in the workers until stop_parallel is called, or until all
+        animals are needed, like in all_animals.
+
+        Parameters
+        ----------
+        num_workers
+        """
+        from biosim.parallel import ParallelEngine
+        if self.engine is not None:
+            self.stop_parallel()
+        self.engine = ParallelEngine(self, num_workers)
+
+    def stop_parallel(self):
+        """
+        Collects the animals from the worker processes back into the tiles, and stops the workers.
+        """
+        if self.engine is None:
+            return
+        engine = self.engine
+        self.engine = None
+        engine.collect()
+        engine.close()
+
+    def _sync(self):
+        """Brings the animals in the tiles up to date if the island runs in parallel."""
+        if self.engine is not None:
+            self.engine.collect()
 
     def add_pop(self,key_herb,key_carn,herb_list, carn_list):
         """
         Adding a population of animals is required in order for the anual cycle to do anything of
         interest.
-        The add pop function allows for adding Herbivores and/or Carnivores to any coordinate.
-        At present, the function allows for adding animals to Water tiles, which is regrettable.
+        The add pop function allows for adding Herbivores and/or Carnivores to any coordinate
+        that is not Water.
 
         Parameters
 
@@ -260,13 +628,51 @@ class Whole_map():
         Returns
         -------
 
+        Raises
+        ------
+        ValueError
+            If a key is a Water tile.
         """
         #adds a population of herbs and carns to a tile "key"
+        if self.engine is not None:
+            raise RuntimeError('Animals can not be added while the island runs in parallel')
+        for key in (key_herb, key_carn):
+            if key is not None and key not in self.adjacency.index:
+                raise ValueError(f'Animals can only be added to land, not to {key}')
         if key_herb is not None:
             self.world[key_herb].add_pop_tile_herb(herb_list)
         if key_carn is not None:
             self.world[key_carn].add_pop_tile_carn(carn_list)
 
+    def add_population(self, population):
+        """
+        Adds animals in the format of BioSim.add_population: a list of dictionaries with a
+        location 'loc' and a list of animals 'pop', where every animal has a 'species', an 'age'
+        and a 'weight'. The animals are added to the animals already in the tiles. BioSim and
+        the batch runs both add their populations with this function.
+
+        Parameters
+        ----------
+        population
+
+        Raises
+        ------
+        ValueError
+            If a location is not land, or a species is unknown.
+        """
+        if self.engine is not None:
+            raise RuntimeError('Animals can not be added while the island runs in parallel')
+        for entry in population:
+            key = entry['loc']
+            if key not in self.adjacency.index:
+                raise ValueError(f'Animals can only be added to land, not to {key}')
+            animals = {'Herbivore': [], 'Carnivore': []}
+            for animal in entry['pop']:
+                if animal['species'] not in animals:
+                    raise ValueError(f"Unknown species: {animal['species']}")
+                animals[animal['species']].append(animal)
+            self.world[key].add_animals(animals['Herbivore'], animals['Carnivore'])
+
     def all_animals(self):
         """
         At different points, it will be useful to be able to interact with every animal present on
@@ -274,25 +680,34 @@ class Whole_map():
         The all animals function goes over every tile on the island, and adds each tile's animals
         to two lists. One for each species.
         These lists contain class objects, that allow for further interaction.
+        With the array backend, one Population per species is returned instead of the lists.
 
         Returns
         -------
         class object lists
         """
         #returns class objects
+        self._sync()
+        if self.backend == 'array':
+            all_herb = Population.concatenate(Animal.Herbivores,
+                                              [tile.herb for tile in self.active_tiles()])
+            all_carn = Population.concatenate(Animal.Carnivores,
+                                              [tile.carn for tile in self.active_tiles()])
+            return all_herb, all_carn
         all_herb = []
         all_carn = []
-        for key in self.world.keys():
-            all_herb.extend(self.world[key].herb)
-            all_carn.extend(self.world[key].carn)
+        for tile in self.active_tiles():
+            all_herb.extend(tile.herb)
+            all_carn.extend(tile.carn)
 
         return all_herb, all_carn
 
     def animal_count_total(self):
         """
-        The animal count total function iterates through every tile on the island, and returns
-        the total amount of herbivores and the total amount of carnivores present on the island.
-        The two returns are integers.
+        The animal count total function returns the total amount of herbivores and the total
+        amount of carnivores present on the island.
+        The two returns are integers. They are read from the counters kept up to date after
+        every year, so no tile is visited.
 
         Returns
         -------
@@ -300,23 +715,25 @@ class Whole_map():
         integer of total amount of Carnivores on the island
         """
         # returns number of herbs and carns on island
-        temp_count_herb = 0
-        temp_count_carn = 0
-        for key in self.map_dict.keys():
-            temp_herb, temp_carn = self.world[key].count_animals()
-            temp_count_herb += temp_herb
-            temp_count_carn += temp_carn
-
+        temp_count_herb, temp_count_carn = self.species_counts.tolist()
         return temp_count_herb, temp_count_carn
 
+    def _count_tile(self, key):
+        """
+        Number of herbivores and carnivores in a tile, from the counters. If the island runs in
+        parallel, these are the counts reported by the workers after the last year.
+        """
+        temp_herb, temp_carn = self.tile_counts[self.world[key].index].tolist()
+        return temp_herb, temp_carn
+
     def animal_count_dict(self):
         """
         In certain instances it might be useful to know which tile has which number of which kind
         of animal.
         Such a detailed overview is made through the animal count dict function.
 
-        This function iterates over every tile in the map, and counts each animal belonging to that
-        tile.
+        This function goes over every tile in the map, and reads the number of each animal
+        belonging to that tile from the counters.
         The resulting dictionary allows for interesting plotting capabilities, such as heatmaps.
 
         Returns
@@ -324,13 +741,47 @@ class Whole_map():
         Dictionary overview of animals belonging to tiles by coordinates
         """
         # returns dictionary that explains the number of herbs and carns in each tile
-        count_dict = {}
-        for key in self.map_dict.keys():
-            temp_herb, temp_carn = self.world[key].count_animals()
-            count_dict.update({key:[temp_herb, temp_carn]})
+        count_dict = dict(zip(self._keys, self.tile_counts.tolist()))
 
         return count_dict
 
+    def count_grid(self, out=None):
+        """
+        The number of herbivores and carnivores in every tile, as an array instead of a
+        dictionary. Entry [y - 1, x - 1] belongs to the tile with key (y, x).
+
+        Parameters
+        ----------
+        out
+            integer array with shape (length_y, length_x, 2) to write the counts into. If None,
+            a new array is made
+
+        Returns
+        -------
+        array with shape (length_y, length_x, 2), the last axis is (herbivores, carnivores)
+        """
+        counts = self.tile_counts.reshape(self.length_y, self.length_x, 2)
+        if out is None:
+            return counts.copy()
+        out[...] = counts
+        return out
+
+    def animal_ranges(self):
+        """
+        Where the animals of every cell are in the lists or populations returned by all_animals.
+        The herbivores of cell number c are entries offsets[0, c]:offsets[0, c + 1] of all_herb,
+        and the carnivores entries offsets[1, c]:offsets[1, c + 1] of all_carn, where
+        c = (y - 1) * length_x + (x - 1) for the tile with key (y, x).
+
+        Returns
+        -------
+        integer array offsets with shape (2, length_y * length_x + 1)
+        """
+        counts = self.count_grid().reshape(-1, 2).T
+        offsets = np.zeros((2, counts.shape[1] + 1), dtype=np.int64)
+        np.cumsum(counts, axis=1, out=offsets[:, 1:])
+        return offsets
+
 
 def animal_parameters(species, param = None):
     """
@@ -363,6 +814,11 @@ def set_landscape_param(landscape, param = None):
     Returns
     -------
     string that describes which landscape got its parameters updated, or if anything went wrong
+
+    Raises
+    ------
+    ValueError
+        If the landscape is unknown, or the parameters are invalid.
     """
     if param is None:
         answer_string = "Parameter input is empty. No parameter was updated"
@@ -384,9 +840,55 @@ def set_landscape_param(landscape, param = None):
         Tile.Desert.set_param(param)
         answer_string = "Desert parameters have been updated"
 
+    if landscape not in Whole_map._landscapes:
+        raise ValueError(f'Unknown landscape: {landscape}')
+
     return answer_string
 
 
+_species_classes = {'Herbivore': Animal.Herbivores, 'Carnivore': Animal.Carnivores}
+_landscape_classes = {'W': Tile.Water, 'L': Tile.Lowland, 'H': Tile.Highland, 'D': Tile.Desert}
+
+
+def all_parameters():
+    """
+    Copies of the parameter dictionaries of every species and landscape, in the format used by
+    set_all_parameters. Used to restore the parameters later, or to store them with a
+    checkpoint.
+
+    Returns
+    -------
+    dictionary from species name or landscape letter to a parameter dictionary
+    """
+    classes = list(_species_classes.items()) + list(_landscape_classes.items())
+    return {name: dict(cls._param) for name, cls in classes}
+
+
+def set_all_parameters(params):
+    """
+    Sets the parameters of any number of species and landscapes at once.
+
+    Parameters
+    ----------
+    params
+        dictionary from a species name ('Herbivore', 'Carnivore') or a landscape letter
+        ('W', 'L', 'H', 'D') to a parameter dictionary, e.g.
+        {'Herbivore': {'zeta': 3.2}, 'L': {'f_max': 700}}
+
+    Raises
+    ------
+    ValueError
+        If a species or landscape is unknown, or the parameters are invalid.
+    """
+    if not params:
+        return
+    for target, values in params.items():
+        if target in Whole_map._landscapes:
+            set_landscape_param(target, values)
+        else:
+            animal_parameters(target, values)
+
+
 if __name__ == "__main__":
 
     print('Nothing to see here')
@@ -0,0 +1,325 @@
+import numpy as np
+from biosim import kernels
+
+
+class Population:
+    """
+    The Population class is the array based alternative to keeping every animal as its own
+    Animal class object.
+    One Population holds every animal of one species in one tile, with the attributes age,
+    weight, fitness, alive, parent and migrating stored as contiguous NumPy arrays.
+    Entry number i in each of the arrays belongs to the same animal.
+
+    The methods mirror the methods in Animal.py, but every method works on the whole population
+    at once. Like for the Animal class objects, the fitness is computed lazily: functions that
+    change ages or weights only mark it as stale, and the whole fitness array is recomputed in
+    one batch the next time Population.fitness is read.
+
+    The species parameters are read from the compiled parameters of the species, so
+    Animal.Herbivores.set_param and Animal.Carnivores.set_param work for both backends.
+    """
+
+    def __init__(self, species, age=None, weight=None):
+        """
+        Creates a population of the given species. Age and weight are sequences of equal length,
+        one entry per animal. Without age and weight, the population is empty.
+
+        Parameters
+        ----------
+        species
+            Animal.Herbivores or Animal.Carnivores
+        age
+        weight
+        """
+        self.species = species
+        self.age = np.array([] if age is None else age, dtype=np.int64)
+        self.weight = np.array([] if weight is None else weight, dtype=float)
+        if len(self.age) != len(self.weight):
+            raise ValueError('age and weight must have the same length')
+        self.alive = self.weight > 0
+        self.parent = self.age != 0
+        self.migrating = np.zeros(len(self.age), dtype=bool)
+        self._fitness = np.zeros(len(self.age))
+        self._fitness_stale = len(self.age) > 0
+
+    @property
+    def fitness(self):
+        """
+        The fitness array of the population, recomputed first if any age or weight has changed
+        since it was last computed.
+        """
+        if self._fitness_stale:
+            self.update_fitness()
+        return self._fitness
+
+    @fitness.setter
+    def fitness(self, value):
+        self._fitness = value
+        self._fitness_stale = False
+
+    @classmethod
+    def from_dicts(cls, species, pop_list):
+        """
+        Creates a population from a list of dictionaries with the keys 'age' and 'weight', the
+        same format as used by Tile.add_pop_tile_herb and Tile.add_pop_tile_carn.
+
+        Parameters
+        ----------
+        species
+        pop_list
+
+        Returns
+        -------
+        Population
+        """
+        if pop_list is None:
+            return cls(species)
+        return cls(species, [animal['age'] for animal in pop_list],
+                   [animal['weight'] for animal in pop_list])
+
+    @classmethod
+    def concatenate(cls, species, populations):
+        """
+        Joins a number of populations of the same species into one new population.
+        Used when every animal on the island is needed at once, like for the histograms.
+
+        Parameters
+        ----------
+        species
+        populations
+
+        Returns
+        -------
+        Population
+        """
+        joined = cls(species)
+        for name in ('age', 'weight', '_fitness', 'alive', 'parent', 'migrating'):
+            arrays = [getattr(pop, name) for pop in populations]
+            if arrays:
+                setattr(joined, name, np.concatenate(arrays))
+        joined._fitness_stale = any(pop._fitness_stale for pop in populations)
+        return joined
+
+    def __len__(self):
+        return len(self.age)
+
+    def select(self, mask):
+        """
+        Returns a new population containing copies of the animals selected by mask, which
+        can be a boolean array or an array of indices.
+
+        Parameters
+        ----------
+        mask
+
+        Returns
+        -------
+        Population
+        """
+        subset = Population(self.species)
+        subset.age = self.age[mask]
+        subset.weight = self.weight[mask]
+        subset._fitness = self._fitness[mask]
+        subset._fitness_stale = self._fitness_stale
+        subset.alive = self.alive[mask]
+        subset.parent = self.parent[mask]
+        subset.migrating = self.migrating[mask]
+        return subset
+
+    def keep(self, mask):
+        """
+        Keeps only the animals selected by the boolean array mask, and removes the rest.
+
+        Parameters
+        ----------
+        mask
+        """
+        self.age = self.age[mask]
+        self.weight = self.weight[mask]
+        self._fitness = self._fitness[mask]
+        self.alive = self.alive[mask]
+        self.parent = self.parent[mask]
+        self.migrating = self.migrating[mask]
+
+    def extend(self, other):
+        """
+        Appends the animals of another population of the same species to this population.
+
+        Parameters
+        ----------
+        other
+        """
+        if len(other) == 0:
+            return
+        self.age = np.concatenate((self.age, other.age))
+        self.weight = np.concatenate((self.weight, other.weight))
+        self._fitness = np.concatenate((self._fitness, other._fitness))
+        self._fitness_stale = self._fitness_stale or other._fitness_stale
+        self.alive = np.concatenate((self.alive, other.alive))
+        self.parent = np.concatenate((self.parent, other.parent))
+        self.migrating = np.concatenate((self.migrating, other.migrating))
+
+    def update_fitness(self):
+        """
+        Calculates the fitness of every animal in the population with the same formula as
+        Animal.update_fitness.
+        Animals with a weight of zero or less are marked as dead, and keep their old fitness.
+        All fitness values are computed in one batch, with the age factors looked up in the
+        table of the species.
+
+        Updates
+        -------
+        Population.fitness
+        Population.alive
+        """
+        param = self.species._compiled
+        positive = self.weight > 0
+        self.alive &= positive
+        if len(self.age) == 0:
+            self._fitness_stale = False
+            return
+        q_positive = self.species.age_factor_array(int(self.age.max()))[self.age]
+        q_negative = 1 / (1 + np.exp(-(param.phi_weight * (self.weight - param.w_half))))
+        self.fitness = np.where(positive, q_positive * q_negative, self._fitness)
+
+    def have_offspring(self, rng):
+        """
+        Every animal that is a parent and heavy enough gives birth with the probability
+        min(1, gamma * fitness * N), where N is the number of animals in the population.
+        Like in Animal.have_offspring, the mother only loses weight, and stops being a parent for
+        the year, if she can afford the newborns weight times xi.
+
+        Parameters
+        ----------
+        rng
+            numpy random Generator
+
+        Returns
+        -------
+        Population with the newborns
+        """
+        param = self.species._compiled
+        n = len(self)
+        newborns = Population(self.species)
+        if n == 0:
+            return newborns
+        eligible = self.parent & (self.weight >= param.birth_threshold)
+        probability = np.minimum(1.0, param.gamma * self.fitness * n)
+        births = np.flatnonzero(eligible & (rng.random(n) < probability))
+        if len(births) == 0:
+            return newborns
+        newborn_weight = rng.lognormal(param.my, param.sigma, len(births))
+        affordable = self.weight[births] - newborn_weight * param.xi > 0
+        mothers = births[affordable]
+        self.weight[mothers] -= newborn_weight[affordable] * param.xi
+        self.parent[mothers] = False
+        self._fitness_stale = True
+        return Population(self.species, np.zeros(len(births), dtype=np.int64), newborn_weight)
+
+    def eat_fodder(self, fodder, rng):
+        """
+        Herbivores eat fodder in a random order. Each animal eats its appetite F if there is enough
+        fodder left, otherwise the rest of the fodder. The intakes are computed in one batch by
+        kernels.fodder_intake, and no random order is drawn when there is no fodder or enough of
+        it for every animal.
+
+        Parameters
+        ----------
+        fodder
+        rng
+
+        Returns
+        -------
+        the remaining fodder
+        """
+        param = self.species._compiled
+        intake, fodder = kernels.fodder_intake(fodder, param.F, len(self))
+        if len(intake) == 0:
+            return fodder
+        if len(intake) < len(self) or intake[-1] < param.F:
+            # only the order decides who goes short
+            self.weight[rng.permutation(len(self))[:len(intake)]] += param.beta * intake
+        else:
+            self.weight += param.beta * intake
+        self._fitness_stale = True
+        return fodder
+
+    def hunt(self, prey, rng):
+        """
+        Carnivores hunt in order of decreasing fitness, and try to kill the herbivores in order of
+        increasing fitness, with the same probabilities as in Carnivores.eat, see kernels.hunt.
+        Killed herbivores are removed from the prey population.
+
+        Parameters
+        ----------
+        prey
+            herbivore Population of the same tile
+        rng
+        """
+        if len(self) == 0 or len(prey) == 0:
+            return
+        age_factor = self.species.age_factor_array(int(self.age.max()))[self.age]
+        killed, self.weight, self.fitness = kernels.hunt(
+            self.fitness, self.weight, age_factor, prey.fitness, prey.weight,
+            self.species._compiled, rng, prey.alive)
+        prey.alive[killed] = False
+        prey.keep(prey.alive)
+
+    def will_migrate(self, rng):
+        """
+        Every animal decides to migrate with the probability mu * fitness.
+
+        Parameters
+        ----------
+        rng
+
+        Updates
+        -------
+        Population.migrating
+        """
+        self.migrating |= rng.random(len(self)) <= self.species._compiled.mu * self.fitness
+
+    def aging(self):
+        """
+        Every animal gets one year older.
+
+        Updates
+        -------
+        Population.age
+        """
+        self.age += 1
+        self._fitness_stale = True
+
+    def weight_loss(self):
+        """
+        Every animal loses the fraction eta of its weight.
+
+        Updates
+        -------
+        Population.weight
+        """
+        self.weight -= self.species._compiled.eta * self.weight
+        self._fitness_stale = True
+
+    def dying(self, rng):
+        """
+        Animals with no weight left die, and the others die with the probability
+        omega * (1 - fitness). The dead animals are removed from the population.
+
+        Parameters
+        ----------
+        rng
+        """
+        dead = (self.weight <= 0) | (rng.random(len(self))
+                                     <= self.species._compiled.omega * (1 - self.fitness))
+        self.keep(self.alive & ~dead)
+
+    def reset_parent(self):
+        """
+        Every animal is allowed to have offspring again next year.
+
+        Updates
+        -------
+        Population.parent
+        """
+        self.parent[:] = True
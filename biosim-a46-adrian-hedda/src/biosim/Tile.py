@@ -1,5 +1,33 @@
+import numbers
 import random
+import numpy as np
 from biosim import Animal
+from biosim.Population import Population
+
+# random generator used by the array backend
+_array_rng = np.random.default_rng()
+
+
+class LandscapeParameters:
+    """
+    LandscapeParameters is the compiled, immutable version of the parameter dictionary of a
+    landscape. The tiles read the fodder from here every year, instead of from the dictionary.
+    A new object is compiled every time set_param changes the parameters of the landscape.
+    """
+    __slots__ = ('fodder', 'accepts_animals')
+
+    def __init__(self, param):
+        """
+        Parameters
+        ----------
+        param
+            the parameter dictionary of the landscape
+        """
+        object.__setattr__(self, 'fodder', param['Fodder'])
+        object.__setattr__(self, 'accepts_animals', param['Accepts_animals'])
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Compiled parameters can not be changed, use set_param')
 
 
 class Tile:
@@ -10,8 +38,21 @@ class Tile:
     the world is generated from a map dictionary.
     Once updated, the adjacent neighbor values allows for interaction between tiles for sending and
     receiving migrating animals.
+
+    A tile uses one of two population backends. With the 'object' backend the herb and carn
+    attributes are lists of Animal class objects. With the 'array' backend they are Population
+    objects, which keep the attributes of every animal in NumPy arrays, and every yearly
+    function runs as array operations over the whole population of the tile.
     """
     _param = {}
+    _compiled = None
+    _backends = ['object', 'array']
+    # alternative names accepted by set_param
+    _param_aliases = {'f_max': 'Fodder'}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._compiled = LandscapeParameters(cls._param)
 
     def add_pop_tile_herb(self, herb_list):
         """
@@ -30,13 +71,17 @@ class Tile:
         -------
         The herbivore list belonging to a specific tile
         """
-        self.herb = []
-        if herb_list is not None:
-            x = 0
-            for _ in herb_list:
-                herb_i = Animal.Herbivores(herb_list[x]['age'], herb_list[x]['weight'])
-                self.herb.append(herb_i)
-                x += 1
+        if self.backend == 'array':
+            self.herb = Population.from_dicts(Animal.Herbivores, herb_list)
+        else:
+            self.herb = []
+            if herb_list is not None:
+                x = 0
+                for _ in herb_list:
+                    herb_i = Animal.Herbivores(herb_list[x]['age'], herb_list[x]['weight'])
+                    self.herb.append(herb_i)
+                    x += 1
+        self._animals_changed()
 
     def add_pop_tile_carn(self, carn_list):
         """
@@ -51,13 +96,42 @@ class Tile:
         -------
         Carnivore class objects belonging to the carnicore list of a specific tile.
         """
-        self.carn = []
-        if carn_list is not None:
-            x = 0
-            for _ in carn_list:
-                carn_i = Animal.Carnivores(carn_list[x]['age'], carn_list[x]['weight'])
-                self.carn.append(carn_i)
-                x += 1
+        if self.backend == 'array':
+            self.carn = Population.from_dicts(Animal.Carnivores, carn_list)
+        else:
+            self.carn = []
+            if carn_list is not None:
+                x = 0
+                for _ in carn_list:
+                    carn_i = Animal.Carnivores(carn_list[x]['age'], carn_list[x]['weight'])
+                    self.carn.append(carn_i)
+                    x += 1
+        self._animals_changed()
+
+    def add_animals(self, herb_list, carn_list):
+        """
+        Adds herbivores and carnivores to the animals already in the tile, unlike
+        add_pop_tile_herb and add_pop_tile_carn, which replace them.
+
+        Parameters
+        ----------
+        herb_list
+            list of dictionaries with 'age' and 'weight'
+        carn_list
+            list of dictionaries with 'age' and 'weight'
+        """
+        if self.backend == 'array':
+            self.herb.extend(Population.from_dicts(Animal.Herbivores, herb_list))
+            self.carn.extend(Population.from_dicts(Animal.Carnivores, carn_list))
+        else:
+            self.herb.extend(Animal.Herbivores(herb['age'], herb['weight']) for herb in herb_list)
+            self.carn.extend(Animal.Carnivores(carn['age'], carn['weight']) for carn in carn_list)
+        self._animals_changed()
+
+    def _animals_changed(self):
+        """Tells the island the tile belongs to that the animals of the tile changed."""
+        if self.on_change is not None:
+            self.on_change([self])
 
     def tile_have_offspring(self):
         """
@@ -73,23 +147,33 @@ class Tile:
         -------
         extends tiles animal lists with newborns of both species
         """
+        if not self.herb and not self.carn:
+            return
+        rng = self.random_stream('offspring')
+        if self.backend == 'array':
+            self.herb.extend(self.herb.have_offspring(rng))
+            self.carn.extend(self.carn.have_offspring(rng))
+            return
+
         # Herbivores have offspring
+        Animal.Herbivores.refresh_fitness(self.herb)
         newborn_list_herb = []
         for i in self.herb:
-            newborn = i.have_offspring(self.herb)
+            newborn = i.have_offspring(self.herb, rng)
             if newborn is not None:
                 newborn_list_herb.append(newborn)
         self.herb.extend(newborn_list_herb)
 
         # Carnivores have offspring
+        Animal.Carnivores.refresh_fitness(self.carn)
         newborn_list_carn = []
         for i in self.carn:
-            newborn = i.have_offspring(self.carn)
+            newborn = i.have_offspring(self.carn, rng)
             if newborn is not None:
                 newborn_list_carn.append(newborn)
         self.carn.extend(newborn_list_carn)
 
-    def tile_eat(self):
+    def tile_eat(self, fodder=None):
         """
         The second yearly task of animals is to eat.
         the tile eat function iterates over every animal belonging to that tile, and tells it to
@@ -101,24 +185,34 @@ class Tile:
         and eat the Herbivores of least fitness first, and will attempt to eat Herbivores of
         increasing fitness as their appetite dictates them to try.
 
+        Parameters
+        ----------
+        fodder
+            the fodder of the tile at the start of the year, from the parameters of the
+            landscape if None. Whole_map passes it from its fodder grid
+
         Returns
         -------
 
         """
-        ini_Fodder = self._param['Fodder']
-        self.Fodder = ini_Fodder
+        self.Fodder = self._compiled.fodder if fodder is None else fodder
+
+        if not self.herb and not self.carn:
+            return
+        rng = self.random_stream('eat')
+        if self.backend == 'array':
+            self.Fodder = self.herb.eat_fodder(self.Fodder, rng)
+            self.carn.hunt(self.herb, rng)
+            return
 
         # Harbivores eat in random order
-        random.shuffle(self.herb)
-        for i in self.herb:
-            self.Fodder = i.eat(self.Fodder)
+        self.Fodder = Animal.Herbivores.feed(self.herb, self.Fodder, rng)
 
         # Carnivores eat in order of the highest fitness,
         # and hunting prey in order of the lowest fitness
-        self.herb.sort(key=lambda x: x.fitness)
-        self.carn.sort(key=lambda x: x.fitness, reverse=True)
-        for i in self.carn:
-            i.eat(self.herb)
+        Animal.Herbivores.refresh_fitness(self.herb)
+        Animal.Carnivores.refresh_fitness(self.carn)
+        Animal.Carnivores.hunt(self.carn, self.herb, rng)
 
     def tile_will_migrate(self):
         """
@@ -131,10 +225,19 @@ class Tile:
         -------
         updated will migrate values for class objects belonging to the tile
         """
+        if not self.herb and not self.carn:
+            return
+        rng = self.random_stream('will_migrate')
+        if self.backend == 'array':
+            self.herb.will_migrate(rng)
+            self.carn.will_migrate(rng)
+            return
+        Animal.Herbivores.refresh_fitness(self.herb)
+        Animal.Carnivores.refresh_fitness(self.carn)
         for herb in self.herb:
-            herb.will_migrate()
+            herb.will_migrate(rng)
         for carn in self.carn:
-            carn.will_migrate()
+            carn.will_migrate(rng)
 
     def tile_aging(self):
         """
@@ -145,6 +248,10 @@ class Tile:
         -------
         Animals age attribute
         """
+        if self.backend == 'array':
+            self.herb.aging()
+            self.carn.aging()
+            return
         for herb in self.herb:
             herb.aging()
         for carn in self.carn:
@@ -160,6 +267,10 @@ class Tile:
         -------
         Animals weight attribute
         """
+        if self.backend == 'array':
+            self.herb.weight_loss()
+            self.carn.weight_loss()
+            return
         for herb in self.herb:
             herb.weight_loss()
         for carn in self.carn:
@@ -182,13 +293,43 @@ class Tile:
         -------
         new animal lists for herbivores and carnivores belonging to the specific tile
         """
+        if not self.herb and not self.carn:
+            return
+        rng = self.random_stream('dying')
+        if self.backend == 'array':
+            self.herb.dying(rng)
+            self.carn.dying(rng)
+            return
+        Animal.Herbivores.refresh_fitness(self.herb)
+        Animal.Carnivores.refresh_fitness(self.carn)
         for herb in self.herb:
-            herb.dying()
+            herb.dying(rng)
         self.herb = [i for i in self.herb if i.alive is True]
         for carn in self.carn:
-            carn.dying()
+            carn.dying(rng)
         self.carn = [i for i in self.carn if i.alive is True]
 
+    def random_stream(self, phase):
+        """
+        Returns the random number generator the tile uses in a phase of the year.
+        If the tile belongs to a seeded island, this is the stream of the tile for the phase and
+        the current year, see random_streams.py. Otherwise it is the random module for the object
+        backend, and a shared NumPy generator for the array backend.
+
+        Parameters
+        ----------
+        phase
+
+        Returns
+        -------
+        random number generator
+        """
+        if self.streams is None:
+            return _array_rng if self.backend == 'array' else random
+        if self.backend == 'array':
+            return self.streams.numpy(self.index, phase)
+        return self.streams.python(self.index, phase)
+
     def tile_reset_parent(self):
         """
         In addition the the anual cycle, we decided on a safety net for our animals, to ensure that
@@ -205,6 +346,10 @@ class Tile:
         animals parent attribute
         """
         # Reset parent to True so they can have offspring next year
+        if self.backend == 'array':
+            self.herb.reset_parent()
+            self.carn.reset_parent()
+            return
         for herb in self.herb:
             herb.parent = True
         for carn in self.carn:
@@ -223,11 +368,31 @@ class Tile:
         ----------
         param_input
 
+        The input is validated before anything is changed, and the parameters are then compiled
+        into a new LandscapeParameters object. The name 'f_max' is accepted for 'Fodder'.
+
         Returns
         -------
         the new class parameters
+
+        Raises
+        ------
+        ValueError
+            If a parameter is unknown, or has an invalid value.
         """
+        param_input = {cls._param_aliases.get(key, key): value
+                       for key, value in param_input.items()}
+        for key, value in param_input.items():
+            if key not in cls._param:
+                raise ValueError(f'Unknown parameter for {cls.__name__}: {key}')
+            if key == 'Accepts_animals':
+                if not isinstance(value, (bool, np.bool_)):
+                    raise ValueError('Parameter Accepts_animals must be True or False')
+            elif isinstance(value, (bool, np.bool_)) or not isinstance(value, numbers.Real) \
+                    or value < 0:
+                raise ValueError(f'Parameter {key} must be a non-negative number')
         cls._param.update(param_input)
+        cls._compiled = LandscapeParameters(cls._param)
         return cls._param
 
     def count_animals(self):
@@ -253,25 +418,42 @@ class Tile:
         -------
 
         """
-        ini_Fodder = self._param['Fodder']
+        ini_Fodder = self._compiled.fodder
         self.Fodder = ini_Fodder
         return ini_Fodder
 
-    def __init__(self):
+    def __init__(self, backend='object'):
+        """
+        the tile init sets initial herbivore and carnivore lists to empty lists. The neighbors of
+        the tile are kept by the island, see Whole_map.find_neighbors.
+        With the array backend, the empty lists are replaced by empty Population objects.
+
+        Parameters
+        ----------
+        backend
+            'object' or 'array'
+        """
+        if backend not in self._backends:
+            raise ValueError(f'Unknown population backend: {backend}')
+        self.backend = backend
+        # set by Whole_map when the tile is part of a seeded island
+        self.streams = None
+        self.index = 0
+        # set by Whole_map to its track_tiles, so animals added to the tile are simulated
+        self.on_change = None
+        self.clear_animals()
+
+    def clear_animals(self):
         """
-        the tile init sets initial herbivore and carnivore lists to empty lists, and adjacent
-        neighbors to None.
+        Removes every animal from the tile, leaving empty lists, or empty populations for the
+        array backend.
         """
-        self.N_neighbor_position = None
-        self.N_neighbor = None
-        self.S_neighbor_position = None
-        self.S_neighbor = None
-        self.W_neighbor_position = None
-        self.W_neighbor = None
-        self.E_neighbor_position = None
-        self.E_neighbor = None
-        self.carn = []
-        self.herb = []
+        if self.backend == 'array':
+            self.carn = Population(Animal.Carnivores)
+            self.herb = Population(Animal.Herbivores)
+        else:
+            self.carn = []
+            self.herb = []
 
 
 class Lowland(Tile):
@@ -281,8 +463,9 @@ class Lowland(Tile):
     Carnivores, should thrive here.
     """
     _param = {'Accepts_animals': True, 'Fodder': 800}
-    def __init__(self):
-        super().__init__()
+
+    def __init__(self, backend='object'):
+        super().__init__(backend)
         self.accepts_animals = True
 
 
@@ -294,8 +477,9 @@ class Highland(Tile):
     This lower weight gain has many implications for how the simulation evolves.
     """
     _param = {'Accepts_animals': True, 'Fodder': 400}
-    def __init__(self):
-        super().__init__()
+
+    def __init__(self, backend='object'):
+        super().__init__(backend)
         self.accepts_animals = True
 
 
@@ -307,8 +491,9 @@ class Desert(Tile):
     already.
     """
     _param = {'Accepts_animals': True, 'Fodder': 0}
-    def __init__(self):
-        super().__init__()
+
+    def __init__(self, backend='object'):
+        super().__init__(backend)
         self.accepts_animals = True
 
 
@@ -318,8 +503,9 @@ class Water(Tile):
     should the animals learn to swim, the programmers will have to learn to fish out of bounds.
     """
     _param = {'Accepts_animals': False, 'Fodder': 0}
-    def __init__(self):
-        super().__init__()
+
+    def __init__(self, backend='object'):
+        super().__init__(backend)
         self.accepts_animals = False
 
 
@@ -337,11 +523,17 @@ def set_animal_param(species, param = None):
     Returns
     -------
     string explaining the action taken by the function
+
+    Raises
+    ------
+    ValueError
+        If the species is unknown, or the parameters are invalid.
     """
     if param is None:
         return
     if species =='Herbivore':
         Animal.Herbivores.set_param(param)
-
-    if species == 'Carnivore':
-        Animal.Carnivores.set_param(param)
\ No newline at end of file
+    elif species == 'Carnivore':
+        Animal.Carnivores.set_param(param)
+    else:
+        raise ValueError(f'Unknown species: {species}')
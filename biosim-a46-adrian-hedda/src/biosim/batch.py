@@ -0,0 +1,213 @@
+"""
+Batch runs of BioSim without graphics.
+
+run_ensemble runs replicates of one simulation with different seeds in a pool of processes, and
+run_sweep does the same for every point in a grid of parameters.
+The world is generated from the map once, in the calling process, and shared with the workers as
+a template. With fork, the workers share it without copying, otherwise it is pickled once for
+each worker. Before every run, a worker only resets the template and sets the parameters of the
+run. Each worker only sends the number of animals per species and year back, never the island.
+"""
+
+import itertools
+import multiprocessing
+import numpy as np
+from biosim import Island
+
+# set in each worker by _init_worker
+_template = None
+_defaults = None
+
+
+def _init_worker(template, defaults):
+    """Stores the world template and the default parameters in a worker process."""
+    global _template, _defaults
+    _template = template
+    _defaults = defaults
+
+
+def _run_task(task):
+    """
+    Runs one simulation on the world template, and returns the number of herbivores and
+    carnivores at the start and after every year.
+
+    Parameters
+    ----------
+    task
+        tuple (ini_pop, seed, num_years, params)
+
+    Returns
+    -------
+    integer array with shape (num_years + 1, 2)
+    """
+    ini_pop, seed, num_years, params = task
+    Island.set_all_parameters(_defaults)
+    Island.set_all_parameters(params)
+    island = _template
+    island.reset(seed)
+    island.add_population(ini_pop)
+    counts = np.zeros((num_years + 1, 2), dtype=np.int64)
+    counts[0] = island.animal_count_total()
+    for year in range(num_years):
+        island.new_year_whole_map()
+        counts[year + 1] = island.animal_count_total()
+    return counts
+
+
+def summarize(counts, quantiles=(0.05, 0.5, 0.95)):
+    """
+    Aggregates the counts of a number of replicates.
+
+    Parameters
+    ----------
+    counts
+        array with shape (replicates, years + 1, 2)
+    quantiles
+        the quantiles to compute over the replicates
+
+    Returns
+    -------
+    dictionary with the mean, the quantiles and a 95 % confidence interval of the mean, each
+    with shape (years + 1, 2)
+    """
+    counts = np.asarray(counts, dtype=float)
+    mean = counts.mean(axis=0)
+    if len(counts) > 1:
+        half_width = 1.96 * counts.std(axis=0, ddof=1) / np.sqrt(len(counts))
+    else:
+        half_width = np.zeros_like(mean)
+    return {'mean': mean,
+            'quantiles': {q: np.quantile(counts, q, axis=0) for q in quantiles},
+            'ci_low': mean - half_width,
+            'ci_high': mean + half_width}
+
+
+def run_ensemble(island_map, ini_pop, seeds, num_years, params=None, processes=None,
+                 backend='object', quantiles=(0.05, 0.5, 0.95)):
+    """
+    Runs one replicate of the simulation for every seed, in a pool of worker processes.
+
+    Parameters
+    ----------
+    island_map : str
+        Multi-line string specifying island geography
+    ini_pop : list
+        Initial population, in the same format as for BioSim
+    seeds : list
+        One seed per replicate
+    num_years : int
+        Number of years to simulate
+    params : dict
+        Parameters to set before simulating, from species name or landscape letter to a
+        parameter dictionary, e.g. {'Herbivore': {'zeta': 3.2}, 'L': {'f_max': 700}}
+    processes : int
+        Number of worker processes, all processors if None. With 1, the replicates run in the
+        calling process.
+    backend : str
+        Population backend, 'object' or 'array'
+    quantiles : tuple
+        Quantiles to compute over the replicates
+
+    Returns
+    -------
+    dictionary with
+
+    - 'years': the years, from 0 to num_years
+    - 'counts': array with shape (replicates, num_years + 1, 2), the number of herbivores and
+      carnivores in every replicate and year
+    - 'mean', 'quantiles', 'ci_low', 'ci_high': see summarize
+    """
+    tasks = [(ini_pop, seed, num_years, params) for seed in seeds]
+    counts = np.stack(_run_tasks(island_map, backend, tasks, processes))
+    summary = summarize(counts, quantiles)
+    summary.update({'years': np.arange(num_years + 1), 'counts': counts})
+    return summary
+
+
+def _run_tasks(island_map, backend, tasks, processes):
+    """
+    Generates the world template once, and runs the tasks on it, in the calling process if
+    processes is 1, and in a pool of worker processes otherwise.
+    The parameters of the calling process are restored afterwards.
+    """
+    template = Island.Whole_map(backend)
+    template.sim_world(island_map)
+    defaults = Island.all_parameters()
+    if processes == 1:
+        _init_worker(template, defaults)
+        try:
+            return [_run_task(task) for task in tasks]
+        finally:
+            Island.set_all_parameters(defaults)
+    with multiprocessing.Pool(processes, initializer=_init_worker,
+                              initargs=(template, defaults)) as pool:
+        return pool.map(_run_task, tasks, chunksize=1)
+
+
+def sweep_points(grid):
+    """
+    Lists every combination of parameter values in a grid.
+
+    Parameters
+    ----------
+    grid
+        dictionary from species name or landscape letter to a dictionary from parameter name
+        to a list of values, e.g. {'Herbivore': {'beta': [0.8, 0.9]}, 'L': {'f_max': [600, 800]}}
+
+    Returns
+    -------
+    list of parameter dictionaries in the format used by run_ensemble, one per combination
+    """
+    axes = [(target, name, values) for target, param in grid.items()
+            for name, values in param.items()]
+    points = []
+    for combination in itertools.product(*[values for _, _, values in axes]):
+        point = {}
+        for (target, name, _), value in zip(axes, combination):
+            point.setdefault(target, {})[name] = value
+        points.append(point)
+    return points
+
+
+def run_sweep(island_map, ini_pop, grid, num_years, seeds=(1,), processes=None,
+              backend='object', quantiles=(0.05, 0.5, 0.95)):
+    """
+    Runs replicates of the simulation for every point in a grid of parameters.
+    The world is only generated once, see the top of this file.
+
+    Parameters
+    ----------
+    island_map : str
+    ini_pop : list
+    grid : dict
+        Grid of parameter values, see sweep_points
+    num_years : int
+    seeds : list
+        One replicate is run for each seed at each point
+    processes : int
+    backend : str
+    quantiles : tuple
+
+    Returns
+    -------
+    dictionary with
+
+    - 'points': list of the parameter dictionaries of the points
+    - 'years': the years, from 0 to num_years
+    - 'counts': array with shape (points, seeds, num_years + 1, 2)
+    - 'mean', 'quantiles', 'ci_low', 'ci_high': summaries over the seeds, with shape
+      (points, num_years + 1, 2)
+    """
+    points = sweep_points(grid)
+    tasks = [(ini_pop, seed, num_years, point) for point in points for seed in seeds]
+    results = _run_tasks(island_map, backend, tasks, processes)
+    counts = np.stack(results).reshape(len(points), len(seeds), num_years + 1, 2)
+    summaries = [summarize(point_counts, quantiles) for point_counts in counts]
+    return {'points': points,
+            'years': np.arange(num_years + 1),
+            'counts': counts,
+            'mean': np.stack([summary['mean'] for summary in summaries]),
+            'quantiles': {q: np.stack([summary['quantiles'][q] for summary in summaries])
+                          for q in quantiles},
+            'ci_low': np.stack([summary['ci_low'] for summary in summaries]),
+            'ci_high': np.stack([summary['ci_high'] for summary in summaries])}
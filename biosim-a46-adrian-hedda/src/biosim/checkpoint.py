@@ -0,0 +1,197 @@
+"""
+Checkpoints of the full state of a simulation.
+
+A checkpoint is one .npz file of plain NumPy arrays, no pickled objects. The animals are stored
+column by column: for each species one array per attribute, with one entry per animal on the
+island, and an array with the index of the tile each animal lives in. The animals are written in
+the order of the tiles, so on loading every column is cut into tiles with one np.searchsorted, and
+the array backend gets its populations without looking at single animals.
+
+Everything else, the map, the year, the seed, the parameters of every species and landscape and
+the state of the global random generators, is stored as JSON in the array 'meta'.
+"""
+
+import gc
+import json
+import random
+import numpy as np
+from biosim import Animal
+from biosim import Island
+from biosim import Tile
+from biosim.Population import Population
+
+FORMAT_VERSION = 1
+
+_species = {'herb': Animal.Herbivores, 'carn': Animal.Carnivores}
+_columns = ('age', 'weight', 'fitness', 'stale', 'parent', 'migrating')
+
+
+def _object_columns(animals):
+    """The columns of a list of Animal class objects."""
+    return {'age': [animal.age for animal in animals],
+            'weight': [animal.weight for animal in animals],
+            'fitness': [animal._fitness for animal in animals],
+            'stale': [animal._fitness_stale for animal in animals],
+            'parent': [animal.parent for animal in animals],
+            'migrating': [animal.migrating for animal in animals]}
+
+
+def _population_columns(population):
+    """The columns of a Population."""
+    return {'age': population.age,
+            'weight': population.weight,
+            'fitness': population._fitness,
+            'stale': np.full(len(population), population._fitness_stale),
+            'parent': population.parent,
+            'migrating': population.migrating}
+
+
+def save(island, path, island_map, seed=None, extra=None):
+    """
+    Writes the state of an island to a checkpoint file.
+
+    Parameters
+    ----------
+    island
+        Whole_map
+    path
+        file name of the checkpoint, NumPy adds .npz if it is missing
+    island_map
+        the map string the island was created from
+    seed
+        the seed of the simulation
+    extra
+        dictionary of further JSON data to store with the checkpoint
+    """
+    island._sync()
+    tiles = list(island.world.values())
+    arrays = {}
+    for prefix, species in _species.items():
+        groups = [getattr(tile, prefix) for tile in tiles]
+        sizes = np.array([len(group) for group in groups], dtype=np.int64)
+        arrays[prefix + '_tile'] = np.repeat(np.arange(len(tiles), dtype=np.int32), sizes)
+        if island.backend == 'array':
+            parts = [_population_columns(group) for group in groups]
+        else:
+            parts = [_object_columns(group) for group in groups]
+        for column in _columns:
+            dtype = bool if column in ('stale', 'parent', 'migrating') else \
+                np.int64 if column == 'age' else float
+            values = [np.asarray(part[column], dtype=dtype) for part in parts]
+            arrays[prefix + '_' + column] = np.concatenate(values) if values \
+                else np.zeros(0, dtype=dtype)
+    version, internal_state, gauss_next = random.getstate()
+    arrays['random_state'] = np.array(internal_state, dtype=np.uint32)
+    meta = {'version': FORMAT_VERSION,
+            'island_map': island_map,
+            'backend': island.backend,
+            'topology': island.topology.name,
+            'year': island.year,
+            'seed': seed,
+            'stream_seed': None if island.streams is None else island.streams.seed,
+            'params': Island.all_parameters(),
+            'random_version': version,
+            'random_gauss_next': gauss_next,
+            'numpy_state': Tile._array_rng.bit_generator.state,
+            'extra': extra or {}}
+    np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def _animals(species, columns, start, stop):
+    """
+    Creates the Animal class objects for the entries start to stop of the columns. The animals
+    are made without __init__, which would compute the fitness that is already stored.
+    """
+    rows = zip(*[columns[column][start:stop].tolist() for column in _columns])
+    animals = []
+    for age, weight, fitness, stale, parent, migrating in rows:
+        animal = species.__new__(species)
+        animal.age = age
+        animal.weight = weight
+        animal._fitness = fitness
+        animal._fitness_stale = stale
+        animal.parent = parent
+        animal.migrating = migrating
+        animal.alive = True
+        animals.append(animal)
+    return animals
+
+
+def _population(species, columns, start, stop):
+    """Creates the Population for the entries start to stop of the columns."""
+    population = Population(species)
+    population.age = columns['age'][start:stop]
+    population.weight = columns['weight'][start:stop]
+    population._fitness = columns['fitness'][start:stop]
+    population._fitness_stale = bool(columns['stale'][start:stop].any())
+    population.parent = columns['parent'][start:stop]
+    population.migrating = columns['migrating'][start:stop]
+    population.alive = np.ones(stop - start, dtype=bool)
+    return population
+
+
+def load(path):
+    """
+    Reads a checkpoint file, and restores the parameters of every species and landscape and
+    the state of the global random generators.
+
+    Parameters
+    ----------
+    path
+        file name of the checkpoint
+
+    Returns
+    -------
+    (island, meta), the restored Whole_map and the dictionary of metadata, with the keys
+    'island_map', 'seed', 'year' and 'extra' among others
+
+    Raises
+    ------
+    ValueError
+        If the file is not a checkpoint of a version this module can read.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if 'meta' not in data.files:
+            raise ValueError(f'{path} is not a BioSim checkpoint')
+        meta = json.loads(str(data['meta']))
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f'Unsupported checkpoint version: {meta.get("version")}')
+        arrays = {name: data[name] for name in data.files if name != 'meta'}
+
+    Island.set_all_parameters(meta['params'])
+    island = Island.Whole_map(meta['backend'], meta['stream_seed'],
+                              meta.get('topology', 'square'))
+    island.sim_world(meta['island_map'])
+    island.year = meta['year']
+    if island.streams is not None:
+        island.streams.year = island.year
+
+    tiles = list(island.world.values())
+    # millions of new objects would otherwise trigger many full garbage collections
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        _fill_tiles(island, tiles, arrays)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    island.find_occupied()
+
+    random.setstate((meta['random_version'], tuple(arrays['random_state'].tolist()),
+                     meta['random_gauss_next']))
+    Tile._array_rng.bit_generator.state = meta['numpy_state']
+    return island, meta
+
+
+def _fill_tiles(island, tiles, arrays):
+    """Cuts the columns of the checkpoint into tiles, and gives every tile its animals."""
+    for prefix, species in _species.items():
+        columns = {column: arrays[prefix + '_' + column] for column in _columns}
+        bounds = np.searchsorted(arrays[prefix + '_tile'], np.arange(len(tiles) + 1))
+        for tile, start, stop in zip(tiles, bounds[:-1].tolist(), bounds[1:].tolist()):
+            if start == stop:
+                continue
+            if island.backend == 'array':
+                setattr(tile, prefix, _population(species, columns, start, stop))
+            else:
+                setattr(tile, prefix, _animals(species, columns, start, stop))
@@ -0,0 +1,204 @@
+"""
+Writing the number of animals per year to a log file.
+
+The CountLogger keeps the rows of a number of years in a preallocated NumPy buffer, and only
+writes to disk when the buffer is full, when flush is called, or when the logger is closed.
+With background=True, the full buffers are written by a separate thread, so the yearly loop
+never waits for the disk.
+
+Two formats are supported:
+
+- 'csv': plain text with a header line, one line per year
+- 'binary': a header line with a magic string and the column names as JSON, followed by one
+  record of little-endian 64 bit integers per year. Records are only appended, so the file can
+  be read while the simulation is still running. Use read_log to read it.
+"""
+
+import json
+import os
+import queue
+import threading
+import numpy as np
+
+_magic = b'BIOSIMLOG1'
+_dtype = np.dtype('<i8')
+
+
+class CountLogger:
+    """
+    CountLogger writes the number of herbivores and carnivores on the island, and optionally
+    in every land tile, once per year.
+    """
+
+    def __init__(self, path, island, fmt=None, per_tile=False, buffer_years=100,
+                 background=False, append=False):
+        """
+        Parameters
+        ----------
+        path
+            file name of the log
+        island
+            Whole_map the counts are read from
+        fmt
+            'csv' or 'binary'. If None, 'binary' is used for files ending in '.bin', and 'csv'
+            otherwise
+        per_tile
+            if True, the number of each species in every land tile is logged as well
+        buffer_years
+            number of years kept in memory before they are written
+        background
+            if True, the buffers are written by a separate thread
+        append
+            if True and the file already has content, new years are added to the end of it,
+            otherwise the file is started again
+        """
+        if fmt is None:
+            fmt = 'binary' if str(path).endswith('.bin') else 'csv'
+        if fmt not in ('csv', 'binary'):
+            raise ValueError(f'Unknown log format: {fmt}')
+        if buffer_years < 1:
+            raise ValueError('buffer_years must be at least 1')
+        self.island = island
+        self.fmt = fmt
+        self.keys = list(island.land_keys) if per_tile else []
+        # the rows of the tiles in Whole_map.tile_counts
+        self._cells = [island.world[key].index for key in self.keys]
+        self.columns = ['Year', 'Herbivore', 'Carnivore']
+        for y, x in self.keys:
+            self.columns += [f'Herbivore_{y}_{x}', f'Carnivore_{y}_{x}']
+        self._buffer = np.zeros((buffer_years, len(self.columns)), dtype=_dtype)
+        self._rows = 0
+
+        has_content = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'ab' if has_content else 'wb')
+        if not has_content:
+            self._file.write(self._header())
+
+        self._queue = None
+        self._thread = None
+        # the first error of the background thread, raised again by flush
+        self._error = None
+        if background:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._write_loop, daemon=True)
+            self._thread.start()
+
+    def _header(self):
+        """The header written at the start of a new file."""
+        if self.fmt == 'csv':
+            return (','.join(self.columns) + '\n').encode()
+        return _magic + json.dumps(self.columns).encode() + b'\n'
+
+    def log(self, year):
+        """
+        Adds the counts of the island to the buffer, as the row for the given year.
+
+        Parameters
+        ----------
+        year
+        """
+        row = self._buffer[self._rows]
+        row[0] = year
+        # the counters of the island are kept up to date, so no tile is visited
+        row[1:3] = self.island.species_counts
+        if self.keys:
+            row[3:] = self.island.tile_counts[self._cells].ravel()
+        self._rows += 1
+        if self._rows == len(self._buffer):
+            self._hand_off()
+
+    def _hand_off(self):
+        """Passes the filled rows of the buffer on to be written."""
+        if self._rows == 0:
+            return
+        block = self._buffer[:self._rows].copy()
+        self._rows = 0
+        if self._queue is None:
+            self._write(block)
+        else:
+            self._queue.put(block)
+
+    def _write(self, block):
+        """Writes a block of rows to the file."""
+        if self.fmt == 'csv':
+            np.savetxt(self._file, block, fmt='%d', delimiter=',')
+        else:
+            self._file.write(block.tobytes())
+
+    def _write_loop(self):
+        """
+        The loop of the background thread. None ends the loop. After a failed write, the
+        remaining blocks are taken from the queue without being written, so flush does not wait
+        forever, and the error is kept for flush to raise.
+        """
+        while True:
+            block = self._queue.get()
+            try:
+                if block is None:
+                    return
+                if self._error is None:
+                    self._write(block)
+            except Exception as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """
+        Writes every buffered row to the file, and waits until it has been written.
+
+        Raises
+        ------
+        RuntimeError
+            If writing the log in the background failed.
+        """
+        self._hand_off()
+        if self._queue is not None:
+            self._queue.join()
+            if self._error is not None:
+                error = self._error
+                raise RuntimeError(f'Writing the log failed: {error}') from error
+        self._file.flush()
+
+    def close(self):
+        """
+        Writes the remaining rows, stops the background thread and closes the file. The
+        thread is stopped and the file closed even if writing failed.
+
+        Raises
+        ------
+        RuntimeError
+            If writing the log in the background failed.
+        """
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+            self._file.close()
+
+
+def read_log(path):
+    """
+    Reads a log written by CountLogger, in either format.
+
+    Parameters
+    ----------
+    path
+
+    Returns
+    -------
+    (columns, counts), the list of column names and an integer array with one row per year
+    """
+    with open(path, 'rb') as file:
+        header = file.readline()
+        if header.startswith(_magic):
+            columns = json.loads(header[len(_magic):])
+            counts = np.frombuffer(file.read(), dtype=_dtype)
+        else:
+            columns = header.decode().strip().split(',')
+            counts = np.loadtxt(file, dtype=np.int64, delimiter=',', ndmin=2)
+    return columns, counts.reshape(-1, len(columns))
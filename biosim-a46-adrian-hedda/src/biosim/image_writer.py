@@ -0,0 +1,115 @@
+"""
+Writing images in the background.
+
+Saving a figure with savefig both draws it and compresses it to a file, and the simulation
+waits for both. The ImageWriter takes over the compressing and writing: the figure is drawn
+once, its pixels are copied into an array, and the array is written to file by a small pool of
+threads or processes while the simulation goes on.
+
+At most max_pending images wait to be written at any time. When that many are waiting, submit
+blocks until one of them is done, so the memory held by the writer stays bounded even if the
+disk is slower than the simulation.
+"""
+
+import concurrent.futures
+import threading
+
+# formats that can be written from the pixels of the figure
+raster_formats = ('png', 'jpg', 'jpeg', 'tif', 'tiff')
+
+
+def _write_image(path, pixels, dpi):
+    """Compresses and writes one image, in a worker thread or process."""
+    from matplotlib import image
+    if dpi is None:
+        image.imsave(path, pixels)
+    else:
+        image.imsave(path, pixels, dpi=dpi)
+
+
+class ImageWriter:
+    """
+    ImageWriter writes images from RGBA pixel arrays in a pool of threads or processes.
+    """
+    _pools = {'thread': concurrent.futures.ThreadPoolExecutor,
+              'process': concurrent.futures.ProcessPoolExecutor}
+
+    def __init__(self, kind='thread', workers=2, max_pending=8):
+        """
+        Parameters
+        ----------
+        kind
+            'thread' or 'process'
+        workers
+            number of threads or processes
+        max_pending
+            the largest number of images waiting to be written
+
+        Raises
+        ------
+        ValueError
+            If the kind of pool is unknown.
+        """
+        if kind not in self._pools:
+            raise ValueError(f'Unknown image writer: {kind}')
+        self._pool = self._pools[kind](max_workers=workers)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._errors = []
+
+    def submit(self, path, pixels, dpi=None):
+        """
+        Hands an image over to be written. Blocks while max_pending images are waiting.
+
+        Parameters
+        ----------
+        path
+            file name, the format is taken from the extension
+        pixels
+            array with shape (height, width, 4), which must not be changed afterwards
+        dpi
+            resolution stored in the file
+        """
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(_write_image, path, pixels, dpi)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        """Frees the slot of a written image, and keeps its error, if any."""
+        with self._lock:
+            self._pending.discard(future)
+            if future.exception() is not None:
+                self._errors.append(future.exception())
+        self._slots.release()
+
+    def wait(self):
+        """
+        Waits until every submitted image has been written.
+
+        Raises
+        ------
+        RuntimeError
+            If writing any of the images failed.
+        """
+        with self._lock:
+            pending = list(self._pending)
+        concurrent.futures.wait(pending)
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise RuntimeError(f'Writing images failed: {errors[0]}') from errors[0]
+
+    def close(self):
+        """
+        Waits for the pending images, and stops the pool.
+        """
+        try:
+            self.wait()
+        finally:
+            self._pool.shutdown(wait=True)
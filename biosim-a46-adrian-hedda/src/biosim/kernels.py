@@ -0,0 +1,188 @@
+"""
+Array kernels for the feeding and hunting of a whole tile, shared by the two population
+backends.
+
+The kernels only work on NumPy arrays of numbers. The object backend copies the few attributes
+it needs out of the Animal class objects and writes the results back, the array backend uses
+its Population arrays directly.
+"""
+
+import bisect
+import math
+import numpy as np
+
+# number of random numbers first drawn at once for the hunt, doubled for every further batch
+_draw_block = 64
+_max_draw_block = 4096
+
+
+def fodder_intake(fodder, appetite, count):
+    """
+    How much each of count herbivores eats when they eat one after the other, each up to its
+    appetite, from the fodder of a tile.
+
+    Since every herbivore has the same appetite F, the outcome only depends on the cumulative
+    appetite: the first fodder // F animals eat F each, the next one eats the rest and the others
+    get nothing. The intake of animal i is therefore fodder - i * F, clipped to [0, F].
+
+    Parameters
+    ----------
+    fodder
+        fodder in the tile
+    appetite
+        the appetite F of the species
+    count
+        number of herbivores
+
+    Returns
+    -------
+    (intake, remaining fodder). intake is an array with one entry per animal in eating order,
+    with only the animals that get something, so it can be shorter than count. It is empty when
+    there is no fodder
+    """
+    if fodder <= 0 or count == 0:
+        return np.zeros(0), fodder
+    if fodder >= appetite * count:
+        # enough for everyone
+        return np.full(count, float(appetite)), fodder - appetite * count
+    eaters = min(count, int(np.ceil(fodder / appetite)))
+    intake = np.clip(fodder - appetite * np.arange(eaters), 0, appetite)
+    return intake, 0
+
+
+def _uniforms(rng, size):
+    """
+    size random numbers in [0, 1) from either a NumPy Generator or a generator with the
+    interface of the random module.
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng.random(size)
+    random = rng.random
+    return np.array([random() for _ in range(size)])
+
+
+def hunt(fitness, weight, age_factor, prey_fitness, prey_weight, param, rng, prey_alive=None):
+    """
+    The carnivores of a tile hunt the herbivores of the tile, with the same rules as
+    Carnivores.eat: the carnivores hunt in order of decreasing fitness, and every carnivore
+    tries to kill the herbivores in order of increasing fitness until it has eaten its appetite
+    F, or the next herbivore is at least as fit as itself.
+
+    Only herbivores weaker than the fittest a carnivore can get by eating its whole appetite
+    are sorted. A cursor skips the killed herbivores at the weak end of the sorted prey, the
+    killed herbivores are dropped from the rest once they make up half of it, and the hunt ends
+    as soon as the weakest herbivore left is at least as fit as the next carnivore.
+
+    A carnivore does not draw a random number for every herbivore it tries. The kill
+    probability falls along the sorted herbivores, so the probability p_max of the first one is
+    an upper bound for the rest. The number of herbivores passed over before the next one is
+    tried is drawn at once from the geometric distribution with p_max, and that herbivore is
+    killed with probability p / p_max. This gives every herbivore the same kill probability p
+    as trying them one at a time, with work proportional to the number of kills instead of the
+    number of herbivores passed.
+
+    Parameters
+    ----------
+    fitness
+        array with the fitness of the carnivores
+    weight
+        array with the weight of the carnivores
+    age_factor
+        array with the age factor of the fitness of the carnivores
+    prey_fitness
+        array with the fitness of the herbivores
+    prey_weight
+        array with the weight of the herbivores
+    param
+        compiled parameters of the carnivores
+    rng
+        random number generator, a NumPy Generator or the random module
+    prey_alive
+        boolean array, only the herbivores marked True are hunted. All by default
+
+    Returns
+    -------
+    (killed, weight, fitness): the indices of the killed herbivores, and new arrays with the
+    weight and fitness of the carnivores
+    """
+    weight = np.array(weight, dtype=float)
+    fitness = np.array(fitness, dtype=float)
+    killed = []
+    if len(fitness) == 0 or len(prey_fitness) == 0:
+        return np.array(killed, dtype=np.int64), weight, fitness
+
+    # the fittest any carnivore can get this year, since the fitness grows with the weight
+    fittest = np.max(age_factor / (1 + np.exp(-(param.phi_weight * (
+        weight + param.beta * param.F - param.w_half)))))
+    reachable = prey_fitness < fittest
+    if prey_alive is not None:
+        reachable &= prey_alive
+    reachable = np.flatnonzero(reachable)
+    order = reachable[np.argsort(prey_fitness[reachable], kind='stable')]
+    index = order.tolist()
+    prey_phi = prey_fitness[order].tolist()
+    prey_kg = prey_weight[order].tolist()
+    alive = [True] * len(index)
+
+    appetite_full, beta, delta_phi_max = param.F, param.beta, param.DeltaPhiMax
+    phi_weight, w_half = param.phi_weight, param.w_half
+    block = _draw_block
+    draws, drawn, available = [], 0, 0
+    cursor = 0
+    dead = 0
+    for i in np.argsort(-fitness, kind='stable').tolist():
+        if dead > _draw_block and 2 * dead > len(index) - cursor:
+            keep = [j for j in range(cursor, len(index)) if alive[j]]
+            index = [index[j] for j in keep]
+            prey_phi = [prey_phi[j] for j in keep]
+            prey_kg = [prey_kg[j] for j in keep]
+            alive = [True] * len(keep)
+            cursor = dead = 0
+        while cursor < len(index) and not alive[cursor]:
+            cursor += 1
+            dead -= 1
+        own_fitness = fitness[i]
+        if cursor == len(index) or prey_phi[cursor] >= own_fitness:
+            # no herbivore left that this or any weaker carnivore can catch
+            break
+        own_weight = weight[i]
+        appetite = appetite_full
+        start = cursor
+        while True:
+            # herbivores start up to limit are weaker than the carnivore
+            limit = bisect.bisect_left(prey_phi, own_fitness, start)
+            if start >= limit:
+                break
+            p_max = (own_fitness - prey_phi[start]) / delta_phi_max
+            if p_max >= 1:
+                # killed for certain, if still alive
+                hit = start
+            else:
+                if available - drawn < 2:
+                    draws, drawn = _uniforms(rng, block).tolist(), 0
+                    available = block
+                    block = min(2 * block, _max_draw_block)
+                skip, accept = draws[drawn], draws[drawn + 1]
+                drawn += 2
+                hit = start + int(math.log1p(-skip) / math.log1p(-p_max))
+                if hit >= limit:
+                    break
+                if accept * p_max > (own_fitness - prey_phi[hit]) / delta_phi_max:
+                    start = hit + 1
+                    continue
+            if not alive[hit]:
+                start = hit + 1
+                continue
+            alive[hit] = False
+            dead += 1
+            killed.append(index[hit])
+            feed = min(appetite, prey_kg[hit])
+            appetite -= feed
+            own_weight += beta * feed
+            own_fitness = age_factor[i] / (1 + math.exp(-(phi_weight * (own_weight - w_half))))
+            if appetite <= 0:
+                break
+            start = hit + 1
+        weight[i] = own_weight
+        fitness[i] = own_fitness
+    return np.array(killed, dtype=np.int64), weight, fitness
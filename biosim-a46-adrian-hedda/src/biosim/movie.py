@@ -0,0 +1,123 @@
+"""
+Streaming movie frames straight into the encoder.
+
+Instead of saving one image file per frame and running ffmpeg on the files afterwards,
+MovieStream starts one ffmpeg process for the whole movie, and writes the raw RGBA pixels of
+every frame to its standard input. Nothing but the movie itself is written to disk, and no
+frame is compressed twice.
+"""
+
+import subprocess
+
+# Update this variable to point to your ffmpeg binary. If you installed ffmpeg using conda or
+# in a standard way on your computer, no changes should be required.
+_FFMPEG_BINARY = 'ffmpeg'
+
+_DEFAULT_FPS = 25
+_movie_formats = ('mp4', 'gif')
+
+
+def _encoder_command(path, width, height, fps, movie_fmt):
+    """The ffmpeg command line reading raw RGBA frames of the given size from stdin."""
+    command = [_FFMPEG_BINARY, '-loglevel', 'error', '-y',
+               '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}',
+               '-r', str(fps), '-i', '-']
+    if movie_fmt == 'mp4':
+        # Parameters chosen according to http://trac.ffmpeg.org/wiki/Encode/H.264,
+        # section "Compatibility". yuv420p needs an even width and height.
+        command += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                    '-profile:v', 'baseline', '-level', '3.0', '-pix_fmt', 'yuv420p']
+    return command + [path]
+
+
+class MovieStream:
+    """
+    MovieStream encodes a movie from frames given as RGBA buffers, like the one returned by
+    FigureCanvasAgg.buffer_rgba. All frames must have the same size. The encoder is started
+    with the first frame.
+    """
+
+    def __init__(self, path, movie_fmt='mp4', fps=_DEFAULT_FPS):
+        """
+        Parameters
+        ----------
+        path
+            file name of the movie
+        movie_fmt
+            'mp4' or 'gif'
+        fps
+            frames per second
+
+        Raises
+        ------
+        ValueError
+            If the movie format is unknown.
+        """
+        if movie_fmt not in _movie_formats:
+            raise ValueError('Unknown movie format: ' + movie_fmt)
+        self.path = path
+        self.movie_fmt = movie_fmt
+        self.fps = fps
+        self.size = None
+        self.frames = 0
+        self._process = None
+        self._closed = False
+
+    def write(self, rgba, width, height):
+        """
+        Adds one frame to the movie.
+
+        Parameters
+        ----------
+        rgba
+            buffer with height * width * 4 bytes
+        width
+        height
+
+        Raises
+        ------
+        ValueError
+            If the frame has another size than the first frame.
+        RuntimeError
+            If the encoder has stopped, or the movie is closed.
+        """
+        if self._closed:
+            # a new encoder would overwrite the movie
+            raise RuntimeError(f'ERROR: the movie {self.path} is closed')
+        if self._process is None:
+            self.size = (width, height)
+            try:
+                self._process = subprocess.Popen(
+                    _encoder_command(self.path, width, height, self.fps, self.movie_fmt),
+                    stdin=subprocess.PIPE)
+            except OSError as err:
+                raise RuntimeError('ERROR: ffmpeg could not be started: {}'.format(err))
+        elif (width, height) != self.size:
+            raise ValueError(f'Frame size {width}x{height} differs from {self.size}')
+        try:
+            self._process.stdin.write(rgba)
+        except BrokenPipeError:
+            self.close()
+            raise RuntimeError('ERROR: ffmpeg stopped reading the frames')
+        self.frames += 1
+
+    def close(self):
+        """
+        Ends the movie, and waits until the encoder has written it.
+
+        Raises
+        ------
+        RuntimeError
+            If the encoder failed.
+        """
+        self._closed = True
+        if self._process is None:
+            return
+        process = self._process
+        self._process = None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if process.wait() != 0:
+            raise RuntimeError('ERROR: ffmpeg failed with exit code {}'.format(process.returncode))
@@ -0,0 +1,166 @@
+import multiprocessing
+import random
+import numpy as np
+from biosim import Tile
+
+
+def _split_blocks(island, num_blocks):
+    """
+    Splits the land tiles of the island into blocks of whole rows, with about the same number of
+    land tiles in each block.
+
+    Parameters
+    ----------
+    island
+    num_blocks
+
+    Returns
+    -------
+    list of lists of tile keys
+    """
+    land_keys = island.land_keys
+    num_blocks = max(1, min(num_blocks, len(land_keys)))
+    blocks = [[] for _ in range(num_blocks)]
+    per_block = len(land_keys) / num_blocks
+    block = 0
+    for count, key in enumerate(land_keys):
+        # only start a new block at the start of a row
+        if count >= per_block * (block + 1) and key[0] != blocks[block][-1][0] \
+                and block < num_blocks - 1:
+            block += 1
+        blocks[block].append(key)
+    return [keys for keys in blocks if keys]
+
+
+def _worker(island, keys, connection):
+    """
+    The loop run by each worker process. The worker owns the tiles in keys, and runs the yearly
+    functions for them when the main process asks for it.
+
+    Messages from the main process:
+    ('year', year)
+        run one year for the block, and send the counts of animals per tile back
+    ('collect',)
+        send the animals of every tile in the block back
+    ('stop',)
+        end the worker
+    """
+    # forked workers inherit the state of the global generators, so unseeded runs would draw
+    # the same numbers in every worker
+    random.seed()
+    Tile._array_rng = np.random.default_rng()
+    island.engine = None
+    # the phases are not timed in the workers, see profiling.py
+    island.profiler = None
+    own_keys = set(keys)
+
+    def exchange(arrivals):
+        # halo step: arrivals for tiles owned by other workers go through the main process
+        local = [arrival for arrival in arrivals if arrival[0] in own_keys]
+        outgoing = [arrival for arrival in arrivals if arrival[0] not in own_keys]
+        connection.send(('halo', outgoing))
+        incoming = connection.recv()
+        return local + incoming
+
+    while True:
+        message = connection.recv()
+        if message[0] == 'year':
+            island.year = message[1]
+            island._new_year_tiles(keys, exchange)
+            connection.send({key: island.world[key].count_animals() for key in keys})
+        elif message[0] == 'collect':
+            connection.send({key: (island.world[key].herb, island.world[key].carn)
+                             for key in keys})
+        elif message[0] == 'stop':
+            connection.close()
+            return
+
+
+class ParallelEngine:
+    """
+    ParallelEngine runs the tiles of an island in several worker processes.
+    The island is split into blocks of whole rows, and each worker runs the yearly functions
+    for the tiles of one block. During migration, the animals that cross from one block into
+    another are sent through the main process to the worker that owns the destination tile,
+    while everything else stays inside the workers.
+
+    For a seeded island, the result does not depend on the number of workers, since every tile
+    draws from its own random streams and the arrivals are added in order of the source tile.
+    """
+
+    def __init__(self, island, num_workers):
+        """
+        Starts one worker process per block. On platforms with fork, the workers get the island
+        without copying it, otherwise it is pickled once for every worker.
+
+        Parameters
+        ----------
+        island
+            Whole_map
+        num_workers
+        """
+        self.island = island
+        self.blocks = _split_blocks(island, num_workers)
+        self.owner = {key: block for block, keys in enumerate(self.blocks) for key in keys}
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        self.connections = []
+        self.processes = []
+        for keys in self.blocks:
+            main_end, worker_end = context.Pipe()
+            process = context.Process(target=_worker, args=(island, keys, worker_end),
+                                      daemon=True)
+            process.start()
+            worker_end.close()
+            self.connections.append(main_end)
+            self.processes.append(process)
+        self.synced = True
+
+    def new_year(self, year):
+        """
+        Runs one year in all workers, and routes the animals that migrate between blocks.
+
+        Parameters
+        ----------
+        year
+            the year of the island before the new year
+        """
+        for connection in self.connections:
+            connection.send(('year', year))
+        inboxes = [[] for _ in self.blocks]
+        for connection in self.connections:
+            _, outgoing = connection.recv()
+            for arrival in outgoing:
+                inboxes[self.owner[arrival[0]]].append(arrival)
+        for connection, inbox in zip(self.connections, inboxes):
+            connection.send(inbox)
+        island = self.island
+        for connection in self.connections:
+            counts = connection.recv()
+            island._set_counts([island.world[key].index for key in counts], list(counts.values()))
+        self.synced = False
+
+    def collect(self):
+        """
+        Copies the animals of every tile from the workers back into the tiles of the island in
+        the main process.
+        """
+        if self.synced:
+            return
+        for connection in self.connections:
+            connection.send(('collect',))
+        for connection in self.connections:
+            for key, (herb, carn) in connection.recv().items():
+                self.island.world[key].herb = herb
+                self.island.world[key].carn = carn
+        self.synced = True
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        for connection in self.connections:
+            connection.send(('stop',))
+            connection.close()
+        for process in self.processes:
+            process.join()
@@ -0,0 +1,132 @@
+"""
+Timing of the annual cycle while the simulation runs.
+
+A Profiler attached to an island (Whole_map.profiler) times every phase of every year, and,
+for the phases in per_tile_phases, every tile. The island runs the same year with and without
+a profiler, it only calls Profiler.add with the time of every phase when one is attached.
+
+In a parallel simulation, the phases run in the worker processes, and only the time of the
+whole year is recorded.
+"""
+
+PHASES_BEFORE_MIGRATION = ('tile_have_offspring', 'tile_eat', 'tile_will_migrate')
+PHASES_AFTER_MIGRATION = ('tile_aging', 'tile_weight_loss', 'tile_dying', 'tile_reset_parent')
+PHASES = PHASES_BEFORE_MIGRATION + ('migrate',) + PHASES_AFTER_MIGRATION
+
+
+class Profiler:
+    """
+    Profiler records the wall time of the phases of the annual cycle.
+
+    Attributes
+    ----------
+    totals
+        dictionary from phase to the seconds spent in it over all profiled years. The phase
+        'year' is the whole year
+    last_year
+        dictionary from phase to the seconds spent in it in the last profiled year
+    history
+        list with the last_year dictionary of every profiled year, if keep_history is True
+    tile_totals
+        dictionary from each phase in per_tile_phases to a dictionary from tile key to seconds
+        over all profiled years
+    last_tiles
+        like tile_totals, for the last profiled year only
+    years
+        number of profiled years
+    """
+
+    def __init__(self, per_tile_phases=('tile_eat',), callback=None, keep_history=True):
+        """
+        Parameters
+        ----------
+        per_tile_phases
+            the phases to time for every tile, by default the feeding, which includes the
+            hunting of the carnivores
+        callback
+            function called after every year as callback(year, last_year, last_tiles)
+        keep_history
+            if True, the phase times of every year are kept in history
+        """
+        unknown = set(per_tile_phases) - set(PHASES)
+        if unknown:
+            raise ValueError(f'Unknown phases: {sorted(unknown)}')
+        self.per_tile_phases = tuple(per_tile_phases)
+        self.callback = callback
+        self.keep_history = keep_history
+        self.totals = dict.fromkeys(PHASES + ('year',), 0.0)
+        self.last_year = {}
+        self.history = []
+        self.tile_totals = {phase: {} for phase in self.per_tile_phases}
+        self.last_tiles = {}
+        self.years = 0
+        self._year_phases = {}
+        self._year_tiles = {}
+
+    def add(self, phase, seconds, key=None):
+        """
+        Adds the time of one call to a phase of the running year. Called by Whole_map while it
+        runs the year.
+
+        Parameters
+        ----------
+        phase
+            one of PHASES
+        seconds
+        key
+            the tile the call ran for, recorded if phase is one of per_tile_phases
+        """
+        self._year_phases[phase] = self._year_phases.get(phase, 0.0) + seconds
+        if key is not None and phase in self.per_tile_phases:
+            self._year_tiles.setdefault(phase, {})[key] = seconds
+
+    def end_year(self, year, seconds):
+        """
+        Closes the record of a year. Called by Whole_map.new_year_whole_map.
+
+        Parameters
+        ----------
+        year
+            the year that was simulated
+        seconds
+            the wall time of the whole year
+        """
+        phases, self._year_phases = self._year_phases, {}
+        tiles, self._year_tiles = self._year_tiles, {}
+        # phases without any occupied tile to run for are recorded as taking no time
+        for name in PHASES:
+            phases.setdefault(name, 0.0)
+        for name in self.per_tile_phases:
+            tiles.setdefault(name, {})
+        phases['year'] = seconds
+        for name, elapsed in phases.items():
+            self.totals[name] += elapsed
+        for name, per_tile in tiles.items():
+            totals = self.tile_totals[name]
+            for key, elapsed in per_tile.items():
+                totals[key] = totals.get(key, 0.0) + elapsed
+        self.last_year = phases
+        self.last_tiles = tiles
+        if self.keep_history:
+            self.history.append(phases)
+        self.years += 1
+        if self.callback is not None:
+            self.callback(year, phases, tiles)
+
+    def hotspots(self, phase='tile_eat', number=5):
+        """
+        The tiles that took the most time in a phase, over all profiled years.
+
+        Parameters
+        ----------
+        phase
+            one of per_tile_phases
+        number
+            how many tiles to return
+
+        Returns
+        -------
+        list of (tile key, seconds), the slowest tile first
+        """
+        ranked = sorted(self.tile_totals[phase].items(), key=lambda item: item[1], reverse=True)
+        return ranked[:number]
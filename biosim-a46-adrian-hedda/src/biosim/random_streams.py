@@ -0,0 +1,62 @@
+import random
+import numpy as np
+
+
+class RandomStreams:
+    """
+    RandomStreams gives every tile its own random number stream for every phase of the year.
+    A stream is keyed on (seed, year, tile, phase), so the numbers a tile draws do not depend on
+    which tiles were processed before it, or on how many tiles have been processed at all.
+    That makes a simulation reproducible from its seed, also if the tiles are processed in
+    another order, or split between several processes.
+
+    The array backend uses counter based Philox generators from NumPy, with the seed as the key
+    and (phase, tile, year) in the upper words of the counter. The object backend uses
+    random.Random objects, seeded from one integer that packs the same four numbers.
+    """
+    _phases = {'offspring': 0, 'eat': 1, 'will_migrate': 2, 'migrate': 3, 'dying': 4}
+
+    def __init__(self, seed):
+        """
+        Parameters
+        ----------
+        seed
+            integer seed of the simulation
+        """
+        self.seed = int(seed) % 2 ** 64
+        self.year = 0
+
+    def numpy(self, tile, phase):
+        """
+        Returns a NumPy Generator for a tile and phase in the current year.
+
+        Parameters
+        ----------
+        tile
+            index of the tile
+        phase
+            name of the phase, one of 'offspring', 'eat', 'will_migrate', 'migrate', 'dying'
+
+        Returns
+        -------
+        numpy.random.Generator
+        """
+        counter = [0, self._phases[phase], tile, self.year]
+        return np.random.Generator(np.random.Philox(key=self.seed, counter=counter))
+
+    def python(self, tile, phase):
+        """
+        Returns a random.Random object for a tile and phase in the current year.
+
+        Parameters
+        ----------
+        tile
+        phase
+
+        Returns
+        -------
+        random.Random
+        """
+        packed = ((self.seed * 2 ** 32 + self.year) * 2 ** 32 + tile) * 2 ** 8 \
+            + self._phases[phase]
+        return random.Random(packed)
@@ -0,0 +1,170 @@
+"""
+Recording the number of animals in every tile and year.
+
+The TimeSeriesRecorder keeps one preallocated array with shape (years, rows, cols, 2), where
+the last axis is (herbivores, carnivores). Every year, the counts of the island are written
+straight into the next slice of the array, so no per year dictionaries are kept.
+
+If a path is given, the array is a memory mapped .npy file, and the operating system decides
+how much of it stays in memory. Next to the .npy file, a small .json file records the first
+year and the number of years recorded so far. TimeSeriesRecorder.open reads both back after
+the simulation, without simulating again.
+"""
+
+import json
+import os
+import numpy as np
+
+_dtype = np.int32
+# bytes copied at a time when a memory mapped recorder grows
+_copy_bytes = 64 * 2 ** 20
+
+
+class TimeSeriesRecorder:
+    """
+    TimeSeriesRecorder stores the counts per tile and year of a simulation.
+    """
+
+    def __init__(self, rows, cols, capacity, path=None):
+        """
+        Parameters
+        ----------
+        rows
+            number of rows in the map
+        cols
+            number of columns in the map
+        capacity
+            number of years there is room for. The array grows if more years are recorded
+        path
+            file name of the .npy file. If None, the array is kept in memory
+        """
+        self.path = None if path is None else str(path)
+        self.first_year = None
+        self.size = 0
+        self._data = self._allocate((max(1, capacity), rows, cols, 2))
+
+    def _allocate(self, shape):
+        """Makes a new array, in memory or as a memory mapped file."""
+        if self.path is None:
+            return np.zeros(shape, dtype=_dtype)
+        return np.lib.format.open_memmap(self.path, mode='w+', dtype=_dtype, shape=shape)
+
+    @property
+    def capacity(self):
+        """Number of years there is room for."""
+        return len(self._data)
+
+    @property
+    def counts(self):
+        """The recorded counts, with shape (years, rows, cols, 2)."""
+        return self._data[:self.size]
+
+    @property
+    def years(self):
+        """The years of the recorded counts."""
+        first = 0 if self.first_year is None else self.first_year
+        return np.arange(first, first + self.size)
+
+    def reserve(self, capacity):
+        """
+        Makes room for at least capacity years. For a memory mapped recorder, the recorded
+        years are copied in chunks into a new file next to the old one, which then replaces
+        the old file. The old file is left as it is until the copy is complete.
+
+        Parameters
+        ----------
+        capacity
+        """
+        if capacity <= self.capacity:
+            return
+        shape = (capacity,) + self._data.shape[1:]
+        if self.path is None:
+            data = np.zeros(shape, dtype=_dtype)
+            data[:self.size] = self.counts
+            self._data = data
+            return
+        old = self._data
+        old.flush()
+        temporary = self.path + '.tmp'
+        new = np.lib.format.open_memmap(temporary, mode='w+', dtype=_dtype, shape=shape)
+        step = max(1, _copy_bytes // old[0].nbytes)
+        for start in range(0, self.size, step):
+            stop = min(start + step, self.size)
+            new[start:stop] = old[start:stop]
+        new.flush()
+        # the maps are closed before the files are swapped, which Windows requires
+        del old, new, self._data
+        os.replace(temporary, self.path)
+        self._data = np.load(self.path, mmap_mode='r+')
+
+    def record(self, island):
+        """
+        Writes the counts in every tile of the island as the next year.
+
+        Parameters
+        ----------
+        island
+            Whole_map
+        """
+        if self.first_year is None:
+            self.first_year = island.year
+        elif island.year != self.first_year + self.size:
+            raise ValueError(f'Expected year {self.first_year + self.size}, got {island.year}')
+        if self.size == self.capacity:
+            self.reserve(2 * self.capacity)
+        island.count_grid(out=self._data[self.size])
+        self.size += 1
+
+    def flush(self):
+        """
+        Writes the memory mapped array and the .json file with the first year and the number
+        of years to disk.
+        """
+        if self.path is None:
+            return
+        self._data.flush()
+        with open(self.path + '.json', 'w') as file:
+            json.dump({'first_year': self.first_year, 'size': self.size}, file)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Opens the files of a memory mapped recorder for reading.
+
+        Parameters
+        ----------
+        path
+            file name of the .npy file
+
+        Returns
+        -------
+        TimeSeriesRecorder, with the array mapped read only
+        """
+        path = str(path)
+        with open(path + '.json') as file:
+            info = json.load(file)
+        recorder = cls.__new__(cls)
+        recorder.path = path
+        recorder.first_year = info['first_year']
+        recorder.size = info['size']
+        recorder._data = np.load(path, mmap_mode='r')
+        return recorder
+
+    @classmethod
+    def for_island(cls, island, capacity, path=None):
+        """
+        Makes a recorder with the shape of the map of an island.
+
+        Parameters
+        ----------
+        island
+        capacity
+        path
+
+        Returns
+        -------
+        TimeSeriesRecorder
+        """
+        if path is not None and os.path.dirname(str(path)):
+            os.makedirs(os.path.dirname(str(path)), exist_ok=True)
+        return cls(island.length_y, island.length_x, capacity, path)
@@ -0,0 +1,333 @@
+"""
+Rendering of the simulation, separated from the yearly loop.
+
+In the years that shall be visualized, the simulation only takes a Snapshot of the island: the
+number of animals per tile as an array, the total number of animals per year since the last
+snapshot, and the histogram counts of fitness, age and weight. A renderer turns the snapshots
+into figures:
+
+- InlineRenderer draws each snapshot at once, in the simulating thread
+- ThreadRenderer draws in a separate thread, fed through a queue. Since matplotlib is not thread
+  safe for interactive windows, the figure is only drawn and saved to file, never shown
+- ProcessRenderer draws in a separate process, fed through a queue. The process has its own
+  matplotlib and can show the figure while the simulation keeps running
+
+If drawing fails in the thread or process, the error is handed back to the simulation and
+raised by the next submit, or by close.
+
+This module does not import matplotlib. Only the renderers import visualization.py, when they
+are created, so a simulation without graphics never loads matplotlib. Likewise, the modules for
+threads and processes are only imported by the renderers that use them.
+"""
+
+import numpy as np
+
+_default_hist_specs = {'fitness': {'max': 1.0, 'delta': 0.05},
+                       'age': {'max': 60.0, 'delta': 2},
+                       'weight': {'max': 60, 'delta': 2}}
+_default_cmax_animals = {'Herbivore': 200, 'Carnivore': 50}
+
+# number of snapshots waiting to be drawn before the simulation has to wait for the renderer
+_queue_size = 8
+# seconds between the checks that the renderer is still running while the simulation waits
+_poll_interval = 0.5
+
+
+def _property_values(animals, prop):
+    """
+    Returns the values of one property ('fitness', 'age' or 'weight') for a collection of animals.
+    The collection is either a list of Animal class objects, or a Population with the property
+    already stored as an array.
+    """
+    if isinstance(animals, list):
+        return [getattr(animal, prop) for animal in animals]
+    return getattr(animals, prop)
+
+
+def hist_specs(custom=None):
+    """
+    The histogram specifications, the defaults updated with custom.
+
+    Parameters
+    ----------
+    custom
+        dictionary like {'weight': {'max': 80, 'delta': 2}}, or None
+
+    Returns
+    -------
+    dictionary with one entry per property
+    """
+    specs = {prop: dict(spec) for prop, spec in _default_hist_specs.items()}
+    if custom:
+        specs.update(custom)
+    return specs
+
+
+def hist_edges(specs):
+    """
+    The bin edges of the histograms.
+
+    Parameters
+    ----------
+    specs
+        histogram specifications, see hist_specs
+
+    Returns
+    -------
+    dictionary from property to an array of bin edges
+    """
+    return {prop: np.arange(0, spec['max'] + spec['delta'] / 2, spec['delta'])
+            for prop, spec in specs.items()}
+
+
+class Snapshot:
+    """
+    Snapshot holds what the figure shows of one year, as plain arrays that are cheap to send to
+    another thread or process.
+    """
+    __slots__ = ('year', 'grid', 'totals', 'hists')
+
+    def __init__(self, year, grid, totals, hists):
+        """
+        Parameters
+        ----------
+        year
+            the year of the snapshot
+        grid
+            array with shape (rows, cols, 2), the number of herbivores and carnivores per tile
+        totals
+            array with shape (years, 2), the total number of herbivores and carnivores in each
+            year since the last snapshot, ending with this year
+        hists
+            dictionary from property to a pair of histogram counts (herbivores, carnivores)
+        """
+        self.year = year
+        self.grid = grid
+        self.totals = totals
+        self.hists = hists
+
+    def __getstate__(self):
+        return self.year, self.grid, self.totals, self.hists
+
+    def __setstate__(self, state):
+        self.year, self.grid, self.totals, self.hists = state
+
+
+def take_snapshot(island, totals, edges):
+    """
+    Takes a snapshot of the island.
+
+    Parameters
+    ----------
+    island
+        Whole_map
+    totals
+        total number of animals per year since the last snapshot, see Snapshot
+    edges
+        bin edges of the histograms, see hist_edges
+
+    Returns
+    -------
+    Snapshot
+    """
+    herbs, carns = island.all_animals()
+    hists = {}
+    for prop, prop_edges in edges.items():
+        hists[prop] = (np.histogram(_property_values(herbs, prop), prop_edges)[0],
+                       np.histogram(_property_values(carns, prop), prop_edges)[0])
+    return Snapshot(island.year, island.count_grid(), np.asarray(totals, dtype=np.int64), hists)
+
+
+def _make_visualize(settings, interactive):
+    """
+    Creates the figure from the settings, see Renderer.
+    """
+    from biosim import visualization
+    vis = visualization.Visualize(settings['num_years'], img_dir=settings['img_dir'],
+                                  img_base=settings['img_base'], img_fmt=settings['img_fmt'],
+                                  img_years=settings['img_years'],
+                                  start_year=settings['start_year'],
+                                  ymax_animals=settings['ymax_animals'],
+                                  interactive=interactive, blit=settings.get('blit', False),
+                                  movie_fmt=settings.get('movie_fmt'),
+                                  keep_frames=settings.get('keep_frames', False),
+                                  image_writer=settings.get('image_writer', 'thread'),
+                                  img_number=settings.get('img_number', 0))
+    vis.update_hist_specs(settings['hist_specs'])
+    vis.update_cmax_animals(settings['cmax_animals'])
+    vis.setup_figure(settings['geogr'])
+    return vis
+
+
+def _render_loop(settings, snapshots, interactive, errors):
+    """
+    The loop of a renderer thread or process. None ends the loop. If drawing fails, the error
+    is sent through errors, and the rest of the snapshots are taken from the queue without
+    being drawn, so the simulation never waits for a renderer that has stopped.
+    """
+    snapshot = False
+    try:
+        vis = _make_visualize(settings, interactive)
+        while True:
+            snapshot = snapshots.get()
+            if snapshot is None:
+                vis.close()
+                return
+            vis.draw_snapshot(snapshot)
+    except Exception as error:
+        try:
+            errors.send(error)
+        except Exception:
+            # the error can not be pickled, only its description is sent
+            errors.send(RuntimeError(f'{type(error).__name__}: {error}'))
+        while snapshot is not None:
+            snapshot = snapshots.get()
+
+
+class _ErrorSlot:
+    """
+    Holds the error of a renderer thread, with the methods of the ends of a Pipe that
+    _render_loop and _QueueRenderer use.
+    """
+
+    def __init__(self):
+        self._error = None
+
+    def send(self, error):
+        self._error = error
+
+    def poll(self):
+        return self._error is not None
+
+    def recv(self):
+        error, self._error = self._error, None
+        return error
+
+
+class Renderer:
+    """
+    Base class of the renderers. The settings are a dictionary with the keys num_years, img_dir,
+    img_base, img_fmt, img_years, start_year, ymax_animals, hist_specs, cmax_animals and geogr,
+    and optionally blit, movie_fmt, keep_frames, image_writer and img_number.
+    """
+    modes = {}
+
+    def __init_subclass__(cls, mode=None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if mode is not None:
+            Renderer.modes[mode] = cls
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    def submit(self, snapshot):
+        """Hands one snapshot over to be drawn."""
+        raise NotImplementedError
+
+    def close(self):
+        """Waits until every snapshot has been drawn."""
+
+    @classmethod
+    def create(cls, mode, settings):
+        """
+        Creates the renderer for a mode, 'inline', 'thread' or 'process'.
+
+        Raises
+        ------
+        ValueError
+            If the mode is unknown.
+        """
+        if mode not in cls.modes:
+            raise ValueError(f'Unknown render mode: {mode}')
+        return cls.modes[mode](settings)
+
+
+class InlineRenderer(Renderer, mode='inline'):
+    """Draws every snapshot at once, in the simulating thread."""
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.vis = _make_visualize(settings, interactive=True)
+
+    def submit(self, snapshot):
+        self.vis.draw_snapshot(snapshot)
+
+    def close(self):
+        # the figure stays open on screen, only a streamed movie is ended
+        self.vis.finish()
+
+
+class _QueueRenderer(Renderer):
+    """
+    Base class of the renderers that hand the snapshots to a worker, a thread or a process,
+    through a bounded queue. Subclasses set _snapshots, _errors and _worker.
+    """
+
+    def _check(self):
+        """Raises the error of the worker, if it sent one."""
+        if self._errors.poll():
+            try:
+                error = self._errors.recv()
+            except EOFError:
+                # the process ended without an error
+                return
+            raise RuntimeError(f'Rendering failed: {error}') from error
+
+    def _put(self, item):
+        """Puts an item in the queue, without waiting forever for a worker that has stopped."""
+        import queue
+        while True:
+            self._check()
+            try:
+                self._snapshots.put(item, timeout=_poll_interval)
+                return
+            except queue.Full:
+                if not self._worker.is_alive():
+                    self._check()
+                    raise RuntimeError('The renderer stopped')
+
+    def submit(self, snapshot):
+        self._put(snapshot)
+
+    def close(self):
+        if self._worker.is_alive():
+            self._put(None)
+            self._worker.join()
+        self._check()
+
+
+class ThreadRenderer(_QueueRenderer, mode='thread'):
+    """Draws the snapshots in a separate thread, without showing the figure."""
+
+    def __init__(self, settings):
+        import queue
+        import threading
+        super().__init__(settings)
+        self._snapshots = queue.Queue(_queue_size)
+        self._errors = _ErrorSlot()
+        self._worker = threading.Thread(target=_render_loop,
+                                        args=(settings, self._snapshots, False, self._errors),
+                                        daemon=True)
+        self._worker.start()
+
+
+class ProcessRenderer(_QueueRenderer, mode='process'):
+    """
+    Draws the snapshots in a separate process. The process is a daemon, which can not start
+    processes of its own, so images are written by threads in it when image_writer is
+    'process'.
+    """
+
+    def __init__(self, settings):
+        import multiprocessing
+        if settings.get('image_writer') == 'process':
+            settings = dict(settings, image_writer='thread')
+        super().__init__(settings)
+        context = multiprocessing.get_context('spawn')
+        self._snapshots = context.Queue(_queue_size)
+        self._errors, errors = context.Pipe(duplex=False)
+        self._worker = context.Process(target=_render_loop,
+                                       args=(settings, self._snapshots, True, errors),
+                                       daemon=True)
+        self._worker.start()
+        errors.close()
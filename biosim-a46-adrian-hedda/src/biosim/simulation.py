@@ -6,8 +6,12 @@ Template for BioSim class.
 # https://opensource.org/licenses/BSD-3-Clause
 # (C) Copyright 2023 Hans Ekkehard Plesser / NMBU
 from biosim import Island
-from biosim import visualization
-import textwrap
+from biosim import rendering
+import os
+
+# Everything else, like the graphics, the log file and the checkpoints, is imported in the
+# method that needs it, so a simulation without graphics starts fast and never loads
+# matplotlib or subprocess.
 
 
 class BioSim:
@@ -19,7 +23,9 @@ class BioSim:
     def __init__(self, island_map, ini_pop, seed,
                  vis_years=1, ymax_animals=None, cmax_animals=None, hist_specs=None,
                  img_years=None, img_dir=None, img_base=None, img_fmt='png',
-                 log_file=None):
+                 log_file=None, backend='object', workers=None, log_options=None,
+                 render='inline', blit=False, movie_fmt=None, keep_frames=False,
+                 image_writer='thread', topology='square'):
 
         """
         Parameters
@@ -48,6 +54,34 @@ class BioSim:
             File type for figures, e.g. 'png' or 'pdf'
         log_file : str
             If given, write animal counts to this file
+        backend : str
+            Population backend of the tiles, 'object' for Animal class objects or 'array' for
+            NumPy arrays per species and tile
+        workers : int
+            If larger than 1, the island is split into this many blocks of rows, and the tiles
+            of each block run in a separate worker process during simulate
+        log_options : dict
+            Options for the log file, passed on to count_log.CountLogger: 'fmt' ('csv' or
+            'binary'), 'per_tile', 'buffer_years' and 'background'
+        render : str
+            Where the figure is drawn, see rendering.py: 'inline' in the simulating thread,
+            'thread' in a separate thread (images to file only) or 'process' in a separate
+            process. The process is started with spawn, so a script using 'process' must run
+            the simulation under an ``if __name__ == '__main__':`` guard
+        blit : bool
+            If True, the figure on screen is updated by blitting, only drawing the parts that
+            change
+        movie_fmt : str
+            If given ('mp4' or 'gif'), the frames are streamed into a movie in `img_dir` while
+            simulating, instead of being saved as images, see movie.py
+        keep_frames : bool
+            If True, the images are saved as well when a movie is streamed
+        image_writer : str
+            'thread' or 'process' to compress and write images in a background pool, or None
+            to write them in the drawing thread, see image_writer.py
+        topology : str
+            Which tiles are neighbors: 'square' (N, S, E, W), 'wrap' (square, wrapping around
+            at the edges of the map) or 'hex' (hexagons), see topology.py
 
         Notes
         -----
@@ -76,14 +110,26 @@ class BioSim:
 
              Path(img_dir) / f'{img_base}_{img_number:05d}.{img_fmt}'
 
-          where `img_number` are consecutive image numbers starting from 0.
+          where `img_number` are consecutive image numbers starting from 0, going on
+          across calls to simulate.
 
         - `img_dir` and `img_base` must either be both None or both strings.
+        - With `vis_years=0`, no figure is made and matplotlib is never imported.
+        - `img_years` must be a multiple of `vis_years`.
+        - The log file gets one row per year with the year and the number of herbivores and
+          carnivores, starting with the initial population. A new file is started by the first
+          call to simulate, later calls add to it.
         """
-        self.island = Island.Whole_map()
+        if vis_years and img_years and img_years % vis_years != 0:
+            raise ValueError('img_years must be a multiple of vis_years')
+        if render not in rendering.Renderer.modes:
+            raise ValueError(f'Unknown render mode: {render}')
+        self.island = Island.Whole_map(backend, seed, topology)
         self.geogr = island_map
 
         self.pop = ini_pop
+        # the initial population is placed on the island by the first call to simulate
+        self._ini_pop_added = False
         self.seed = seed
         self.vis_years = vis_years
         self.ymax_animals = ymax_animals
@@ -94,6 +140,17 @@ class BioSim:
         self._img_base = img_base
         self.img_fmt = img_fmt
         self.log_file = log_file
+        self.log_options = log_options or {}
+        self._log_started = False
+        self.recorder = None
+        self._profile = None
+        self.workers = workers
+        self.render = render
+        self.blit = blit
+        self.movie_fmt = movie_fmt
+        self.keep_frames = keep_frames
+        self.image_writer = image_writer
+        self.vis = None
 
         Island.Whole_map.sim_world(self.island, self.geogr)
 
@@ -149,20 +206,68 @@ class BioSim:
             Number of years to simulate
         """
 
-        self.add_population(self.pop)
-        self.vis = visualization.Visualize(num_years, img_dir=self.img_dir, img_base=self._img_base)
-
-        visualization.Visualize.update_hist_specs(self.vis, self.hist_specs)
-        visualization.Visualize.update_cmax_animals(self.vis, self.cmax_animals)
-
-        visualization.Visualize.setup_figure(self.vis, self.geogr)
-
-        for i in range(num_years):
-            self.island.new_year_whole_map()    # kjører nytt år på island
-            self.num_animals_dict()             # oppdaterer dict_count
-            self.all_herb, self.all_carn = self.island.all_animals()
-            # num_herb_tot, num_carn_tot, tot_animals = self.num_animals
-            self.vis.update_figure(self.dict_count, self.all_herb, self.all_carn)
+        if not self._ini_pop_added:
+            self.add_population(self.pop)
+            self._ini_pop_added = True
+        # animals may have been put straight into the tiles since the last call
+        self.island.find_occupied()
+        renderer = None
+        if self.vis_years:
+            img_years = self.img_years or self.vis_years
+            # images are saved in the years that are multiples of img_years, so the numbering
+            # goes on from the images of the earlier calls
+            settings = {'num_years': num_years, 'img_dir': self.img_dir,
+                        'img_base': self._img_base, 'img_fmt': self.img_fmt,
+                        'img_years': img_years, 'img_number': self.island.year // img_years,
+                        'start_year': self.island.year, 'ymax_animals': self.ymax_animals,
+                        'hist_specs': self.hist_specs, 'cmax_animals': self.cmax_animals,
+                        'geogr': self.geogr, 'blit': self.blit,
+                        'movie_fmt': self.movie_fmt, 'keep_frames': self.keep_frames,
+                        'image_writer': self.image_writer}
+            renderer = rendering.Renderer.create(self.render, settings)
+            self.vis = getattr(renderer, 'vis', None)
+            edges = rendering.hist_edges(rendering.hist_specs(self.hist_specs))
+            totals = []
+
+        logger = None
+        if self.log_file is not None:
+            from biosim.count_log import CountLogger
+            logger = CountLogger(self.log_file, self.island, append=self._log_started,
+                                 **self.log_options)
+            if not self._log_started:
+                logger.log(self.island.year)
+                self._log_started = True
+
+        if self.recorder is not None:
+            if self.recorder.size == 0:
+                self.recorder.reserve(num_years + 1)
+                self.recorder.record(self.island)
+            else:
+                self.recorder.reserve(self.recorder.size + num_years)
+
+        if self.workers is not None and self.workers > 1:
+            self.island.start_parallel(self.workers)
+        try:
+            for i in range(num_years):
+                self.island.new_year_whole_map()    # kjører nytt år på island
+                if renderer is not None:
+                    # only plain arrays go to the renderer, see rendering.py
+                    totals.append(self.island.animal_count_total())
+                    if self.island.year % self.vis_years == 0:
+                        renderer.submit(rendering.take_snapshot(self.island, totals, edges))
+                        totals = []
+                if logger is not None:
+                    logger.log(self.island.year)
+                if self.recorder is not None:
+                    self.recorder.record(self.island)
+        finally:
+            self.island.stop_parallel()
+            if renderer is not None:
+                renderer.close()
+            if logger is not None:
+                logger.close()
+            if self.recorder is not None:
+                self.recorder.flush()
 
 
 
@@ -175,22 +280,10 @@ class BioSim:
         Parameters
         ----------
         population : List of dictionaries
-            See BioSim Task Description, Sec 3.3.3 for details.
+            See BioSim Task Description, Sec 3.3.3 for details. The animals are added to the
+            animals already in the tiles, see Whole_map.add_population.
         """
-        ini_herb_list = []
-        ini_carn_list = []
-        loc_herb = None
-        loc_carn = None
-        for pop in population:
-            if pop['pop'][0]['species'] == 'Herbivore':
-                ini_herb_list = pop['pop']
-                loc_herb = pop['loc']
-
-            elif pop['pop'][0]['species'] == 'Carnivore':
-                ini_carn_list = pop['pop']
-                loc_carn = pop['loc']
-
-        self.island.add_pop(loc_herb, loc_carn, ini_herb_list, ini_carn_list)
+        self.island.add_population(population)
 
 
     @property
@@ -202,7 +295,7 @@ class BioSim:
     @property
     def num_animals(self):
         """Total number of animals on island."""
-        num_herb_tot, num_carn_tot = Island.Whole_map.animal_count_total(self.island)
+        num_herb_tot, num_carn_tot = self.island.animal_count_total()
         tot_animals = num_herb_tot + num_carn_tot
         return tot_animals
 
@@ -214,13 +307,123 @@ class BioSim:
     def num_animals_per_species(self):
         """Number of animals per species in island, as dictionary."""
         num_dict = {}
-        num_herb_tot, num_carn_tot = Island.Whole_map.animal_count_total(self.island)
+        num_herb_tot, num_carn_tot = self.island.animal_count_total()
         num_dict.update({'Herbivore':num_herb_tot})
         num_dict.update({'Carnivore': num_carn_tot})
         return num_dict
 
-    def make_movie(self):
-        self.vis.make_movie()
+    def start_profiling(self, per_tile_phases=('tile_eat',), callback=None):
+        """
+        Times every phase of every simulated year, and every tile in the phases given, see
+        profiling.py. The results are available in BioSim.profile.
+
+        Parameters
+        ----------
+        per_tile_phases : tuple
+            Phases to time per tile, e.g. ('tile_eat', 'tile_have_offspring')
+        callback : callable
+            If given, called after every year as callback(year, phase_seconds, tile_seconds)
+
+        Returns
+        -------
+        profiling.Profiler
+        """
+        from biosim import profiling
+        self.island.profiler = profiling.Profiler(per_tile_phases, callback)
+        return self.island.profiler
+
+    def stop_profiling(self):
+        """Stops timing the years. BioSim.profile keeps the results so far."""
+        self._profile = self.island.profiler
+        self.island.profiler = None
+
+    @property
+    def profile(self):
+        """
+        The Profiler with the timings of the simulated years, or None if start_profiling has
+        not been called.
+        """
+        if self.island.profiler is not None:
+            return self.island.profiler
+        return self._profile
+
+    def attach_recorder(self, path=None):
+        """
+        Records the number of herbivores and carnivores in every tile, for the initial
+        population and every year simulated after this call, see recorder.py.
+
+        Parameters
+        ----------
+        path : str
+            If given, the counts are kept in a memory mapped .npy file with this name, which
+            can be read again with TimeSeriesRecorder.open
+
+        Returns
+        -------
+        TimeSeriesRecorder
+            also available as BioSim.recorder. Its counts have shape (years, rows, cols, 2)
+        """
+        from biosim.recorder import TimeSeriesRecorder
+        self.recorder = TimeSeriesRecorder.for_island(self.island, 1, path)
+        return self.recorder
+
+    def save_checkpoint(self, path):
+        """
+        Saves the full state of the simulation to a file, so it can be continued later with
+        load_checkpoint. See checkpoint.py for the format.
+
+        Parameters
+        ----------
+        path : str
+            File name of the checkpoint, '.npz' is added if it is missing
+        """
+        from biosim import checkpoint
+        pending = [] if self._ini_pop_added else self.pop
+        checkpoint.save(self.island, path, self.geogr, self.seed, {'ini_pop': pending})
+
+    def load_checkpoint(self, path):
+        """
+        Replaces the island, the year, the parameters and the random state of the simulation
+        with those stored in a checkpoint. The settings for graphics and files are kept.
+        A following call to simulate continues from the year of the checkpoint.
+
+        Parameters
+        ----------
+        path : str
+            File name of the checkpoint
+
+        Raises
+        ------
+        ValueError
+            If the file is not a checkpoint.
+        """
+        from biosim import checkpoint
+        self.island.stop_parallel()
+        self.island, meta = checkpoint.load(path)
+        self.geogr = meta['island_map']
+        self.seed = meta['seed']
+        self.pop = meta['extra']['ini_pop']
+        self._ini_pop_added = not self.pop
+
+    def make_movie(self, movie_fmt=None):
+        """
+        Creates a movie from the saved images, see visualization.make_movie.
+        If the movie was streamed while simulating (movie_fmt given to BioSim), it already
+        exists, and nothing is done.
+
+        Parameters
+        ----------
+        movie_fmt : str
+            'mp4' or 'gif'
+        """
+        if self.img_dir is None:
+            raise RuntimeError("No filename defined.")
+        if self.movie_fmt is not None:
+            return
+        from biosim import visualization
+        img_base = self._img_base if self._img_base is not None \
+            else visualization._DEFAULT_GRAPHICS_NAME
+        visualization.make_movie(os.path.join(self.img_dir, img_base), movie_fmt)
 
 
 
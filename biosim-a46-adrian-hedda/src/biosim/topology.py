@@ -0,0 +1,189 @@
+"""
+The topology of the island: which cells are the neighbors of a cell.
+
+A Topology only knows how to find the neighbor cells of one cell. When the world is generated,
+it is compiled once into an Adjacency, an integer table over the land tiles in the compressed
+sparse row (CSR) layout: the neighbor slots of land tile number i are
+indptr[i]:indptr[i + 1] in the arrays cells and destinations. Migration and every other
+neighborhood query only read the Adjacency, so a new topology is added by subclassing
+Topology with a name, without any change to the annual cycle:
+
+    class Triangular(Topology, name='triangular'):
+        def neighbor_cells(self, key, length_y, length_x):
+            ...
+
+    island = Island.Whole_map(topology='triangular')
+"""
+
+import numpy as np
+
+
+class Adjacency:
+    """
+    The compiled neighbor table of an island. Land tile number i is the tile with the key
+    keys[i], and its neighbor slots are indptr[i]:indptr[i + 1], in the order given by the
+    topology. A migrating animal picks one of the slots of its tile at random.
+
+    Attributes
+    ----------
+    keys
+        list with the keys of the land tiles, in map order
+    index
+        dictionary from the key of a land tile to its number
+    indptr
+        integer array with the start of the neighbor slots of every land tile, and the end of
+        the last
+    cells
+        integer array with the number of the land tile in each slot, -1 if the neighbor is
+        water or outside the map
+    destinations
+        like cells, but -1 for every neighbor that does not accept animals
+    targets
+        for every land tile, a tuple with the key of the destination in each slot, None where
+        the destination is -1
+    """
+
+    def __init__(self, keys, indptr, cells, destinations):
+        self.keys = keys
+        self.index = {key: number for number, key in enumerate(keys)}
+        self.indptr = indptr
+        self.cells = cells
+        self.destinations = destinations
+        self.targets = [tuple(keys[cell] if cell >= 0 else None
+                              for cell in destinations[indptr[i]:indptr[i + 1]].tolist())
+                        for i in range(len(keys))]
+
+    def degree(self, number):
+        """The number of neighbor slots of land tile number."""
+        return int(self.indptr[number + 1] - self.indptr[number])
+
+    def neighbors(self, key):
+        """
+        The keys of the land neighbors of a land tile.
+
+        Parameters
+        ----------
+        key
+
+        Returns
+        -------
+        list of keys
+        """
+        number = self.index[key]
+        slots = self.cells[self.indptr[number]:self.indptr[number + 1]]
+        return [self.keys[cell] for cell in slots.tolist() if cell >= 0]
+
+
+class Topology:
+    """
+    Base class of the topologies. Subclasses register under a name with
+    class Name(Topology, name='...'), and implement neighbor_cells.
+    """
+    kinds = {}
+    name = None
+
+    def __init_subclass__(cls, name=None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if name is not None:
+            cls.name = name
+            Topology.kinds[name] = cls
+
+    def neighbor_cells(self, key, length_y, length_x):
+        """
+        The keys of the cells next to a cell, in the order of the neighbor slots. Keys outside
+        the map are allowed, they become slots without a destination.
+
+        Parameters
+        ----------
+        key
+            (y, x), counted from 1 like the keys of Whole_map.map_dict
+        length_y
+            number of rows of the map
+        length_x
+            number of columns of the map
+
+        Returns
+        -------
+        list of keys
+        """
+        raise NotImplementedError
+
+    def compile(self, world, keys, length_y, length_x):
+        """
+        Builds the Adjacency of a generated world.
+
+        Parameters
+        ----------
+        world
+            dictionary from key to tile, as Whole_map.world
+        keys
+            the keys of the land tiles
+        length_y
+        length_x
+
+        Returns
+        -------
+        Adjacency
+        """
+        keys = list(keys)
+        index = {key: number for number, key in enumerate(keys)}
+        indptr = [0]
+        cells = []
+        destinations = []
+        for key in keys:
+            for neighbor in self.neighbor_cells(key, length_y, length_x):
+                tile = world.get(neighbor)
+                cell = index.get(neighbor, -1)
+                cells.append(cell)
+                destinations.append(cell if tile is not None and tile.accepts_animals is True
+                                    else -1)
+            indptr.append(len(cells))
+        return Adjacency(keys, np.array(indptr, dtype=np.int64), np.array(cells, dtype=np.int64),
+                         np.array(destinations, dtype=np.int64))
+
+    @classmethod
+    def create(cls, topology):
+        """
+        Returns the topology for a name, like 'square', 'wrap' or 'hex'. A Topology object is
+        returned as it is.
+
+        Raises
+        ------
+        ValueError
+            If the name is unknown.
+        """
+        if isinstance(topology, Topology):
+            return topology
+        if topology not in cls.kinds:
+            raise ValueError(f'Unknown topology: {topology}')
+        return cls.kinds[topology]()
+
+
+class Square(Topology, name='square'):
+    """The four neighbors N, S, E and W of a square grid, as used by find_neighbors."""
+
+    def neighbor_cells(self, key, length_y, length_x):
+        key0, key1 = key
+        return [(key0, key1 - 1), (key0, key1 + 1), (key0 + 1, key1), (key0 - 1, key1)]
+
+
+class Wraparound(Square, name='wrap'):
+    """A square grid where the edges of the map wrap around to the opposite edge."""
+
+    def neighbor_cells(self, key, length_y, length_x):
+        return [((key0 - 1) % length_y + 1, (key1 - 1) % length_x + 1)
+                for key0, key1 in super().neighbor_cells(key, length_y, length_x)]
+
+
+class Hexagonal(Topology, name='hex'):
+    """
+    The six neighbors on a grid of hexagons, where every second row (y even) is shifted half a
+    cell to the right.
+    """
+
+    def neighbor_cells(self, key, length_y, length_x):
+        key0, key1 = key
+        shift = 0 if key0 % 2 == 0 else -1
+        return [(key0, key1 - 1), (key0, key1 + 1),
+                (key0 - 1, key1 + shift), (key0 - 1, key1 + shift + 1),
+                (key0 + 1, key1 + shift), (key0 + 1, key1 + shift + 1)]
@@ -1,8 +1,14 @@
 
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import numpy as np
 import subprocess
 import os
+from biosim import rendering
+from biosim.image_writer import ImageWriter, raster_formats
+from biosim.movie import MovieStream
+from biosim.rendering import _property_values
 
 
 
@@ -19,18 +25,99 @@ _DEFAULT_GRAPHICS_NAME = 'dv'
 _DEFAULT_IMG_FORMAT = 'png'
 _DEFAULT_MOVIE_FORMAT = 'mp4'   # alternatives: mp4, gif
 
+
+def make_movie(img_base, movie_fmt=None):
+    """
+    Creates a movie from the images saved with the file names img_base_00000.png and on.
+
+    .. :note:
+        Requires ffmpeg for MP4 and magick for GIF
+
+    The movie is stored as img_base + movie_fmt
+    """
+    if movie_fmt is None:
+        movie_fmt = _DEFAULT_MOVIE_FORMAT
+
+    if movie_fmt == 'mp4':
+        try:
+            # Parameters chosen according to http://trac.ffmpeg.org/wiki/Encode/H.264,
+            # section "Compatibility"
+            subprocess.check_call([_FFMPEG_BINARY,
+                                   '-i', '{}_%05d.png'.format(img_base),
+                                   '-y',
+                                   '-profile:v', 'baseline',
+                                   '-level', '3.0',
+                                   '-pix_fmt', 'yuv420p',
+                                   '{}.{}'.format(img_base, movie_fmt)])
+        except subprocess.CalledProcessError as err:
+            raise RuntimeError('ERROR: ffmpeg failed with: {}'.format(err))
+    elif movie_fmt == 'gif':
+        try:
+            subprocess.check_call([_MAGICK_BINARY,
+                                   '-delay', '1',
+                                   '-loop', '0',
+                                   '{}_*.png'.format(img_base),
+                                   '{}.{}'.format(img_base, movie_fmt)])
+        except subprocess.CalledProcessError as err:
+            raise RuntimeError('ERROR: convert failed with: {}'.format(err))
+    else:
+        raise ValueError('Unknown movie format: ' + movie_fmt)
+
+
 class Visualize:
     """
     the Visualize class is where pyplot gets to save its contributions to our project.
     Here the class object gets the attribute figure, which get further specifications through the
     various functions belonging to the Visualize class.
+
+    The figure is drawn from rendering.Snapshot objects, see rendering.py, so it can be drawn
+    in the simulating thread, in another thread or in another process.
     """
-    _hist_specs = {'fitness': {'max': 1.0, 'delta': 0.05},
-                             'age': {'max': 60.0, 'delta': 2},
-                             'weight': {'max': 60, 'delta': 2}}
-    _cmax_animals = {'Herbivore': 200, 'Carnivore': 50}
-    def __init__(self, num_years = 400, img_dir=None, img_name=None, img_fmt=None, img_base=None):
+    _hist_specs = rendering.hist_specs()
+    _cmax_animals = dict(rendering._default_cmax_animals)
 
+    def __init__(self, num_years=400, img_dir=None, img_name=None, img_fmt=None, img_base=None,
+                 img_years=None, start_year=0, ymax_animals=None, interactive=True, blit=False,
+                 movie_fmt=None, keep_frames=False, image_writer='thread', img_number=0):
+        """
+        Parameters
+        ----------
+        num_years
+            number of years shown in the animal count graph
+        img_dir
+            directory for the images, no images are saved if None
+        img_name
+            old name of img_base
+        img_fmt
+        img_base
+            beginning of the file names of the images
+        img_years
+            years between saved images
+        start_year
+            the year of the island before the first year shown
+        ymax_animals
+            upper limit of the animal count graph
+        interactive
+            if True, the figure is shown and updated on screen, otherwise it is only drawn
+            when it is saved. A figure that is not interactive is not made by pyplot, so it can
+            be drawn outside of the main thread
+        blit
+            if True, an interactive figure is updated by only drawing the parts that change on
+            top of a saved background, instead of drawing the whole figure
+        movie_fmt
+            if given, the frames are streamed into a movie of this format ('mp4' or 'gif') while
+            the simulation runs, see movie.py, instead of being saved as images. The movie is
+            img_base.movie_fmt, or img_base_YYYYY.movie_fmt when the first year is not 0
+        keep_frames
+            if True, the images are saved as well when a movie is streamed
+        image_writer
+            'thread' or 'process' to write images of raster formats in the background, see
+            image_writer.py, or None to write them with savefig in the simulating thread
+        img_number
+            number of the first image saved, so that a later run goes on with the numbering
+        """
+        if img_base is not None:
+            img_name = img_base
         if img_name is None:
             img_name = _DEFAULT_GRAPHICS_NAME
 
@@ -42,9 +129,18 @@ class Visualize:
             self.img_base = None
 
         self._img_fmt = img_fmt if img_fmt is not None else _DEFAULT_IMG_FORMAT
-
-        self._img_ctr = 0
-        self._img_step = 1
+        self._movie = None
+        self._keep_frames = keep_frames or movie_fmt is None
+        if movie_fmt is not None and self.img_base is not None:
+            name = self.img_base if start_year == 0 else f'{self.img_base}_{start_year:05d}'
+            self._movie = MovieStream(f'{name}.{movie_fmt}', movie_fmt)
+        self._writer = None
+        if self.img_base is not None and self._keep_frames and image_writer is not None \
+                and self._img_fmt in raster_formats:
+            self._writer = ImageWriter(image_writer)
+
+        self._img_ctr = img_number
+        self._img_step = img_years if img_years else 1
 
         # the following will be initialized by _setup_graphics
         self._fig = None
@@ -53,52 +149,56 @@ class Visualize:
         self._mean_ax = None
         self._mean_line = None
 
-        self.fig = plt.figure(figsize=(10, 10))
-        self.year = 0
+        if interactive:
+            self.fig = plt.figure(figsize=(10, 10))
+        else:
+            # a figure outside of pyplot, drawn with Agg, can be used from any thread whatever
+            # the backend of pyplot is
+            self.fig = Figure(figsize=(10, 10))
+            FigureCanvasAgg(self.fig)
+        self.year = start_year
+        self.start_year = start_year
         self.num_years = num_years
+        self.ymax_animals = ymax_animals
+        self.interactive = interactive
+        self.blit = blit
+        self._background = None
+        # heatmap images by species, created once by setup_figure
+        self.heat_img = {}
         self.cax = {0: self.fig.add_axes([0.4, 0.4, 0.05, 0.2]),
                     1: self.fig.add_axes([0.52, 0.4, 0.05, 0.2])}
 
     def make_movie(self, movie_fmt=None):
         """
-        Creates MPEG4 movie from visualization images saved.
-
-        .. :note:
-            Requires ffmpeg for MP4 and magick for GIF
-
-        The movie is stored as img_base + movie_fmt
+        Creates MPEG4 movie from visualization images saved, see make_movie.
         """
 
         if self.img_base is None:
             raise RuntimeError("No filename defined.")
+        # waits for the images still being written
+        self.finish()
+        if self._movie is not None:
+            # the movie was streamed while the simulation ran
+            return
+        make_movie(self.img_base, movie_fmt)
 
-        if movie_fmt is None:
-            movie_fmt = _DEFAULT_MOVIE_FORMAT
-
-        if movie_fmt == 'mp4':
-            try:
-                # Parameters chosen according to http://trac.ffmpeg.org/wiki/Encode/H.264,
-                # section "Compatibility"
-                subprocess.check_call([_FFMPEG_BINARY,
-                                       '-i', '{}_%05d.png'.format(self.img_base),
-                                       '-y',
-                                       '-profile:v', 'baseline',
-                                       '-level', '3.0',
-                                       '-pix_fmt', 'yuv420p',
-                                       '{}.{}'.format(self.img_base, movie_fmt)])
-            except subprocess.CalledProcessError as err:
-                raise RuntimeError('ERROR: ffmpeg failed with: {}'.format(err))
-        elif movie_fmt == 'gif':
-            try:
-                subprocess.check_call([_MAGICK_BINARY,
-                                       '-delay', '1',
-                                       '-loop', '0',
-                                       '{}_*.png'.format(self.img_base),
-                                       '{}.{}'.format(self.img_base, movie_fmt)])
-            except subprocess.CalledProcessError as err:
-                raise RuntimeError('ERROR: convert failed with: {}'.format(err))
-        else:
-            raise ValueError('Unknown movie format: ' + movie_fmt)
+    def finish(self):
+        """
+        Ends the streamed movie, if any, and waits until it and all images are written.
+        """
+        try:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        finally:
+            if self._movie is not None:
+                self._movie.close()
+
+    def close(self):
+        """Ends the streamed movie, and closes the figure."""
+        self.finish()
+        if self.interactive:
+            plt.close(self.fig)
 
     def _save_graphics(self, step):
         """Saves graphics to file if file name given."""
@@ -106,9 +206,27 @@ class Visualize:
         if self.img_base is None or step % self._img_step != 0:
             return
 
-        plt.savefig('{base}_{num:05d}.{type}'.format(base=self.img_base,
+        # animated artists are left out of a full draw, so they are turned off while saving
+        animated = [artist for artist in self._changing_artists() if artist.get_animated()]
+        for artist in animated:
+            artist.set_animated(False)
+        file_name = '{base}_{num:05d}.{type}'.format(base=self.img_base,
                                                      num=self._img_ctr,
-                                                     type=self._img_fmt))
+                                                     type=self._img_fmt)
+        if self._movie is not None or self._writer is not None:
+            # the figure is drawn once, and its pixels go to the movie and the image writer
+            canvas = self.fig.canvas
+            canvas.draw()
+            pixels = canvas.buffer_rgba()
+            if self._movie is not None:
+                width, height = canvas.get_width_height(physical=True)
+                self._movie.write(pixels, width, height)
+            if self._writer is not None:
+                self._writer.submit(file_name, np.array(pixels), self.fig.dpi)
+        if self._keep_frames and self._writer is None:
+            self.fig.savefig(file_name)
+        for artist in animated:
+            artist.set_animated(True)
         self._img_ctr += 1
 
     def update_hist_specs(self, hist_specs):
@@ -120,7 +238,7 @@ class Visualize:
                              'weight': {'max': 60, 'delta': 2}}
         """
         if hist_specs:
-            self._hist_specs.update(hist_specs)
+            self._hist_specs = {**self._hist_specs, **hist_specs}
 
     def update_cmax_animals(self, cmax_animals):
         """
@@ -128,7 +246,7 @@ class Visualize:
         which shows the colors og the heatmap
         """
         if cmax_animals:
-            self._cmax_animals.update(cmax_animals)
+            self._cmax_animals = {**self._cmax_animals, **cmax_animals}
 
     def plot_island_map(self, island_map):
         rgb_value = {'W': (0.0, 0.0, 1.0),  # blue
@@ -157,43 +275,28 @@ class Visualize:
                                           facecolor=rgb_value[name[0]]))
             ax_lg.text(0.35, ix * 0.17, name, transform=ax_lg.transAxes)
 
-    def plot_empty_heatmap(self, ax, map_values):
+    def plot_empty_heatmap(self, ax, map_values, species=0):
         """
         Before the figure can start looking at animals in tiles, it needs to initialize the
         heatmap. this creates a matrix with sides equal to the lenghts of the map.
-        All values in this matrix is zero, and then the function plots this empty heatmap.
-        These zero values are then updated in the update heatmap function.
+        All values in this matrix is zero, and then the function plots this empty heatmap,
+        with its colorbar. The image and the colorbar are only made here, update heatmap only
+        changes the data of the image.
         """
         self.matrix = np.zeros((len(map_values), len(map_values[0])))
-        #self.matrix_img = None
-        ax.imshow(self.matrix)
-        #self.matrix_img = ax.imshow(self.matrix)
-
-
+        name = 'Herbivore' if species == 0 else 'Carnivore'
+        img = ax.imshow(self.matrix, vmin=0, vmax=self._cmax_animals[name])
+        self.fig.colorbar(img, self.cax[species])
+        self.heat_img[species] = img
 
-    def update_heatmap(self, ax, year_dict, species):
+    def update_heatmap(self, ax, grid, species):
         """
-        The update heatmap function looks at the dictionary of that year, for where animals can be
-        found. This dictionary provides the amount of herbivores and carnivores given at a
-        specific tile, and is accessed through the tile coordinate as key.
-
-        the ax.clear tells the plotting to disregard the original image, and lets the update
-        heatmap function change the matrix used in the original image.
-        In this way the code deletes the previous image, preventing slower running code.
-
+        The update heatmap function shows the number of animals of one species in every tile.
+        The counts come as an array with the same shape as the map, see Whole_map.count_grid,
+        and replace the data of the image made by plot empty heatmap. The axes, the image and
+        the colorbar are kept, so the cost of an update does not grow over the years.
         """
-        ax.clear()
-        for key in year_dict.keys():
-            self.matrix[key[0] - 1, key[1] - 1] = year_dict[key][species]
-
-
-        if species == 0:
-            img = ax.imshow(self.matrix, vmin=0, vmax=self._cmax_animals['Herbivore'])
-        elif species == 1:
-            img = ax.imshow(self.matrix, vmin=0, vmax=self._cmax_animals['Carnivore'])
-
-
-        self.fig.colorbar(img, self.cax[species])
+        self.heat_img[species].set_data(grid)
 
     def setup_figure(self, geogr):
         """
@@ -218,7 +321,7 @@ class Visualize:
         animal_graph = self.fig.add_subplot(3, 3, 3)
         animal_graph.set_title('Animals count')
         animal_graph.set_xlim(0, self.num_years)
-        animal_graph.set_ylim(0, 12000)
+        animal_graph.set_ylim(0, 12000 if self.ymax_animals is None else self.ymax_animals)
         self.line_herb = animal_graph.plot(np.arange(self.num_years),
                        np.full(self.num_years, np.nan), 'b-')[0]
         self.line_carn = animal_graph.plot(np.arange(self.num_years),
@@ -233,7 +336,7 @@ class Visualize:
         # Herbivore heatmap
         self.herb_heat = self.fig.add_subplot(3, 3, 4)
         self.herb_heat.set_title('Herbivores')
-        self.plot_empty_heatmap(self.herb_heat, map_values)
+        self.plot_empty_heatmap(self.herb_heat, map_values, 0)
 
         # Sette lengden på aksene
         self.herb_heat.set_xticks(range(len(map_values[0])))
@@ -247,7 +350,7 @@ class Visualize:
         # Carnivore heatmap
         self.carn_heat = self.fig.add_subplot(3, 3, 6)
         self.carn_heat.set_title('Carnivores')
-        self.plot_empty_heatmap(self.carn_heat, map_values)
+        self.plot_empty_heatmap(self.carn_heat, map_values, 1)
 
         # Sette lengden på aksene
         self.carn_heat.set_xticks(range(len(map_values[0])))
@@ -258,15 +361,10 @@ class Visualize:
 
 
         # BAR CHARTS
-        self.bin_edges_fitness = np.arange(0,
-                                           self._hist_specs['fitness']['max'] + self._hist_specs['fitness']['delta'] / 2,
-                                           self._hist_specs['fitness']['delta'])
-        self.bin_edges_age = np.arange(0,
-                                       self._hist_specs['age']['max'] + self._hist_specs['age']['delta'] / 2,
-                                       self._hist_specs['age']['delta'])
-        self.bin_edges_weight = np.arange(0,
-                                          self._hist_specs['weight']['max'] + self._hist_specs['weight']['delta'] / 2,
-                                          self._hist_specs['weight']['delta'])
+        edges = rendering.hist_edges(self._hist_specs)
+        self.bin_edges_fitness = edges['fitness']
+        self.bin_edges_age = edges['age']
+        self.bin_edges_weight = edges['weight']
 
         self.fitness_bars = self.fig.add_subplot(3, 3, 7)
         self.fitness_bars.set_title("Fitness")
@@ -288,69 +386,87 @@ class Visualize:
         self.hist_weight_carn = self.weight_bars.stairs(hist_counts, self.bin_edges_weight, color='r', lw=2)
         self.hist_weight_herb = self.weight_bars.stairs(hist_counts, self.bin_edges_weight, color='b', lw=2)
         self.weight_bars.set_ylim([0, 2000])
-        plt.draw()
+        if self.interactive and self.blit:
+            for artist in self._changing_artists():
+                artist.set_animated(True)
+            self.fig.canvas.draw()
+            self._background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        elif self.interactive:
+            plt.draw()
+
+    def _changing_artists(self):
+        """The artists that change from year to year."""
+        return [self.year_count.title, self.line_herb, self.line_carn,
+                self.heat_img[0], self.heat_img[1],
+                self.hist_fit_herb, self.hist_fit_carn, self.hist_age_herb, self.hist_age_carn,
+                self.hist_weight_herb, self.hist_weight_carn]
+
+    def _blit(self):
+        """Draws only the changing artists on top of the saved background."""
+        canvas = self.fig.canvas
+        canvas.restore_region(self._background)
+        for artist in self._changing_artists():
+            self.fig.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
 
     def update_figure(self, year_dict, tot_herb, tot_carn):
         """
         Update figure allows for the already existing figure to be changed, without having to
         create a new figure for each year. Updating already existing figures is generally
         faster than continually creating new ones.
+
+        The counts per tile and the animals are turned into a snapshot of the next year, which
+        is drawn with draw_snapshot.
+        """
+        grid = np.zeros(self.matrix.shape + (2,), dtype=np.int64)
+        for key, counts in year_dict.items():
+            grid[key[0] - 1, key[1] - 1] = counts
+        hists = {}
+        for prop, edges in (('fitness', self.bin_edges_fitness), ('age', self.bin_edges_age),
+                            ('weight', self.bin_edges_weight)):
+            hists[prop] = (np.histogram(_property_values(tot_herb, prop), edges)[0],
+                           np.histogram(_property_values(tot_carn, prop), edges)[0])
+        totals = np.array([[len(tot_herb), len(tot_carn)]])
+        self.draw_snapshot(rendering.Snapshot(self.year + 1, grid, totals, hists))
+
+    def draw_snapshot(self, snapshot):
+        """
+        Draws the figure for the year of a snapshot, and saves it to file if the year is one of
+        the years to save images for.
+
+        Parameters
+        ----------
+        snapshot
+            rendering.Snapshot
         """
         # UPDATE YEAR
-        self.year += 1 #Flytt til slutten
+        self.year = snapshot.year
         self.year_count.set_title("Year: {}".format(self.year))
 
-
         # UPDATE ANIMAL COUNT
-        ydata = self.line_herb.get_ydata()
-        ydata[self.year-1] = len(tot_herb)
-        self.line_herb.set_ydata(ydata)
-
-        ydata = self.line_carn.get_ydata()
-        ydata[self.year-1] = len(tot_carn)
-        self.line_carn.set_ydata(ydata)
-
-
-        self._save_graphics(self.year)
+        # the totals of every year since the last snapshot, so the lines have no gaps
+        last = self.year - self.start_year
+        first = last - len(snapshot.totals)
+        for line, species in ((self.line_herb, 0), (self.line_carn, 1)):
+            ydata = line.get_ydata()
+            ydata[max(first, 0):last] = snapshot.totals[max(-first, 0):, species]
+            line.set_ydata(ydata)
 
         # UPDATE HEATMAP
-        # HERBIVORES
-        self.update_cmax_animals(self._cmax_animals)
-
-        self.update_heatmap(self.herb_heat, year_dict, 0,)
-
-        # CARNIVORES
-        self.update_heatmap(self.carn_heat, year_dict,1)
-
+        self.update_heatmap(self.herb_heat, snapshot.grid[:, :, 0], 0)
+        self.update_heatmap(self.carn_heat, snapshot.grid[:, :, 1], 1)
 
         # UPDATE BAR CHARTS
+        self.hist_fit_herb.set_data(snapshot.hists['fitness'][0])
+        self.hist_fit_carn.set_data(snapshot.hists['fitness'][1])
+        self.hist_age_herb.set_data(snapshot.hists['age'][0])
+        self.hist_age_carn.set_data(snapshot.hists['age'][1])
+        self.hist_weight_herb.set_data(snapshot.hists['weight'][0])
+        self.hist_weight_carn.set_data(snapshot.hists['weight'][1])
 
-        #FITNESS
-
-        data_fitness_herb = [herb.fitness for herb in tot_herb]
-        hist_counts_fitness_herb, _ = np.histogram(data_fitness_herb, self.bin_edges_fitness)
-        self.hist_fit_herb.set_data(hist_counts_fitness_herb)
-        data_fitness_carn = [carn.fitness for carn in tot_carn]
-        hist_counts_fitness_carn, _ = np.histogram(data_fitness_carn, self.bin_edges_fitness)
-        self.hist_fit_carn.set_data(hist_counts_fitness_carn)
-
-        #AGE
-        data_age_herb = [herb.age for herb in tot_herb]
-        hist_counts_age_herb, _ = np.histogram(data_age_herb, self.bin_edges_age)
-        self.hist_age_herb.set_data(hist_counts_age_herb)
-        data_age_carn = [carn.age for carn in tot_carn]
-        hist_counts_age_carn, _ = np.histogram(data_age_carn, self.bin_edges_age)
-        self.hist_age_carn.set_data(hist_counts_age_carn)
-
-        #WEIGHT
-        data_weight_herb = [herb.weight for herb in tot_herb]
-        hist_counts_weight_herb, _ = np.histogram(data_weight_herb, self.bin_edges_weight)
-        self.hist_weight_herb.set_data(hist_counts_weight_herb)
-        data_weight_carn = [carn.weight for carn in tot_carn]
-        hist_counts_weight_carn, _ = np.histogram(data_weight_carn, self.bin_edges_weight)
-        self.hist_weight_carn.set_data(hist_counts_weight_carn)
-
-        plt.pause(1e-6)
-
-
-
+        self._save_graphics(self.year)
+        if self.interactive and self._background is not None:
+            self._blit()
+        elif self.interactive:
+            plt.pause(1e-6)
@@ -5,6 +5,8 @@ from src.biosim import Tile
 #from biosim import Plotting
 import textwrap
 import random
+import numpy as np
+import pytest
 
 
 def test_create_map_dict():
@@ -84,30 +86,23 @@ def test_find_neighbors():
     the find neighbors test makes sure that the tile in the middle has the correct adjacent
     neighbors.
     """
-    geogr = """\
-                    WWW
-                    WLW
-                    WWW"""
+    geogr = textwrap.dedent("""\
+                            WWW
+                            WLW
+                            WWW""")
     test_map = biosim.Island.Whole_map()
     test_map.create_map(geogr)
     test_map.generate_world()
     test_map.find_neighbors()
 
-    N_neighbor = type(test_map.world[(2,2)].N_neighbor)
-    N_neighbor_postition = test_map.world[(2, 2)].N_neighbor_position
-    S_neighbor = type(test_map.world[(2,2)].S_neighbor)
-    S_neighbor_position = test_map.world[(2, 2)].S_neighbor_position
-    E_neighbor = type(test_map.world[(2,2)].E_neighbor)
-    E_neighbor_position = test_map.world[(2, 2)].E_neighbor_position
-    W_neighbor = type(test_map.world[(2,2)].W_neighbor)
-    W_neighbor_position = test_map.world[(2, 2)].W_neighbor_position
-
-    test_type_list = [N_neighbor, S_neighbor, E_neighbor, W_neighbor]
+    neighbor_keys = test_map.neighbor_keys((2, 2))
+    test_type_list = [type(test_map.world[key]) for key in neighbor_keys]
     answer_type_list = [biosim.Tile.Water, biosim.Tile.Water, biosim.Tile.Water, biosim.Tile.Water]
-    test_position_list = [N_neighbor_postition, S_neighbor_position, E_neighbor_position, W_neighbor_position]
-    answer_position_list =['(2, 1)', '(2, 3)', '(3, 2)', '(1, 2)']
+    answer_position_list = [(2, 1), (2, 3), (3, 2), (1, 2)]
 
-    assert test_type_list == answer_type_list and test_position_list == answer_position_list
+    assert test_type_list == answer_type_list and neighbor_keys == answer_position_list
+    assert test_map.land_neighbors((2, 2)) == []
+    assert list(test_map.adjacency.destinations) == [-1, -1, -1, -1]
 
 def test_migrate_all_animals(): #må gjøres statistisk
     """
@@ -170,3 +165,163 @@ def test_count_animals():
 
     assert tot_carn and tot_herb == 90
 
+
+def test_migration_moves_leavers_to_land_neighbors():
+    """
+    Every animal that wants to migrate from the middle tile either moves to a land neighbor, or
+    stays if it picked the water tile, on both backends. No animal is lost or duplicated.
+    """
+    geogr = textwrap.dedent("""\
+                            WWWWW
+                            WLLLW
+                            WWLWW
+                            WWWWW""")
+    for backend in ('object', 'array'):
+        island = biosim.Island.Whole_map(backend, seed=3)
+        island.sim_world(geogr)
+        island.add_pop((2, 3), None, [{'age': 5, 'weight': 20} for _ in range(400)], None)
+        herbs = island.world[(2, 3)].herb
+        if backend == 'array':
+            herbs.migrating[:] = True
+        else:
+            for herb in herbs:
+                herb.migrating = True
+        island.migrate()
+        counts = island.animal_count_dict()
+        assert sum(counts[key][0] for key in counts) == 400
+        assert all(counts[key][0] == 0 for key in counts if island.map_dict[key] == 'W')
+        assert all(counts[key][0] > 50 for key in [(2, 2), (2, 4), (3, 3), (2, 3)])
+        for key in [(2, 2), (2, 4), (3, 3)]:
+            moved = island.world[key].herb
+            flags = moved.migrating if backend == 'array' else [a.migrating for a in moved]
+            assert not any(flags)
+        assert island.land_keys == [(2, 2), (2, 3), (2, 4), (3, 3)]
+
+
+def test_map_grids():
+    """
+    The map is held as a grid of landscape codes, the annual cycle and the counts only visit
+    the land cells, and the fodder grid holds what is left after the herbivores ate.
+    """
+    geogr = textwrap.dedent("""\
+                            WWWWW
+                            WLHDW
+                            WWLWW
+                            WWWWW""")
+    island = biosim.Island.Whole_map('array', seed=2)
+    island.sim_world(geogr)
+    symbols = np.array(island._landscapes)[island.landscape]
+    assert [''.join(row) for row in symbols] == geogr.splitlines()
+    assert island.land.tolist() == [6, 7, 8, 12]
+    assert [island.tiles[cell] for cell in island.land] == island.land_tiles
+    with pytest.raises(ValueError):
+        island.add_pop((1, 1), None, [{'age': 5, 'weight': 20}], None)
+
+    island.add_pop((2, 2), (2, 3), [{'age': 5, 'weight': 20}] * 500,
+                   [{'age': 5, 'weight': 20}] * 3)
+    island.new_year_whole_map()
+    assert island.fodder[1, 1] < island.world[(2, 2)]._compiled.fodder
+    assert island.fodder[1, 3] == 0 and island.fodder[0, 0] == 0
+    herbs, carns = island.all_animals()
+    offsets = island.animal_ranges()
+    grid = island.count_grid()
+    assert offsets[0, -1] == len(herbs) and offsets[1, -1] == len(carns)
+    assert np.array_equal(np.diff(offsets, axis=1).T, grid.reshape(-1, 2))
+    assert island.animal_count_total() == tuple(grid.sum(axis=(0, 1)))
+
+
+def test_map_validation_is_reported_once():
+    """
+    Invalid maps raise the same errors as when they were checked line by line.
+    """
+    with pytest.raises(ValueError, match='Landscape'):
+        biosim.Island.Whole_map().create_map('WWW\nWXW\nWWW')
+    with pytest.raises(ValueError, match='uniform'):
+        biosim.Island.Whole_map().create_map('WWW\nWLLW\nWWW')
+    with pytest.raises(ValueError, match='border'):
+        biosim.Island.Whole_map().create_map('WWW\nWLW\nWLW')
+
+
+def test_occupied_tiles_follow_the_animals():
+    """
+    Only the tiles with animals are occupied: adding animals and migrating into a tile occupies
+    it, and a tile whose animals all die or leave is no longer occupied. The counts are the
+    same as counting every land tile.
+    """
+    geogr = textwrap.dedent("""\
+                            WWWWWW
+                            WLLLLW
+                            WLLLLW
+                            WWWWWW""")
+    for backend in ('object', 'array'):
+        island = biosim.Island.Whole_map(backend, seed=6)
+        island.sim_world(geogr)
+        assert island.occupied == set() and island.animal_count_total() == (0, 0)
+        island.add_pop((2, 2), None, [{'age': 5, 'weight': 20} for _ in range(200)], None)
+        assert island.occupied == {island.world[(2, 2)].index}
+        for _ in range(5):
+            island.new_year_whole_map()
+            occupied = {tile.index for tile in island.land_tiles if tile.herb or tile.carn}
+            assert island.occupied == occupied
+            counts = [island.world[key].count_animals() for key in island.land_keys]
+            assert island.animal_count_total() == tuple(np.sum(counts, axis=0))
+        assert len(island.occupied) > 1
+
+        biosim.Island.set_all_parameters({'Herbivore': {'omega': 1e6}})
+        try:
+            island.new_year_whole_map()
+        finally:
+            biosim.Island.set_all_parameters({'Herbivore': {'omega': 0.4}})
+        assert island.occupied == set() and island.animal_count_total() == (0, 0)
+
+
+def test_counters_match_counting_the_tiles():
+    """
+    The counters kept through births, feeding, migration and deaths give the same numbers as
+    counting the animals of every tile, without visiting the tiles when they are read.
+    """
+    geogr = textwrap.dedent("""\
+                            WWWWWW
+                            WLLHLW
+                            WLDLLW
+                            WWWWWW""")
+    for backend in ('object', 'array'):
+        island = biosim.Island.Whole_map(backend, seed=9)
+        island.sim_world(geogr)
+        island.add_pop((2, 2), (3, 3), [{'age': 5, 'weight': 30} for _ in range(150)],
+                       [{'age': 5, 'weight': 30} for _ in range(20)])
+        for _ in range(6):
+            island.new_year_whole_map()
+            counted = {key: list(island.world[key].count_animals()) for key in island.map_dict}
+            assert island.animal_count_dict() == counted
+            assert island.animal_count_total() == tuple(np.sum(list(counted.values()), axis=0))
+        for tile in island.tiles:
+            tile.count_animals = None
+        assert island.animal_count_total() == tuple(island.count_grid().sum(axis=(0, 1)))
+
+
+def test_animals_added_through_the_tiles_are_simulated():
+    """
+    Animals added with the functions of a tile are counted and simulated, and animals put
+    straight into the lists of a tile are found when BioSim.simulate starts.
+    """
+    from biosim.simulation import BioSim
+    geogr = textwrap.dedent("""\
+                            WWWWW
+                            WLLLW
+                            WWWWW""")
+    island = biosim.Island.Whole_map('object', seed=1)
+    island.sim_world(geogr)
+    island.world[(2, 3)].add_pop_tile_herb([{'age': 5, 'weight': 20} for _ in range(10)])
+    assert island.animal_count_total() == (10, 0)
+    island.new_year_whole_map()
+    assert all(herb.age == 6 for key in island.land_keys for herb in island.world[key].herb)
+
+    ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}]}]
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0)
+    sim.simulate(0)
+    sim.island.world[(2, 4)].herb = [Animal.Herbivores(5, 20) for _ in range(10)]
+    sim.simulate(1)
+    assert sim.num_animals_per_species['Herbivore'] >= 10
+    assert all(herb.age == 6 for key in sim.island.land_keys
+               for herb in sim.island.world[key].herb)
@@ -0,0 +1,89 @@
+from biosim import Animal
+from biosim import Island
+from biosim import Tile
+from biosim.Population import Population
+import numpy as np
+import textwrap
+
+
+def test_population_fitness_matches_animal():
+    """
+    The fitness of every animal in a population should be the same as the fitness the Animal
+    class gives an animal of the same age and weight.
+    """
+    ages = [0, 5, 20, 60]
+    weights = [3., 10., 35., 50.]
+    pop = Population(Animal.Herbivores, ages, weights)
+    for i in range(len(ages)):
+        herb = Animal.Herbivores(ages[i], weights[i])
+        assert np.isclose(pop.fitness[i], herb.fitness)
+
+
+def test_population_aging_and_weight_loss():
+    """
+    Aging increases every age by one, and weight loss removes the fraction eta of every weight.
+    """
+    pop = Population(Animal.Carnivores, [1, 2, 3], [10., 20., 30.])
+    pop.aging()
+    pop.weight_loss()
+    eta = Animal.Carnivores._param['eta']
+    assert list(pop.age) == [2, 3, 4]
+    assert np.allclose(pop.weight, np.array([10., 20., 30.]) * (1 - eta))
+
+
+def test_population_dying_removes_weightless():
+    """
+    Animals with a weight of zero always die, and get removed from the population.
+    """
+    pop = Population(Animal.Herbivores, [5, 5], [0., 20.])
+    pop.dying(np.random.default_rng(1))
+    assert len(pop) <= 1 and np.all(pop.weight > 0)
+
+
+def test_population_select_and_extend():
+    """
+    Selected animals can be moved from one population to another.
+    """
+    pop = Population(Animal.Herbivores, [1, 2, 3], [10., 20., 30.])
+    other = Population(Animal.Herbivores)
+    movers = pop.select(np.array([False, True, True]))
+    pop.keep(np.array([True, False, False]))
+    other.extend(movers)
+    assert len(pop) == 1 and list(other.age) == [2, 3]
+
+
+def test_array_tile_yearly_functions():
+    """
+    A tile with the array backend can run through a whole year with its animals.
+    """
+    tile = Tile.Lowland('array')
+    tile.add_pop_tile_herb([{'age': 5, 'weight': 20} for _ in range(50)])
+    tile.add_pop_tile_carn([{'age': 5, 'weight': 20} for _ in range(10)])
+    tile.tile_have_offspring()
+    tile.tile_eat()
+    tile.tile_will_migrate()
+    tile.tile_aging()
+    tile.tile_weight_loss()
+    tile.tile_dying()
+    tile.tile_reset_parent()
+    num_herb, num_carn = tile.count_animals()
+    assert isinstance(tile.herb, Population) and num_herb > 0 and np.all(tile.herb.parent)
+
+
+def test_array_island_keeps_animals_on_land():
+    """
+    Animals in an island with the array backend only migrate to tiles that accept animals.
+    """
+    geogr = textwrap.dedent("""\
+                            WWWWW
+                            WLLLW
+                            WWWWW""")
+    island = Island.Whole_map('array')
+    island.sim_world(geogr)
+    island.add_pop((2, 3), None, [{'age': 5, 'weight': 20} for _ in range(100)], None)
+    for _ in range(5):
+        island.new_year_whole_map()
+    counts = island.animal_count_dict()
+    water_herbs = sum(counts[key][0] for key in counts if island.map_dict[key] == 'W')
+    all_herb, all_carn = island.all_animals()
+    assert water_herbs == 0 and len(all_herb) == island.animal_count_total()[0]
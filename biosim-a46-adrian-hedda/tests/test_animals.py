@@ -0,0 +1,94 @@
+from biosim import Animal
+import math
+import numpy as np
+import pytest
+
+
+def test_fitness_is_recomputed_lazily():
+    """
+    Aging only marks the fitness as stale. The fitness is recomputed when it is read, and is then
+    the same as for a new animal with the same age and weight.
+    """
+    herb = Animal.Herbivores(10, 20)
+    herb.aging()
+    assert herb._fitness_stale is True
+    assert herb.fitness == Animal.Herbivores(11, 20).fitness
+    assert herb._fitness_stale is False
+
+
+def test_refresh_fitness_batch():
+    """
+    The batched fitness update of many stale animals gives the same fitness as computing it for
+    each animal on its own.
+    """
+    herbs = [Animal.Herbivores(i % 50, 5 + i % 30) for i in range(100)]
+    for herb in herbs:
+        herb.weight_loss()
+    Animal.Herbivores.refresh_fitness(herbs)
+    for herb in herbs:
+        assert herb._fitness_stale is False
+        assert math.isclose(herb.fitness, Animal.Herbivores(herb.age, herb.weight).fitness)
+
+
+def test_age_factor_table_matches_formula():
+    """
+    The age factors looked up in the table are exactly the values of the formula, also for ages
+    that are older than the table was when the animal was created.
+    """
+    param = Animal.Carnivores._param
+    for age in [0, 3, 40, 95]:
+        table = Animal.Carnivores.age_factors(age)
+        assert table[age] == 1 / (1 + math.exp(param['phi_age'] * (age - param['a_half'])))
+
+
+def test_age_factor_table_rebuilt_on_set_param():
+    """
+    Changing phi_age clears the table, so the fitness uses the new parameter value.
+    """
+    old_phi_age = Animal.Herbivores._param['phi_age']
+    Animal.Herbivores.age_factors(30)
+    Animal.Herbivores.set_param({'phi_age': 0.3})
+    herb = Animal.Herbivores(30, 20)
+    q_positive = 1 / (1 + math.exp(0.3 * (30 - Animal.Herbivores._param['a_half'])))
+    q_negative = 1 / (1 + math.exp(-(Animal.Herbivores._param['phi_weight']
+                                     * (20 - Animal.Herbivores._param['w_half']))))
+    Animal.Herbivores.set_param({'phi_age': old_phi_age})
+    assert herb.fitness == q_positive * q_negative
+
+
+def test_set_param_rejects_invalid_values():
+    """
+    Unknown parameters and negative values raise a ValueError, and leave the parameters as they
+    were.
+    """
+    old_param = dict(Animal.Herbivores._param)
+    with pytest.raises(ValueError):
+        Animal.Herbivores.set_param({'beta': 0.5, 'not_a_parameter': 1})
+    with pytest.raises(ValueError):
+        Animal.Herbivores.set_param({'eta': -0.1})
+    with pytest.raises(ValueError):
+        Animal.Herbivores.set_param({'eta': True})
+    assert Animal.Herbivores._param == old_param
+
+
+def test_set_param_accepts_numpy_scalars():
+    """
+    NumPy numbers, as read from arrays or parameter files, are valid parameter values.
+    """
+    old_param = dict(Animal.Carnivores._param)
+    Animal.Carnivores.set_param({'F': np.int64(40), 'eta': np.float32(0.2)})
+    param = Animal.Carnivores.params()
+    Animal.Carnivores.set_param(old_param)
+    assert param.F == 40 and param.eta == pytest.approx(0.2)
+
+
+def test_compiled_parameters_follow_set_param():
+    """
+    Changing a parameter compiles new parameters, with the derived constants updated.
+    """
+    old_zeta = Animal.Carnivores._param['zeta']
+    Animal.Carnivores.set_param({'zeta': 2.0})
+    param = Animal.Carnivores.params()
+    Animal.Carnivores.set_param({'zeta': old_zeta})
+    assert param.birth_threshold == 2.0 * (param.w_birth + param.sigma_birth)
+    assert Animal.Carnivores.params().zeta == old_zeta
@@ -0,0 +1,73 @@
+from biosim import batch
+import numpy as np
+
+island_map = "WWWW\nWLHW\nWLLW\nWWWW"
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+
+
+def test_ensemble_shapes_and_summary():
+    """
+    The ensemble returns the counts of every replicate and year, and the mean lies inside the
+    range of the replicates.
+    """
+    result = batch.run_ensemble(island_map, ini_pop, seeds=[1, 2, 3], num_years=5, processes=1)
+    assert result['counts'].shape == (3, 6, 2)
+    assert list(result['counts'][0, 0]) == [40, 5]
+    assert np.all(result['mean'] >= result['counts'].min(axis=0))
+    assert np.all(result['ci_low'] <= result['ci_high'])
+
+
+def test_ensemble_pool_matches_serial():
+    """
+    Replicates give the same counts in the process pool as in the calling process.
+    """
+    serial = batch.run_ensemble(island_map, ini_pop, seeds=[4, 5], num_years=4, processes=1,
+                                backend='array')
+    pooled = batch.run_ensemble(island_map, ini_pop, seeds=[4, 5], num_years=4, processes=2,
+                                backend='array')
+    assert np.array_equal(serial['counts'], pooled['counts'])
+
+
+def test_sweep_points_grid():
+    """
+    Every combination of values in the grid becomes one sweep point.
+    """
+    points = batch.sweep_points({'Herbivore': {'beta': [0.8, 0.9]}, 'L': {'f_max': [600, 800]}})
+    assert len(points) == 4
+    assert {'Herbivore': {'beta': 0.9}, 'L': {'f_max': 600}} in points
+
+
+def test_sweep_restores_parameters():
+    """
+    A sweep applies the parameters of each point, and leaves the parameters of the calling
+    process as they were.
+    """
+    from biosim import Tile
+    old_fodder = Tile.Lowland._param['Fodder']
+    result = batch.run_sweep(island_map, ini_pop, {'L': {'f_max': [0, 800]}}, num_years=6,
+                             seeds=[1, 2], processes=1)
+    assert result['counts'].shape == (2, 2, 7, 2)
+    assert Tile.Lowland._param['Fodder'] == old_fodder
+    assert result['mean'][0, -1, 0] < result['mean'][1, -1, 0]
+
+
+def test_ensemble_member_matches_biosim():
+    """
+    An ensemble member starts from the same population as BioSim, through
+    Whole_map.add_population, and simulates the same years for the same seed.
+    """
+    from biosim.simulation import BioSim
+    mixed = ini_pop + [{'loc': (3, 3), 'pop': [{'species': 'Carnivore', 'age': 3, 'weight': 15},
+                                               {'species': 'Herbivore', 'age': 2, 'weight': 9}]}]
+    result = batch.run_ensemble(island_map, mixed, seeds=[7], num_years=3, processes=1)
+    sim = BioSim(island_map, mixed, seed=7, vis_years=0)
+    sim.simulate(0)
+    counts = []
+    for _ in range(4):
+        counts.append([sim.num_animals_per_species['Herbivore'],
+                       sim.num_animals_per_species['Carnivore']])
+        sim.simulate(1)
+    assert result['counts'][0].tolist() == counts
+    assert counts[0] == [41, 6]
@@ -0,0 +1,77 @@
+import importlib.util
+import json
+import os
+
+path = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'annual_cycle.py')
+spec = importlib.util.spec_from_file_location('annual_cycle', path)
+annual_cycle = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(annual_cycle)
+
+
+def test_map_sizes():
+    """
+    The benchmark maps have the requested size and water along the border.
+    """
+    rows = annual_cycle.make_map(5).splitlines()
+    assert len(rows) == 5 and all(len(row) == 5 for row in rows)
+    assert rows[0] == rows[-1] == 'WWWWW'
+    assert annual_cycle.make_map(3).splitlines()[1] in ('WLW', 'WHW', 'WDW')
+
+
+def test_population_spread():
+    """
+    The requested number of animals is spread over the land tiles.
+    """
+    island = annual_cycle.make_island(6, 1000, 'array', 1)
+    assert island.animal_count_total() == (900, 100)
+
+
+def test_timed_year_is_the_simulated_year():
+    """
+    A timed year is the same year as Whole_map.new_year_whole_map runs.
+    """
+    timed = annual_cycle.make_island(6, 500, 'object', 3)
+    plain = annual_cycle.make_island(6, 500, 'object', 3)
+    for _ in range(3):
+        times = annual_cycle.time_year(timed)
+        plain.new_year_whole_map()
+    assert set(times) == set(annual_cycle.PHASES)
+    assert timed.year == plain.year == 3
+    assert timed.animal_count_dict() == plain.animal_count_dict()
+
+
+def test_end_count_matches_the_tiles():
+    """
+    The counts reported by a benchmark case are the animals the tiles hold at the end.
+    """
+    for backend in ('object', 'array'):
+        result = annual_cycle.run_case(10, 2000, backend, 3)
+        island = annual_cycle.make_island(10, 2000, backend, 1)
+        for _ in range(3):
+            annual_cycle.time_year(island)
+        counted = [island.world[key].count_animals() for key in island.land_keys]
+        assert result['end_count'] == sum(map(sum, counted))
+        assert island.animal_count_total() == tuple(map(sum, zip(*counted)))
+
+
+def test_quick_run_writes_json(tmp_path):
+    """
+    A quick run times every phase, and writes the results as JSON.
+    """
+    output = tmp_path / 'results.json'
+    assert annual_cycle.main(['--quick', '--backends', 'array', '--output', str(output)]) == 0
+    results = json.loads(output.read_text())['results']
+    assert len(results) == 4
+    assert set(results[0]['phases']) == set(annual_cycle.PHASES)
+
+
+def test_compare_reports_slower_phases():
+    """
+    Only phases slower than the threshold are reported.
+    """
+    def entry(eat, dying):
+        return {'size': 10, 'animals': 100, 'backend': 'object',
+                'phases': {'tile_eat': {'min': eat}, 'tile_dying': {'min': dying}}}
+
+    slower = annual_cycle.compare([entry(2.0, 1.05)], [entry(1.0, 1.0)], 1.1)
+    assert slower == [((10, 100, 'object'), 'tile_eat', 1.0, 2.0)]
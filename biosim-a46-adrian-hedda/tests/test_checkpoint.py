@@ -0,0 +1,95 @@
+from biosim import Island
+from biosim import checkpoint
+from biosim.simulation import BioSim
+import textwrap
+import pytest
+
+geogr = textwrap.dedent("""\
+                        WWWWWW
+                        WLLHLW
+                        WLDLLW
+                        WWWWWW""")
+ini_herbs = [{'age': 5, 'weight': 20} for _ in range(60)]
+ini_carns = [{'age': 5, 'weight': 20} for _ in range(10)]
+
+
+def weights(island):
+    herbs, carns = island.all_animals()
+    return [round(animal, 12) for animal in list(_weights(herbs)) + list(_weights(carns))]
+
+
+def _weights(animals):
+    if isinstance(animals, list):
+        return [animal.weight for animal in animals]
+    return animals.weight.tolist()
+
+
+@pytest.mark.parametrize('backend', ['object', 'array'])
+@pytest.mark.parametrize('seed', [7, None])
+def test_restored_island_continues_identically(tmp_path, backend, seed):
+    """
+    An island restored from a checkpoint continues with exactly the same animals as the island
+    the checkpoint was taken from, both with seeded streams and with the global generators.
+    """
+    island = Island.Whole_map(backend, seed)
+    island.sim_world(geogr)
+    island.add_pop((2, 3), (2, 3), ini_herbs, ini_carns)
+    for _ in range(5):
+        island.new_year_whole_map()
+    checkpoint.save(island, tmp_path / 'state.npz', geogr, seed)
+    for _ in range(5):
+        island.new_year_whole_map()
+
+    restored, meta = checkpoint.load(tmp_path / 'state.npz')
+    assert restored.year == 5 and meta['seed'] == seed
+    for _ in range(5):
+        restored.new_year_whole_map()
+    assert restored.animal_count_dict() == island.animal_count_dict()
+    assert weights(restored) == weights(island)
+
+
+def test_checkpoint_restores_parameters(tmp_path):
+    """
+    Loading a checkpoint sets the species parameters back to those it was saved with.
+    """
+    island = Island.Whole_map()
+    island.sim_world(geogr)
+    old = Island.all_parameters()
+    try:
+        Island.animal_parameters('Herbivore', {'beta': 0.5})
+        checkpoint.save(island, tmp_path / 'state.npz', geogr)
+        Island.animal_parameters('Herbivore', {'beta': 0.9})
+        checkpoint.load(tmp_path / 'state.npz')
+        assert Island.all_parameters()['Herbivore']['beta'] == 0.5
+    finally:
+        Island.set_all_parameters(old)
+
+
+def test_biosim_resumes_from_checkpoint(tmp_path):
+    """
+    A BioSim loaded from a checkpoint continues from the year of the checkpoint, without adding
+    the initial population again.
+    """
+    ini_pop = [{'loc': (2, 3), 'pop': [dict(animal, species='Herbivore')
+                                       for animal in ini_herbs]}]
+    sim = BioSim(geogr, ini_pop, seed=3, vis_years=0)
+    sim.simulate(2)
+    sim.save_checkpoint(tmp_path / 'sim.npz')
+    sim.simulate(2)
+
+    resumed = BioSim(geogr, ini_pop, seed=99, vis_years=0)
+    resumed.load_checkpoint(tmp_path / 'sim.npz')
+    assert resumed.year == 2
+    resumed.simulate(2)
+    assert resumed.year == 4
+    assert resumed.num_animals_per_species == sim.num_animals_per_species
+
+
+def test_load_rejects_other_files(tmp_path):
+    """
+    A file that is not a checkpoint is rejected with a ValueError.
+    """
+    import numpy as np
+    np.savez(tmp_path / 'other.npz', a=np.arange(3))
+    with pytest.raises(ValueError):
+        checkpoint.load(tmp_path / 'other.npz')
@@ -0,0 +1,94 @@
+from biosim import Island
+from biosim.count_log import CountLogger, read_log
+from biosim.simulation import BioSim
+import textwrap
+import pytest
+
+geogr = textwrap.dedent("""\
+                        WWWWW
+                        WLLHW
+                        WWWWW""")
+ini_herbs = [{'age': 5, 'weight': 20} for _ in range(30)]
+ini_carns = [{'age': 5, 'weight': 20} for _ in range(4)]
+
+
+def make_island():
+    island = Island.Whole_map('object', 2)
+    island.sim_world(geogr)
+    island.add_pop((2, 2), (2, 2), ini_herbs, ini_carns)
+    return island
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'binary'])
+@pytest.mark.parametrize('background', [False, True])
+def test_logger_writes_every_year(tmp_path, fmt, background):
+    """
+    Every logged year ends up in the file, also when the buffer is flushed several times, with
+    the same totals and per tile counts as counting the animals in the tiles.
+    """
+    island = make_island()
+    path = tmp_path / 'counts.log'
+    logger = CountLogger(path, island, fmt=fmt, per_tile=True, buffer_years=3,
+                         background=background)
+    expected = []
+    for year in range(8):
+        logger.log(island.year)
+        per_tile = island.animal_count_dict()
+        expected.append([island.year, *island.animal_count_total(),
+                         *[number for key in island.land_keys for number in per_tile[key]]])
+        island.new_year_whole_map()
+    logger.close()
+
+    columns, counts = read_log(path)
+    assert columns[:3] == ['Year', 'Herbivore', 'Carnivore']
+    assert columns[3:] == ['Herbivore_2_2', 'Carnivore_2_2', 'Herbivore_2_3', 'Carnivore_2_3',
+                           'Herbivore_2_4', 'Carnivore_2_4']
+    assert counts.tolist() == expected
+    assert (counts[:, 3::2].sum(axis=1) == counts[:, 1]).all()
+
+
+def test_background_write_error_is_raised(tmp_path):
+    """
+    A failed write in the background thread is raised by close, which does not hang, and the
+    file is closed.
+    """
+    island = make_island()
+    logger = CountLogger(tmp_path / 'counts.log', island, buffer_years=2, background=True)
+
+    def broken(block):
+        raise OSError('disk full')
+
+    logger._write = broken
+    for year in range(5):
+        logger.log(year)
+    with pytest.raises(RuntimeError, match='disk full'):
+        logger.close()
+    assert logger._file.closed and not logger._thread.is_alive()
+
+
+def test_logger_appends(tmp_path):
+    """
+    A logger opened with append adds rows to an existing log instead of starting it again.
+    """
+    island = make_island()
+    path = tmp_path / 'counts.bin'
+    for _ in range(2):
+        logger = CountLogger(path, island, append=True)
+        logger.log(island.year)
+        logger.close()
+        island.new_year_whole_map()
+    assert read_log(path)[1][:, 0].tolist() == [0, 1]
+
+
+def test_biosim_log_file(tmp_path):
+    """
+    BioSim writes the initial counts and one row per simulated year to its log file.
+    """
+    path = tmp_path / 'sim.csv'
+    ini_pop = [{'loc': (2, 2), 'pop': [dict(herb, species='Herbivore') for herb in ini_herbs]}]
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0, log_file=str(path))
+    sim.simulate(3)
+    sim.simulate(2)
+    columns, counts = read_log(path)
+    assert counts[:, 0].tolist() == [0, 1, 2, 3, 4, 5]
+    assert counts[-1, 1] == sim.num_animals_per_species['Herbivore']
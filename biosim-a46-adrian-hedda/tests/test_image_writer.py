@@ -0,0 +1,57 @@
+from biosim import image_writer
+from biosim.image_writer import ImageWriter
+import threading
+import numpy as np
+import pytest
+from matplotlib import image
+
+
+@pytest.mark.parametrize('kind', ['thread', 'process'])
+def test_images_written(tmp_path, kind):
+    """
+    Every submitted image is on disk with its pixels after close.
+    """
+    writer = ImageWriter(kind, workers=2, max_pending=2)
+    pixels = np.zeros((4, 6, 4), dtype=np.uint8)
+    pixels[..., 3] = 255
+    for number in range(5):
+        pixels[0, 0, 0] = number
+        writer.submit(str(tmp_path / f'img_{number}.png'), pixels.copy())
+    writer.close()
+    for number in range(5):
+        saved = image.imread(tmp_path / f'img_{number}.png')
+        assert saved.shape == (4, 6, 4)
+        assert round(saved[0, 0, 0] * 255) == number
+
+
+def test_submit_blocks_when_full(tmp_path, monkeypatch):
+    """
+    submit waits while max_pending images are still being written.
+    """
+    release = threading.Event()
+
+    def slow_write(path, pixels, dpi):
+        release.wait()
+
+    monkeypatch.setattr(image_writer, '_write_image', slow_write)
+    writer = ImageWriter('thread', workers=1, max_pending=2)
+    writer.submit('a.png', None)
+    writer.submit('b.png', None)
+    blocked = threading.Thread(target=writer.submit, args=('c.png', None))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join(5)
+    assert not blocked.is_alive()
+    writer.close()
+
+
+def test_write_errors_are_raised(tmp_path):
+    """
+    An image that can not be written makes wait raise RuntimeError.
+    """
+    writer = ImageWriter()
+    writer.submit(str(tmp_path / 'missing' / 'img.png'), np.zeros((2, 2, 4), dtype=np.uint8))
+    with pytest.raises(RuntimeError):
+        writer.close()
@@ -0,0 +1,149 @@
+from biosim import Animal
+from biosim import kernels
+from biosim.Population import Population
+import numpy as np
+import pytest
+
+
+class NoRandom:
+    """Random generator that fails the test when it is used."""
+
+    def permutation(self, n):
+        raise AssertionError('no random order should be drawn')
+
+    shuffle = permutation
+
+
+def eat_in_turn(fodder, appetite, count):
+    """The intakes when the herbivores eat one after the other, as in Herbivores.eat."""
+    intake = []
+    for _ in range(count):
+        eaten = min(appetite, max(fodder, 0))
+        intake.append(eaten)
+        fodder -= eaten
+    return intake, fodder
+
+
+@pytest.mark.parametrize('fodder, count', [(0, 5), (800, 0), (800, 5), (800, 80), (800, 100),
+                                           (805, 100), (5, 3), (300, 30)])
+def test_fodder_intake_matches_eating_in_turn(fodder, count):
+    """
+    The batched intakes are the same as when every herbivore eats in turn.
+    """
+    intake, rest = kernels.fodder_intake(fodder, 10.0, count)
+    expected, expected_rest = eat_in_turn(fodder, 10.0, count)
+    assert len(intake) <= count
+    assert np.allclose(np.concatenate([intake, np.zeros(count - len(intake))]), expected)
+    assert np.isclose(rest, expected_rest)
+
+
+def test_eat_fodder_short_circuits():
+    """
+    Without fodder, or with enough fodder for every herbivore, no random order is needed.
+    """
+    beta, appetite = Animal.Herbivores._compiled.beta, Animal.Herbivores._compiled.F
+    pop = Population(Animal.Herbivores, [5] * 4, [20.] * 4)
+    assert pop.eat_fodder(0, NoRandom()) == 0
+    assert np.all(pop.weight == 20.)
+    assert pop.eat_fodder(5 * appetite, NoRandom()) == appetite
+    assert np.allclose(pop.weight, 20. + beta * appetite)
+
+    herbs = [Animal.Herbivores(5, 20.) for _ in range(4)]
+    assert Animal.Herbivores.feed(herbs, 0, NoRandom()) == 0
+    assert Animal.Herbivores.feed(herbs, 4 * appetite, NoRandom()) == 0
+    assert all(np.isclose(herb.weight, 20. + beta * appetite) for herb in herbs)
+
+
+@pytest.mark.parametrize('fodder_share', [0.35, 2.5])
+def test_both_backends_share_the_fodder(fodder_share):
+    """
+    When the fodder runs out, as many herbivores as the fodder allows eat their fill, one eats
+    the rest, and the others get nothing, on both backends.
+    """
+    beta, appetite = Animal.Herbivores._compiled.beta, Animal.Herbivores._compiled.F
+    count = 10
+    fodder = fodder_share * appetite
+    pop = Population(Animal.Herbivores, [5] * count, [20.] * count)
+    herbs = [Animal.Herbivores(5, 20.) for _ in range(count)]
+    rests = [pop.eat_fodder(fodder, np.random.default_rng(3)),
+             Animal.Herbivores.feed(herbs, fodder, np.random.default_rng(3))]
+    expected = np.sort((20. + beta * np.array(eat_in_turn(fodder, appetite, count)[0])))
+    assert rests == [0, 0]
+    assert np.allclose(np.sort(pop.weight), expected)
+    assert np.allclose(np.sort([herb.weight for herb in herbs]), expected)
+    assert all(herb._fitness_stale for herb in herbs[:int(np.ceil(fodder_share))])
+
+
+def hunt_in_turn(carns, herbs, rng):
+    """The hunt as before kernels.hunt: every carnivore calls eat on the sorted herbivores."""
+    herbs.sort(key=lambda x: x.fitness)
+    for carn in sorted(carns, key=lambda x: x.fitness, reverse=True):
+        carn.eat(herbs, rng)
+
+
+def make_tile(herb_weights, carn_weights):
+    herbs = [Animal.Herbivores(5, weight) for weight in herb_weights]
+    carns = [Animal.Carnivores(5, weight) for weight in carn_weights]
+    return herbs, carns
+
+
+@pytest.fixture
+def certain_kills():
+    """Carnivores always kill herbivores weaker than themselves."""
+    Animal.Carnivores.set_param({'DeltaPhiMax': 1e-9})
+    yield
+    Animal.Carnivores.set_param({'DeltaPhiMax': 10})
+
+
+def test_hunt_matches_eating_in_turn(certain_kills):
+    """
+    With certain kills, the batched hunt kills the same herbivores, and the carnivores end up
+    with the same weights, as when every carnivore eats in turn, on both backends.
+    """
+    rng = np.random.default_rng(5)
+    herb_weights = rng.uniform(2, 40, 300).tolist()
+    carn_weights = rng.uniform(5, 40, 20).tolist()
+    herbs, carns = make_tile(herb_weights, carn_weights)
+    Animal.Carnivores.hunt(carns, herbs, NoRandom())
+    expected_herbs, expected_carns = make_tile(herb_weights, carn_weights)
+    hunt_in_turn(expected_carns, expected_herbs, NoRandom())
+
+    assert sorted(h.weight for h in herbs if h.alive) == \
+        sorted(h.weight for h in expected_herbs if h.alive)
+    assert np.allclose([c.weight for c in carns], [c.weight for c in expected_carns])
+    assert np.allclose([c.fitness for c in carns], [c.fitness for c in expected_carns])
+
+    herb_pop = Population(Animal.Herbivores, [5] * 300, herb_weights)
+    carn_pop = Population(Animal.Carnivores, [5] * 20, carn_weights)
+    carn_pop.hunt(herb_pop, NoRandom())
+    assert np.allclose(np.sort(herb_pop.weight),
+                       sorted(h.weight for h in expected_herbs if h.alive))
+    assert np.allclose(carn_pop.weight, [c.weight for c in expected_carns])
+
+
+def test_hunt_stops_without_weaker_prey():
+    """
+    When every herbivore is fitter than every carnivore, the hunt ends without drawing any
+    random numbers.
+    """
+    herbs, carns = make_tile([50.] * 40, [1.] * 5)
+    Animal.Carnivores.hunt(carns, herbs, NoRandom())
+    assert all(herb.alive for herb in herbs)
+    assert all(carn.weight == 1. for carn in carns)
+
+
+def test_hunt_kill_rate_matches_eating_in_turn():
+    """
+    With random kills, the batched hunt kills as many herbivores on average as eating in turn.
+    """
+    herb_weights = np.linspace(2, 30, 60).tolist()
+    carn_weights = np.linspace(10, 40, 6).tolist()
+    batched, in_turn = [], []
+    for seed in range(300):
+        herbs, carns = make_tile(herb_weights, carn_weights)
+        Animal.Carnivores.hunt(carns, herbs, np.random.default_rng(seed))
+        batched.append(sum(not herb.alive for herb in herbs))
+        herbs, carns = make_tile(herb_weights, carn_weights)
+        hunt_in_turn(carns, herbs, np.random.default_rng(seed))
+        in_turn.append(sum(not herb.alive for herb in herbs))
+    assert np.mean(batched) == pytest.approx(np.mean(in_turn), rel=0.1)
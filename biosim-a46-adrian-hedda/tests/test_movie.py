@@ -0,0 +1,94 @@
+from biosim import movie
+from biosim.simulation import BioSim
+import json
+import os
+import sys
+import textwrap
+import pytest
+
+geogr = textwrap.dedent("""\
+                        WWWWW
+                        WLLHW
+                        WWWWW""")
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(30)]}]
+
+
+@pytest.fixture
+def fake_encoder(tmp_path, monkeypatch):
+    """
+    Replaces ffmpeg by a script that writes the frame size and the number of bytes it got on
+    stdin to the output file as JSON.
+    """
+    script = tmp_path / 'fake_ffmpeg'
+    script.write_text(textwrap.dedent(f"""\
+        #!{sys.executable}
+        import json, sys
+        args = sys.argv[1:]
+        size = args[args.index('-s') + 1]
+        received = len(sys.stdin.buffer.read())
+        with open(args[-1], 'w') as file:
+            json.dump({{'size': size, 'bytes': received}}, file)
+        """))
+    script.chmod(0o755)
+    monkeypatch.setattr(movie, '_FFMPEG_BINARY', str(script))
+
+
+def test_stream_writes_all_frames(tmp_path, fake_encoder):
+    """
+    Every frame written to the stream reaches the encoder.
+    """
+    stream = movie.MovieStream(str(tmp_path / 'out.mp4'))
+    for _ in range(3):
+        stream.write(bytes(4 * 6 * 4), 6, 4)
+    with pytest.raises(ValueError):
+        stream.write(bytes(4 * 2 * 2), 2, 2)
+    stream.close()
+    result = json.loads((tmp_path / 'out.mp4').read_text())
+    assert result == {'size': '6x4', 'bytes': 3 * 4 * 6 * 4}
+
+
+def test_no_new_encoder_after_broken_pipe(tmp_path, monkeypatch):
+    """
+    When the encoder stops reading, even with exit code 0, writing fails instead of starting a
+    new encoder that overwrites the movie.
+    """
+    script = tmp_path / 'fake_ffmpeg'
+    script.write_text(textwrap.dedent(f"""\
+        #!{sys.executable}
+        import sys
+        with open(sys.argv[-1], 'a') as file:
+            file.write('started\\n')
+        """))
+    script.chmod(0o755)
+    monkeypatch.setattr(movie, '_FFMPEG_BINARY', str(script))
+    stream = movie.MovieStream(str(tmp_path / 'out.mp4'))
+    frame = bytes(4 * 512 * 512)
+    with pytest.raises(RuntimeError):
+        for _ in range(10):
+            stream.write(frame, 512, 512)
+    with pytest.raises(RuntimeError):
+        stream.write(frame, 512, 512)
+    assert (tmp_path / 'out.mp4').read_text() == 'started\n'
+
+
+def test_unknown_movie_format():
+    with pytest.raises(ValueError):
+        movie.MovieStream('out.avi', 'avi')
+
+
+@pytest.mark.parametrize('keep_frames', [False, True])
+def test_biosim_streams_movie(tmp_path, fake_encoder, keep_frames):
+    """
+    With movie_fmt, BioSim streams one frame per image year into the movie, and only saves
+    image files if keep_frames is set.
+    """
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=1, img_years=2, img_dir=str(tmp_path),
+                 img_base='sim', movie_fmt='mp4', keep_frames=keep_frames)
+    sim.simulate(6)
+    sim.make_movie()
+    result = json.loads((tmp_path / 'sim.mp4').read_text())
+    width, height = map(int, result['size'].split('x'))
+    assert result['bytes'] == 3 * width * height * 4
+    images = sorted(name for name in os.listdir(tmp_path) if name.endswith('.png'))
+    assert images == (['sim_00000.png', 'sim_00001.png', 'sim_00002.png'] if keep_frames else [])
@@ -0,0 +1,46 @@
+from biosim import Island
+import textwrap
+import pytest
+
+geogr = textwrap.dedent("""\
+                        WWWWWWW
+                        WLLLLLW
+                        WLHHLLW
+                        WLLDLLW
+                        WLLLLLW
+                        WWWWWWW""")
+
+
+def run_island(backend, workers, years=8):
+    island = Island.Whole_map(backend, seed=2023)
+    island.sim_world(geogr)
+    island.add_pop((3, 3), (3, 3), [{'age': 5, 'weight': 20} for _ in range(80)],
+                   [{'age': 5, 'weight': 20} for _ in range(15)])
+    if workers > 1:
+        island.start_parallel(workers)
+    for _ in range(years):
+        island.new_year_whole_map()
+    counts = island.animal_count_dict()
+    island.stop_parallel()
+    return island, counts
+
+
+@pytest.mark.parametrize('backend', ['object', 'array'])
+def test_parallel_matches_serial(backend):
+    """
+    A seeded island gives the same animals in every tile, whether it runs serially or split
+    between worker processes.
+    """
+    _, serial_counts = run_island(backend, 1)
+    _, parallel_counts = run_island(backend, 3)
+    assert serial_counts == parallel_counts
+
+
+def test_parallel_collects_animals():
+    """
+    After the workers stop, the animals are back in the tiles of the main process.
+    """
+    island, counts = run_island('array', 2)
+    all_herb, all_carn = island.all_animals()
+    assert island.engine is None
+    assert len(all_herb) == sum(count[0] for count in counts.values())
@@ -0,0 +1,72 @@
+from biosim import Island
+from biosim.profiling import Profiler, PHASES
+from biosim.simulation import BioSim
+import textwrap
+import pytest
+
+geogr = textwrap.dedent("""\
+                        WWWWW
+                        WLLHW
+                        WLDLW
+                        WWWWW""")
+ini_herbs = [{'age': 5, 'weight': 20} for _ in range(40)]
+ini_carns = [{'age': 5, 'weight': 20} for _ in range(5)]
+
+
+def make_island(seed=4):
+    island = Island.Whole_map('object', seed)
+    island.sim_world(geogr)
+    island.add_pop((2, 2), (2, 2), ini_herbs, ini_carns)
+    return island
+
+
+def test_profiled_year_is_unchanged():
+    """
+    Profiling does not change what happens on the island.
+    """
+    plain = make_island()
+    profiled = make_island()
+    profiled.profiler = Profiler()
+    for _ in range(4):
+        plain.new_year_whole_map()
+        profiled.new_year_whole_map()
+    assert plain.animal_count_dict() == profiled.animal_count_dict()
+
+
+def test_phase_and_tile_times():
+    """
+    Every phase and every occupied tile of the per tile phases are timed, and the phases add up
+    to at most the whole year.
+    """
+    calls = []
+    island = make_island()
+    island.profiler = Profiler(per_tile_phases=('tile_eat', 'tile_dying'),
+                               callback=lambda year, phases, tiles: calls.append(year))
+    for _ in range(3):
+        island.new_year_whole_map()
+    profiler = island.profiler
+    assert calls == [1, 2, 3] and profiler.years == 3 and len(profiler.history) == 3
+    assert set(profiler.last_year) == set(PHASES) | {'year'}
+    assert sum(profiler.totals[phase] for phase in PHASES) <= profiler.totals['year']
+    occupied = {key for key in island.land_keys if island.world[key].index in island.occupied}
+    assert occupied <= set(profiler.last_tiles['tile_dying']) <= set(island.land_keys)
+    assert profiler.hotspots('tile_eat', 1)[0][1] == max(profiler.tile_totals['tile_eat'].values())
+
+
+def test_unknown_phase():
+    with pytest.raises(ValueError):
+        Profiler(per_tile_phases=('tile_sleep',))
+
+
+def test_biosim_profile():
+    """
+    BioSim.profile gives the profiler started with start_profiling, also after it is stopped.
+    """
+    ini_pop = [{'loc': (2, 2), 'pop': [dict(herb, species='Herbivore') for herb in ini_herbs]}]
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0)
+    assert sim.profile is None
+    sim.start_profiling()
+    sim.simulate(2)
+    sim.stop_profiling()
+    sim.simulate(1)
+    assert sim.profile.years == 2
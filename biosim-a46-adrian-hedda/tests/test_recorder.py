@@ -0,0 +1,97 @@
+from biosim import Island
+from biosim import recorder as recorder_module
+from biosim.recorder import TimeSeriesRecorder
+from biosim.simulation import BioSim
+import textwrap
+import numpy as np
+import pytest
+
+geogr = textwrap.dedent("""\
+                        WWWWW
+                        WLLHW
+                        WLDLW
+                        WWWWW""")
+ini_herbs = [{'age': 5, 'weight': 20} for _ in range(30)]
+ini_carns = [{'age': 5, 'weight': 20} for _ in range(4)]
+
+
+def test_count_grid_matches_count_dict():
+    """
+    The count grid holds the same numbers as the count dictionary, at index (y - 1, x - 1).
+    """
+    island = Island.Whole_map('array', 3)
+    island.sim_world(geogr)
+    island.add_pop((2, 2), (3, 4), ini_herbs, ini_carns)
+    island.new_year_whole_map()
+    grid = island.count_grid()
+    assert grid.shape == (4, 5, 2)
+    for (y, x), counts in island.animal_count_dict().items():
+        assert list(grid[y - 1, x - 1]) == counts
+
+
+@pytest.mark.parametrize('mapped', [False, True])
+def test_recorder_grows_and_reopens(tmp_path, mapped):
+    """
+    The recorder grows past its first capacity, and a memory mapped recording can be opened
+    again after the run.
+    """
+    island = Island.Whole_map('object', 3)
+    island.sim_world(geogr)
+    island.add_pop((2, 2), (2, 2), ini_herbs, ini_carns)
+    path = tmp_path / 'counts.npy' if mapped else None
+    recorder = TimeSeriesRecorder.for_island(island, 2, path)
+    totals = []
+    for _ in range(5):
+        recorder.record(island)
+        totals.append(island.animal_count_total())
+        island.new_year_whole_map()
+    recorder.flush()
+    assert recorder.counts.shape == (5, 4, 5, 2)
+    assert recorder.counts.sum(axis=(1, 2)).tolist() == [list(total) for total in totals]
+    if mapped:
+        reopened = TimeSeriesRecorder.open(path)
+        assert list(reopened.years) == [0, 1, 2, 3, 4]
+        assert np.array_equal(reopened.counts, recorder.counts)
+
+
+def test_mapped_recorder_grows_in_chunks(tmp_path, monkeypatch):
+    """
+    A memory mapped recorder grows by copying the recorded years in chunks into a new file,
+    which replaces the old one.
+    """
+    monkeypatch.setattr(recorder_module, '_copy_bytes', 1)
+    recorder = TimeSeriesRecorder(3, 4, 2, tmp_path / 'counts.npy')
+    recorder._data[:2] = np.arange(2 * 3 * 4 * 2).reshape(2, 3, 4, 2)
+    recorder.size = 2
+    recorded = np.array(recorder.counts)
+    recorder.reserve(7)
+    assert recorder.capacity == 7 and isinstance(recorder._data, np.memmap)
+    assert np.array_equal(recorder.counts, recorded)
+    assert np.load(tmp_path / 'counts.npy', mmap_mode='r').shape == (7, 3, 4, 2)
+    assert not (tmp_path / 'counts.npy.tmp').exists()
+
+
+def test_recorder_rejects_skipped_year():
+    """
+    Recording a year out of order raises ValueError.
+    """
+    island = Island.Whole_map()
+    island.sim_world(geogr)
+    recorder = TimeSeriesRecorder.for_island(island, 3)
+    recorder.record(island)
+    island.year = 5
+    with pytest.raises(ValueError):
+        recorder.record(island)
+
+
+def test_biosim_recorder(tmp_path):
+    """
+    A recorder attached to BioSim gets the initial counts and every simulated year.
+    """
+    ini_pop = [{'loc': (2, 2), 'pop': [dict(herb, species='Herbivore') for herb in ini_herbs]}]
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0)
+    recorder = sim.attach_recorder(str(tmp_path / 'sim.npy'))
+    sim.simulate(2)
+    sim.simulate(3)
+    assert list(recorder.years) == [0, 1, 2, 3, 4, 5]
+    assert recorder.counts[-1, :, :, 0].sum() == sim.num_animals_per_species['Herbivore']
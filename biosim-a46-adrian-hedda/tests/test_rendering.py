@@ -0,0 +1,166 @@
+from biosim import Island
+from biosim import rendering
+from biosim.simulation import BioSim
+import os
+import subprocess
+import sys
+import textwrap
+import numpy as np
+import pytest
+
+geogr = textwrap.dedent("""\
+                        WWWWW
+                        WLLHW
+                        WWWWW""")
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(30)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(3)]}]
+
+
+def test_snapshot_contents():
+    """
+    A snapshot holds the counts per tile, and histograms with one count per animal.
+    """
+    island = Island.Whole_map('array', 1)
+    island.sim_world(geogr)
+    island.add_pop((2, 2), (2, 3), ini_pop[0]['pop'][:30], ini_pop[0]['pop'][30:])
+    edges = rendering.hist_edges(rendering.hist_specs({'age': {'max': 100, 'delta': 1}}))
+    snapshot = rendering.take_snapshot(island, [[30, 3]], edges)
+    assert snapshot.grid[1, 1].tolist() == [30, 0]
+    assert snapshot.grid[1, 2].tolist() == [0, 3]
+    assert len(snapshot.hists['age'][0]) == 100
+    assert snapshot.hists['age'][0].sum() == 30 and snapshot.hists['age'][1].sum() == 3
+
+
+def test_headless_never_imports_matplotlib():
+    """
+    With vis_years=0, a simulation runs without importing matplotlib.
+    """
+    code = textwrap.dedent(f"""\
+        import sys
+        from biosim.simulation import BioSim
+        sim = BioSim({geogr!r}, {ini_pop!r}, seed=1, vis_years=0)
+        sim.simulate(3)
+        assert 'matplotlib' not in sys.modules
+        """)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run([sys.executable, '-c', code], check=True, env=env)
+
+
+def test_import_is_lazy():
+    """
+    Importing the simulation loads neither the graphics, nor the modules for subprocesses,
+    multiprocessing or background threads.
+    """
+    code = textwrap.dedent("""\
+        import sys
+        import biosim.simulation
+        loaded = [name for name in ('matplotlib', 'subprocess', 'multiprocessing',
+                                    'concurrent.futures', 'queue', 'biosim.visualization',
+                                    'biosim.checkpoint', 'biosim.count_log')
+                  if name in sys.modules]
+        assert not loaded, loaded
+        """)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run([sys.executable, '-c', code], check=True, env=env)
+
+
+@pytest.mark.parametrize('render', ['inline', 'thread', 'process'])
+def test_images_saved_in_img_years(tmp_path, render):
+    """
+    Images are only saved in the years that are multiples of img_years, with consecutive
+    numbers, whichever renderer draws them.
+    """
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=2, img_years=4, img_dir=str(tmp_path),
+                 img_base='sim', render=render)
+    sim.simulate(9)
+    assert sorted(os.listdir(tmp_path)) == ['sim_00000.png', 'sim_00001.png']
+
+
+@pytest.mark.parametrize('render', ['inline', 'process'])
+def test_image_numbers_go_on_across_simulate(tmp_path, render):
+    """
+    A later call to simulate goes on with the image numbers instead of overwriting the images
+    of the earlier calls.
+    """
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=2, img_years=4, img_dir=str(tmp_path),
+                 img_base='sim', render=render)
+    sim.simulate(10)
+    first = (tmp_path / 'sim_00000.png').stat().st_mtime_ns
+    sim.simulate(6)
+    assert sorted(os.listdir(tmp_path)) == [f'sim_{num:05d}.png' for num in range(4)]
+    assert (tmp_path / 'sim_00000.png').stat().st_mtime_ns == first
+
+
+@pytest.mark.parametrize('render', ['thread', 'process'])
+def test_renderer_error_is_raised(tmp_path, monkeypatch, render):
+    """
+    When drawing fails in a renderer thread or process, simulate raises the error instead of
+    waiting for the renderer forever.
+    """
+    # ffmpeg can not be found, so the movie can not be started
+    monkeypatch.setenv('PATH', str(tmp_path))
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=1, img_dir=str(tmp_path), img_base='sim',
+                 movie_fmt='mp4', render=render)
+    with pytest.raises(RuntimeError, match='ffmpeg'):
+        sim.simulate(20)
+
+
+def test_process_renderer_writes_images_in_threads(tmp_path):
+    """
+    A renderer process can not start image writer processes, so it writes the images with
+    threads instead.
+    """
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=1, img_dir=str(tmp_path), img_base='sim',
+                 render='process', image_writer='process')
+    sim.simulate(3)
+    assert sorted(os.listdir(tmp_path)) == ['sim_00000.png', 'sim_00001.png', 'sim_00002.png']
+
+
+def test_figure_without_pyplot():
+    """
+    A figure that is not interactive, as drawn by the thread renderer, is made without pyplot,
+    so GUI backends are never used outside of the main thread.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from biosim import visualization
+    figures = plt.get_fignums()
+    vis = visualization.Visualize(5, interactive=False)
+    vis.setup_figure(geogr)
+    assert plt.get_fignums() == figures
+    assert isinstance(vis.fig.canvas, FigureCanvasAgg)
+    vis.close()
+
+
+def test_img_years_must_be_multiple_of_vis_years():
+    """
+    img_years that is not a multiple of vis_years is rejected.
+    """
+    with pytest.raises(ValueError):
+        BioSim(geogr, ini_pop, seed=1, vis_years=2, img_years=3)
+
+
+@pytest.mark.parametrize('blit', [False, True])
+def test_heatmap_artists_reused(tmp_path, blit):
+    """
+    Drawing snapshots updates the heatmap images in place, instead of adding new images,
+    colorbars or axes every year, and the images show the counts of the snapshot.
+    """
+    from biosim import visualization
+    vis = visualization.Visualize(10, img_dir=str(tmp_path), img_base='vis', blit=blit)
+    vis.setup_figure(geogr)
+    images = dict(vis.heat_img)
+    num_axes = len(vis.fig.axes)
+    edges = rendering.hist_edges(vis._hist_specs)
+    for year in (1, 2, 3):
+        grid = np.zeros((3, 5, 2), dtype=np.int64)
+        grid[1, 1] = [year, 2 * year]
+        hists = {prop: (np.zeros(len(e) - 1), np.zeros(len(e) - 1)) for prop, e in edges.items()}
+        vis.draw_snapshot(rendering.Snapshot(year, grid, np.array([[year, 2 * year]]), hists))
+    assert vis.heat_img == images
+    assert len(vis.herb_heat.images) == 1 and len(vis.carn_heat.images) == 1
+    assert len(vis.fig.axes) == num_axes
+    assert vis.heat_img[1].get_array()[1, 1] == 6
+    vis.close()
+    assert len(os.listdir(tmp_path)) == 3
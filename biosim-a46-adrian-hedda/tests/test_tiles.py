@@ -0,0 +1,27 @@
+from biosim import Tile
+import numpy as np
+import pytest
+
+
+def test_set_param_f_max_alias():
+    """
+    The parameter name f_max can be used for the fodder, and invalid values are rejected.
+    """
+    Tile.Highland.set_param({'f_max': 250})
+    tile = Tile.Highland()
+    tile.set_fodder()
+    with pytest.raises(ValueError):
+        Tile.Highland.set_param({'Fodder': -1})
+    with pytest.raises(ValueError):
+        Tile.Highland.set_param({'Accepts_animals': 1})
+    Tile.Highland.set_param({'Fodder': 400})
+    assert tile.Fodder == 250
+
+
+def test_set_param_accepts_numpy_scalars():
+    """
+    NumPy numbers are valid fodder values.
+    """
+    Tile.Highland.set_param({'f_max': np.int64(250), 'Accepts_animals': np.bool_(True)})
+    assert Tile.Highland._compiled.fodder == 250
+    Tile.Highland.set_param({'Fodder': 400})
@@ -0,0 +1,84 @@
+from biosim import Island
+from biosim.topology import Topology
+import numpy as np
+import pytest
+import textwrap
+
+geogr = textwrap.dedent("""\
+                        WWWWW
+                        WLLLW
+                        WLDLW
+                        WWWWW""")
+
+
+def test_square_adjacency():
+    """
+    The adjacency table of the square topology has four slots per land tile, in the order
+    N, S, E, W, and only land tiles as destinations.
+    """
+    island = Island.Whole_map()
+    island.sim_world(geogr)
+    adjacency = island.adjacency
+    assert adjacency.keys == island.land_keys
+    assert len(adjacency.keys) == 6
+    assert np.all(np.diff(adjacency.indptr) == 4)
+    assert island.neighbor_keys((2, 3)) == [(2, 2), (2, 4), (3, 3), (1, 3)]
+    assert sorted(island.land_neighbors((2, 3))) == [(2, 2), (2, 4), (3, 3)]
+    assert adjacency.targets[adjacency.index[(2, 3)]] == ((2, 2), (2, 4), (3, 3), None)
+
+
+def test_wraparound_and_hexagonal_neighbors():
+    """
+    The wraparound topology finds neighbors across the edges of the map, and the hexagonal
+    topology has six neighbors.
+    """
+    wrap = Island.Whole_map(topology='wrap')
+    wrap.sim_world(geogr)
+    assert wrap.neighbor_keys((1, 1)) == [(1, 5), (1, 2), (2, 1), (4, 1)]
+
+    hexagonal = Island.Whole_map(topology='hex')
+    hexagonal.sim_world(geogr)
+    assert np.all(np.diff(hexagonal.adjacency.indptr) == 6)
+    assert sorted(hexagonal.land_neighbors((2, 3))) == [(2, 2), (2, 4), (3, 3), (3, 4)]
+    assert sorted(hexagonal.land_neighbors((3, 3))) == [(2, 2), (2, 3), (3, 2), (3, 4)]
+
+
+def test_unknown_topology():
+    with pytest.raises(ValueError):
+        Island.Whole_map(topology='klein bottle')
+
+
+@pytest.mark.parametrize('backend', ['object', 'array'])
+def test_migration_follows_topology(backend):
+    """
+    With the hexagonal topology, animals only migrate to the hexagonal neighbors of their tile.
+    """
+    island = Island.Whole_map(backend, seed=4, topology='hex')
+    island.sim_world(geogr)
+    island.add_pop((2, 3), None, [{'age': 5, 'weight': 20} for _ in range(300)], None)
+    herbs = island.world[(2, 3)].herb
+    if backend == 'array':
+        herbs.migrating[:] = True
+    else:
+        for herb in herbs:
+            herb.migrating = True
+    island.migrate()
+    counts = island.animal_count_dict()
+    occupied = sorted(key for key in counts if counts[key][0] > 0)
+    assert occupied == [(2, 2), (2, 3), (2, 4), (3, 3), (3, 4)]
+    assert sum(counts[key][0] for key in counts) == 300
+
+
+def test_custom_topology():
+    """
+    A new topology is used by subclassing Topology with a name.
+    """
+    class Diagonal(Topology, name='diagonal-test'):
+        def neighbor_cells(self, key, length_y, length_x):
+            y, x = key
+            return [(y - 1, x - 1), (y - 1, x + 1), (y + 1, x - 1), (y + 1, x + 1)]
+
+    island = Island.Whole_map(topology='diagonal-test')
+    island.sim_world(geogr)
+    assert island.land_neighbors((2, 2)) == [(3, 3)]
+    del Topology.kinds['diagonal-test']